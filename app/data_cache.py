@@ -0,0 +1,291 @@
+import io
+import os
+import threading
+import pandas as pd
+from collecting_data.storage import (DATASETS as STORE_DATASETS, LOG_DATASETS, RENAMED_COLUMNS, STORAGE_BACKEND,
+                                     CSVLogStore, open_store, filter_range)
+
+# Directory holding the data files written by the collectors
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Dataset name -> (file name, time column, columns parsed as datetimes at load time).
+# The daily rollup is derived data and always kept as CSV.
+DATASETS = dict(STORE_DATASETS, daily_rollup=('daily_rollup.csv', 'date', ['date']))
+
+
+def get_data_file_path(filename):
+    """Helper function to construct path to data files"""
+    return os.path.join(DATA_DIR, filename)
+
+
+class CachedCSV:
+    """
+    Keeps a parsed CSV file in memory and reloads it only when the file changes.
+
+    The file is considered changed when its modification time or size differs
+    from the values seen at the last load. Frames returned by get() are shared
+    between requests and must be treated as read-only; copy before modifying.
+    """
+
+    def __init__(self, path, date_columns=()):
+        self.path = path
+        self.date_columns = list(date_columns)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._frame = None
+
+    def _file_signature(self):
+        """Return (mtime, size) of the file, or None if it does not exist"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _parse_dates(self, df):
+        """Convert the configured columns to datetimes once, at load time"""
+        for column in self.date_columns:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column])
+        return df
+
+    def load(self):
+        """Read and parse the whole file"""
+        return self._parse_dates(pd.read_csv(self.path))
+
+    def get(self):
+        """Return the cached frame, reloading it first if the file has changed"""
+        with self._lock:
+            signature = self._file_signature()
+            if self._frame is None or signature != self._signature:
+                self._frame = self.load()
+                self._signature = signature
+            return self._frame
+
+
+class AppendOnlyCSV(CachedCSV):
+    """
+    Cached CSV for logs that only ever grow by appended lines.
+
+    Remembers the byte offset of the last complete line it parsed and, when the
+    file grows, parses only the new lines and appends them to the cached frame.
+    Falls back to a full reload if the file shrinks, is replaced, or its header
+    or already-read content no longer match what was parsed.
+    """
+
+    # Bytes before the read offset compared to detect in-place rewrites
+    MARKER_BYTES = 256
+
+    def __init__(self, path, date_columns=()):
+        super().__init__(path, date_columns)
+        self._offset = 0
+        self._inode = None
+        self._header = b''
+        self._marker = b''
+
+    def _full_load(self, stat):
+        """Parse every complete line in the file and record the read offset"""
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        self._frame = self._parse_dates(pd.read_csv(io.BytesIO(data[:end])))
+        self._offset = end
+        self._inode = stat.st_ino
+        self._header = data[:data.find(b'\n') + 1]
+        self._marker = data[max(0, end - self.MARKER_BYTES):end]
+
+    def _read_tail(self, stat):
+        """
+        Parse lines appended since the last read.
+
+        Returns False if the file no longer starts with the content that was
+        read before, in which case the caller must do a full reload.
+        """
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            return False
+
+        with open(self.path, 'rb') as f:
+            if f.read(len(self._header)) != self._header:
+                return False
+            f.seek(self._offset - len(self._marker))
+            if f.read(len(self._marker)) != self._marker:
+                return False
+            chunk = f.read()
+
+        # Only parse complete lines; a partially written row is left for later
+        end = chunk.rfind(b'\n') + 1
+        if end == 0:
+            return True
+
+        new_rows = pd.read_csv(io.BytesIO(chunk[:end]), header=None,
+                               names=list(self._frame.columns))
+        new_rows = self._parse_dates(new_rows)
+        self._frame = pd.concat([self._frame, new_rows], ignore_index=True)
+        self._offset += end
+        self._marker = (self._marker + chunk[:end])[-self.MARKER_BYTES:]
+        return True
+
+    def get(self):
+        """Return the cached frame, parsing appended lines or reloading as needed"""
+        with self._lock:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self._frame is None:
+                self._full_load(stat)
+            elif signature != self._signature:
+                if stat.st_size == self._offset or not self._read_tail(stat):
+                    # Same length but modified, or rewritten: start over
+                    self._full_load(stat)
+            self._signature = signature
+            return self._frame
+
+
+class PartitionedCSV:
+    """
+    Cached log dataset kept as one CSV file per month (see storage.CSVLogStore).
+
+    Each file is cached as an AppendOnlyCSV, so a reload only parses the lines
+    appended to the current month; the combined frame is rebuilt only when
+    one of the files changed. Columns written under older names are renamed.
+    As with CachedCSV, the returned frame is shared and must be treated as
+    read-only.
+    """
+
+    def __init__(self, store, date_columns=()):
+        self.store = store
+        self.date_columns = list(date_columns)
+        self._lock = threading.Lock()
+        self._files = {}
+        self._parts = []
+        self._frame = None
+
+    def get(self):
+        """Return the combined frame, rebuilding it if any file has changed"""
+        with self._lock:
+            parts = []
+            for path in self.store.paths():
+                if os.path.getsize(path) == 0:
+                    continue
+                if path not in self._files:
+                    self._files[path] = AppendOnlyCSV(path, self.date_columns)
+                parts.append(self._files[path].get())
+            if not parts:
+                raise FileNotFoundError(f"No {self.store.name} log files in {self.store.directory}")
+
+            changed = len(parts) != len(self._parts) or any(a is not b for a, b in zip(parts, self._parts))
+            if self._frame is None or changed:
+                frames = [part.rename(columns=RENAMED_COLUMNS) for part in parts]
+                self._frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+                self._parts = parts
+            return self._frame
+
+
+class CachedStore:
+    """
+    Keeps a whole dataset from a non-CSV store in memory.
+
+    Reloads when the store's generation counter changes. As with CachedCSV,
+    the returned frame is shared and must be treated as read-only.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._generation = None
+        self._frame = None
+
+    def get(self):
+        with self._lock:
+            generation = self.store.generation()
+            if self._frame is None or generation != self._generation:
+                self._frame = self.store.read()
+                self._generation = generation
+            return self._frame
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def uses_store(name):
+    """True if the dataset is served from a non-CSV storage backend"""
+    return STORAGE_BACKEND != 'csv' and name in STORE_DATASETS
+
+
+def get_cache(name):
+    """Return the cache for a named dataset, creating it on first use"""
+    with _caches_lock:
+        if name not in _caches:
+            filename, _, date_columns = DATASETS[name]
+            if uses_store(name):
+                _caches[name] = CachedStore(open_store(name, DATA_DIR))
+            elif name in LOG_DATASETS:
+                _caches[name] = PartitionedCSV(CSVLogStore(name, DATA_DIR), date_columns)
+            else:
+                _caches[name] = CachedCSV(get_data_file_path(filename), date_columns)
+        return _caches[name]
+
+
+def get_frame(name):
+    """Return the parsed DataFrame for a named dataset (read-only)"""
+    return get_cache(name).get()
+
+
+def data_version(name):
+    """
+    Return (version, modified_time) for a dataset without loading it.
+
+    The version changes whenever the data changes: file mtime and size for
+    CSV files (the number of files, latest mtime and total size for monthly
+    logs), the generation counter for other stores.
+    """
+    if uses_store(name):
+        store = open_store(name, DATA_DIR)
+        return str(store.generation()), store.modified_time()
+
+    if name in LOG_DATASETS:
+        store = CSVLogStore(name, DATA_DIR)
+        files = store.generation()
+        if files is None:
+            return 'missing', None
+        latest = max(mtime for _, mtime, _ in files)
+        return f"{len(files)}-{latest}-{sum(size for _, _, size in files)}", latest / 1e9
+
+    filename = DATASETS[name][0]
+    try:
+        stat = os.stat(get_data_file_path(filename))
+    except FileNotFoundError:
+        return 'missing', None
+    return f"{stat.st_mtime_ns}-{stat.st_size}", stat.st_mtime
+
+
+def read_range(name, start=None, end=None, columns=None):
+    """
+    Return the rows of a dataset with start <= time < end.
+
+    CSV datasets are sliced from the in-memory cache. Columnar stores read
+    only the day partitions and columns that are needed.
+
+    Parameters:
+    - name: Dataset name
+    - start, end: Optional bounds on the dataset's time column (end exclusive)
+    - columns: Columns to return (all if None)
+    """
+    if uses_store(name):
+        return open_store(name, DATA_DIR).read(columns, start, end)
+
+    _, time_column, _ = DATASETS[name]
+    df = filter_range(get_frame(name), time_column, start, end)
+    return df[list(columns)] if columns is not None else df
+
+
+def latest_row(name):
+    """
+    Return the most recent row of a dataset as a one-row frame (empty if there is none).
+
+    Columnar stores look it up directly instead of loading the whole history
+    into the cache, which they would reload after every append.
+    """
+    if uses_store(name):
+        return open_store(name, DATA_DIR).latest()
+    return get_frame(name).iloc[-1:]
@@ -0,0 +1,78 @@
+import pandas as pd
+
+# Departures further than this from any weather reading get no temperature
+DEFAULT_TEMPERATURE_TOLERANCE = pd.Timedelta(hours=3)
+
+
+def nearest_temperature(departure_times, df_weather, tolerance=DEFAULT_TEMPERATURE_TOLERANCE):
+    """
+    Find the temperature of the weather reading closest in time to each departure.
+
+    Uses a sorted as-of join (binary search) instead of scanning the whole
+    weather log for every departure. Ties go to the earlier reading.
+
+    Parameters:
+    - departure_times: Series of departure datetimes
+    - df_weather: Weather frame with parsed 'Timestamp' and 'Temperature' columns
+    - tolerance: Maximum time difference for a match (Timedelta), or None for no limit
+
+    Returns:
+    - Series of temperatures aligned to departure_times' index (NaN where unmatched)
+    """
+    # merge_asof needs both keys at the same datetime resolution
+    weather = df_weather[['Timestamp', 'Temperature']].dropna(subset=['Timestamp'])
+    weather = weather.astype({'Timestamp': 'datetime64[ns]'})
+    if not weather['Timestamp'].is_monotonic_increasing:
+        weather = weather.sort_values('Timestamp', kind='stable')
+
+    departures = departure_times.astype('datetime64[ns]').rename('departure_time').to_frame()
+    departures['row'] = range(len(departures))
+    departures = departures.dropna(subset=['departure_time']).sort_values('departure_time', kind='stable')
+
+    matched = pd.merge_asof(
+        departures,
+        weather,
+        left_on='departure_time',
+        right_on='Timestamp',
+        direction='nearest',
+        tolerance=tolerance
+    )
+
+    # An empty weather frame (no readings in the window) has object columns, so make the result numeric
+    temperatures = pd.Series(float('nan'), index=departure_times.index, dtype='float64')
+    temperatures.iloc[matched['row'].to_numpy()] = pd.to_numeric(matched['Temperature'], errors='coerce').to_numpy()
+    return temperatures
+
+
+def parse_departure_times(df_departures):
+    """
+    Build departure datetimes from the 'date' column and HH-MM-SS.jpg image names.
+
+    Seconds are dropped, and hours above 23 are shifted back by 12 as before.
+    Rows that cannot be parsed become NaT and are reported in a single summary line.
+
+    Parameters:
+    - df_departures: Frame with 'date' and 'image_name' columns
+
+    Returns:
+    - Series of datetimes aligned to df_departures' index
+    """
+    stems = df_departures['image_name'].astype(str).str.split('.', n=1).str[0]
+    time_parts = stems.str.extract(r'^\s*(\d+)-(\d+)(?:-|$)')
+    hours = pd.to_numeric(time_parts[0])
+    minutes = pd.to_numeric(time_parts[1])
+
+    # Adjust hour for PM times (after 12)
+    hours = hours.where(hours <= 23, hours - 12)
+    valid_time = hours.between(0, 23) & minutes.between(0, 59)
+
+    dates = pd.to_datetime(df_departures['date'], errors='coerce')
+    offsets = pd.to_timedelta(hours * 60 + minutes, unit='m')
+    departure_times = (dates + offsets).where(valid_time)
+
+    bad_rows = int(departure_times.isna().sum())
+    if bad_rows:
+        examples = df_departures.loc[departure_times.isna(), 'image_name'].head(3).tolist()
+        print(f"Error parsing datetime for {bad_rows} departure row(s), e.g. {examples}")
+
+    return departure_times
@@ -0,0 +1,79 @@
+import gzip
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from flask import request, make_response
+from werkzeug.http import is_resource_modified
+from .data_cache import data_version
+
+# Responses smaller than this are sent uncompressed
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+# Changes on every restart, so a deploy invalidates cached responses
+SERVER_START = time.time()
+
+
+def current_hour_start():
+    """Start of the current hour, so relative ranges ("last 7 days") revalidate hourly"""
+    return time.time() // 3600 * 3600
+
+
+def gzip_response(response):
+    """Compress a response body in place if the client accepts gzip and it is large enough"""
+    response.vary.add('Accept-Encoding')
+    if ('gzip' not in request.accept_encodings or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return False
+
+    body = response.get_data()
+    if len(body) < GZIP_MIN_SIZE:
+        return False
+
+    response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return True
+
+
+def conditional(*datasets):
+    """
+    Decorator adding ETag/Last-Modified validators and gzip to a data endpoint.
+
+    The validators are derived from the versions of the datasets the endpoint
+    reads, the full request path (so query parameters are included), the
+    current hour and the server start time. If the client already has the
+    current version, a 304 is returned without running the view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = [data_version(name) for name in datasets]
+            hour = current_hour_start()
+            tag_source = repr((request.full_path, SERVER_START, hour, [version for version, _ in versions]))
+            etag = hashlib.sha1(tag_source.encode()).hexdigest()
+
+            modified_times = [modified for _, modified in versions if modified is not None]
+            last_modified = datetime.fromtimestamp(max(modified_times + [SERVER_START, hour]), timezone.utc)
+
+            # Either the plain or the gzip variant of the tag means the client is current
+            if not (is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+                    and is_resource_modified(request.environ, etag=etag + '-gz',
+                                             last_modified=last_modified)):
+                response = make_response('', 304)
+                response.set_etag(etag + '-gz' if request.if_none_match.contains(etag + '-gz') else etag)
+                response.last_modified = last_modified
+                response.vary.add('Accept-Encoding')
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            gzipped = gzip_response(response)
+            response.set_etag(etag + '-gz' if gzipped else etag)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
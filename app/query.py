@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+import pandas as pd
+
+# Resolution name -> resampling frequency (None keeps rows as stored)
+RESOLUTIONS = {
+    'raw': None,
+    'hourly': pd.offsets.Hour(),
+    'daily': pd.offsets.Day(),
+    'weekly': pd.offsets.Week(weekday=0),  # Weeks start on Monday
+}
+
+
+class QueryError(ValueError):
+    """Invalid query parameter; reported to the client as a 400 response"""
+
+
+def parse_time(value, name):
+    """Parse a start/end parameter given as a date or ISO datetime"""
+    try:
+        timestamp = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        timestamp = pd.NaT
+    # An empty value parses as NaT, which would silently match no rows
+    if timestamp is pd.NaT:
+        raise QueryError(f"Invalid {name}: {value!r}, expected YYYY-MM-DD or an ISO datetime")
+    return timestamp
+
+
+def time_range(args, default_days=None):
+    """
+    Read the start and end parameters.
+
+    A date-only end includes that whole day. Without a start, the range begins
+    default_days before now (or is open if default_days is None).
+
+    Returns:
+    - (start, end) tuple; either may be None
+    """
+    start = None
+    if 'start' in args:
+        start = parse_time(args['start'], 'start')
+    elif default_days is not None:
+        start = datetime.now() - timedelta(days=default_days)
+
+    end = None
+    if 'end' in args:
+        end = parse_time(args['end'], 'end')
+        if len(args['end'].strip()) == len('YYYY-MM-DD'):
+            end += timedelta(days=1)
+
+    if start is not None and end is not None and start >= end:
+        raise QueryError("start must be before end")
+    return start, end
+
+
+def field_list(args, available, default=None):
+    """
+    Read the comma-separated fields parameter.
+
+    Parameters:
+    - args: Request query arguments
+    - available: Field names the endpoint can return
+    - default: Fields returned when the parameter is absent (all if None)
+    """
+    if 'fields' not in args:
+        return list(default if default is not None else available)
+
+    fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown or not fields:
+        raise QueryError(f"Unknown fields: {', '.join(unknown) or '(none given)'}; "
+                         f"available: {', '.join(available)}")
+    return list(dict.fromkeys(fields))
+
+
+def resolution_param(args, allowed, default='raw'):
+    """Read the resolution parameter, restricted to the ones the endpoint supports"""
+    resolution = args.get('resolution', default)
+    if resolution not in allowed:
+        raise QueryError(f"Unsupported resolution: {resolution!r}; use one of: {', '.join(allowed)}")
+    return resolution
+
+
+def resample(df, time_column, resolution, how='mean'):
+    """
+    Aggregate rows into hourly, daily or weekly buckets on the server.
+
+    Numeric columns are combined with `how` ('mean' or 'sum'); other columns
+    keep their last value. Buckets without any rows are dropped.
+    """
+    frequency = RESOLUTIONS[resolution]
+    if frequency is None or df.empty:
+        return df
+
+    grouper = pd.Grouper(key=time_column, freq=frequency, label='left', closed='left')
+    value_columns = [column for column in df.columns if column != time_column]
+    numeric = set(df[value_columns].select_dtypes('number').columns)
+    aggregations = {column: how if column in numeric else 'last' for column in value_columns}
+
+    grouped = df.groupby(grouper)
+    result = grouped.agg(aggregations) if aggregations else pd.DataFrame(index=grouped.size().index)
+    result = result[grouped.size() > 0]
+    return result.reset_index()
@@ -1,236 +1,194 @@
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, current_app, request
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
 import os
 import subprocess
+from .data_cache import get_frame, read_range, latest_row
+from .departures import nearest_temperature, parse_departure_times, DEFAULT_TEMPERATURE_TOLERANCE
+from .query import QueryError, time_range, field_list, resolution_param, resample
+from .http_cache import conditional
+from .serialize import success_response
 
 # Define the blueprint
 main = Blueprint("main", __name__)
 
-# Helper function to get the full path to data files
-def get_data_file_path(filename):
-    """Helper function to construct path to data files"""
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(current_dir, 'data', filename)
+# Fields that can be selected on the endpoints built from fixed structures
+WEATHER_FIELDS = ['Rainfall', 'Cloud_Cover', 'Weather_Description', 'Temperature', 'Humidity',
+                  'Red', 'Green', 'Blue', 'Color', 'Lux', 'Weather_Stale']
+MOON_FIELDS = ['Dawn', 'Dusk', 'Moonrise', 'Moonset', 'Moon Phase (%)']
+MOTH_SIZE_FIELDS = ['mini_moths', 'medium_moths', 'large_moths']
+MOTH_PERIOD_FIELDS = ['morning', 'afternoon']
+WEATHER_DAILY_FIELDS = ['temperature', 'humidity', 'cloudCover']
+DEPARTURE_FIELDS = ['time_distribution', 'temperature_analysis', 'stats']
 
-# Define the main index route
-@main.route("/")
-def index():
-    # Load weather data
-    weather_file = get_data_file_path('weather_data_log.csv')  # Adjusted path
-    df = pd.read_csv(weather_file)
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+# Report invalid query parameters as JSON
+@main.errorhandler(QueryError)
+def handle_query_error(error):
+    return jsonify({"status": "error", "message": str(error)}), 400
 
-    # Get the last 7 days of data
-    week_ago = datetime.now() - timedelta(days=7)
-    df = df[df['Timestamp'] >= week_ago]
+def load_weather(default_days=None):
+    """Weather rows for the requested range and fields, resampled as requested"""
+    start, end = time_range(request.args, default_days)
+    fields = field_list(request.args, WEATHER_FIELDS)
+    resolution = resolution_param(request.args, ['raw', 'hourly', 'daily', 'weekly'])
 
-    # Prepare data for the template
-    weather_data = df.to_dict('records')
-    for record in weather_data:
-        record['Timestamp'] = record['Timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+    df = read_range('weather', start, end)
+    if 'fields' in request.args:
+        df = df[['Timestamp'] + [field for field in fields if field in df.columns]]
+    return resample(df, 'Timestamp', resolution)
 
-    # Render the index.html template
-    return render_template("index.html", weather_data=weather_data)
+def load_rollup(default_days=None, active_column=None):
+    """Daily rollup rows for the requested range, summed into weeks if requested"""
+    start, end = time_range(request.args, default_days)
+    resolution = resolution_param(request.args, ['daily', 'weekly'], default='daily')
+
+    rollup = read_range('daily_rollup', start, end)
+    if resolution == 'weekly':
+        rollup = resample(rollup, 'date', resolution, how='sum')
+    if active_column is not None:
+        rollup = rollup[rollup[active_column] > 0]
+    return rollup
+
+# Define the main index route
+@main.route("/")
+def index():
+    # The dashboard loads its data from the API, so the page itself needs none
+    return render_template("index.html")
 
 # Define the API route for hourly weather data
 @main.route("/api/weather/hourly")
+@conditional('weather')
 def api_weather_hourly():
-    # Load weather data
-    weather_file = get_data_file_path('weather_data_log.csv')  # Adjusted path
-    df = pd.read_csv(weather_file)
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-
-    # Get the last 7 days of data
-    week_ago = datetime.now() - timedelta(days=7)
-    df = df[df['Timestamp'] >= week_ago]
-
-    # Return the data as JSON
-    return jsonify({
-        "status": "success",
-        "data": df.to_dict('records')
-    })
+    # Last 7 days by default; start, end, fields and resolution narrow it down
+    df = load_weather(default_days=7)
+
+    # Return the data as JSON, one array per column
+    return success_response(df)
+
+@main.route("/api/weather/latest")
+@conditional('weather')
+def api_weather_latest():
+    # Only the most recent reading, for the current conditions display
+    fields = field_list(request.args, WEATHER_FIELDS)
+    df = latest_row('weather')
+    if df.empty:
+        return jsonify({"status": "error", "message": "No weather data available"}), 404
+
+    latest = df.iloc[-1]
+    if 'fields' in request.args:
+        latest = latest[['Timestamp'] + [field for field in fields if field in latest.index]]
+    return success_response(latest.to_dict())
 
 @main.route("/api/moths/monthly")
+@conditional('daily_rollup')
 def api_moths_monthly():
-    # Load moth data
-    moth_file = get_data_file_path('moth_measurements.csv')
-    df = pd.read_csv(moth_file)
-    df['date'] = pd.to_datetime(df['date'])  # Convert date column to datetime
-
-    # Filter data for the past month
-    one_month_ago = datetime.now() - timedelta(days=30)
-    df = df[df['date'] >= one_month_ago]
-
-    # Group by day and calculate size categories
-    grouped = df.groupby(df['date'].dt.date).agg(
-        mini_moths=('length_mm', lambda x: (x < 25).sum()),
-        medium_moths=('length_mm', lambda x: ((x >= 25) & (x <= 45)).sum()),
-        large_moths=('length_mm', lambda x: (x > 45).sum())
-    ).reset_index()
-
-    # Return JSON data
-    return {
-        "status": "success",
-        "data": grouped.to_dict(orient='records')
-    }
+    # Load the per-day rollup for the past month, keeping only days with measured moths
+    rollup = load_rollup(default_days=30, active_column='moths_measured')
+    fields = field_list(request.args, MOTH_SIZE_FIELDS)
+
+    # Size category counts per day, morning and afternoon combined
+    grouped = pd.DataFrame({
+        'date': rollup['date'].dt.strftime('%Y-%m-%d'),
+        'mini_moths': rollup['morning_mini'] + rollup['afternoon_mini'],
+        'medium_moths': rollup['morning_medium'] + rollup['afternoon_medium'],
+        'large_moths': rollup['morning_large'] + rollup['afternoon_large']
+    })
+
+    # Return JSON data, one array per column
+    return success_response(grouped[['date'] + fields])
 
 @main.route("/api/moon/monthly")
+@conditional('moon')
 def api_moon_monthly():
-    # Load moon data
-    moon_file = get_data_file_path('day-moon-light.csv')
-    df = pd.read_csv(moon_file)
-    df['Date'] = pd.to_datetime(df['Date'])
-    
-    # Filter data for the past month
-    one_month_ago = datetime.now() - timedelta(days=30)
-    df = df[df['Date'] >= one_month_ago]
-    
-    # Keep only the date and moon phase columns
-    result = df[['Date', 'Moon Phase (%)']].copy()
-    result['Date'] = result['Date'].dt.date
+    # Load moon data for the past month (Date column already parsed to datetime)
+    start, end = time_range(request.args, default_days=30)
+    fields = field_list(request.args, MOON_FIELDS, default=['Moon Phase (%)'])
+    resolution = resolution_param(request.args, ['raw', 'daily', 'weekly'])
+    df = read_range('moon', start, end, columns=['Date'] + fields)
     
-    # Remove duplicates keeping the first entry for each date
-    result = result.drop_duplicates(subset=['Date'], keep='first')
+    # Keep only the date and requested columns, one entry per date
+    result = df.drop_duplicates(subset=['Date'], keep='first')
+    result = resample(result, 'Date', resolution)
+    result['Date'] = result['Date'].dt.strftime('%Y-%m-%d')
     
-    return jsonify({
-        "status": "success",
-        "data": result.to_dict(orient='records')
-    })
+    return success_response(result)
 
 
 @main.route("/api/moths/daily")
+@conditional('daily_rollup')
 def api_moths_daily():
-    # Load moth measurement data only
-    measurements_file = get_data_file_path('moth_measurements.csv')
-    df = pd.read_csv(measurements_file)
-    
-    # Convert timestamp to datetime
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['date'] = df['timestamp'].dt.date
-    
-    # Add time of day classification (morning = before noon)
-    df['is_morning'] = df['timestamp'].dt.hour < 12
-    
-    # Calculate size categories based on length_mm
-    df['size_category'] = pd.cut(
-        df['length_mm'],
-        bins=[0, 25, 45, float('inf')],
-        labels=['mini', 'medium', 'large']
-    )
-    
-    # Group by date and time of day, count moths in each size category
-    result = []
-    for date, group in df.groupby('date'):
-        # Get morning counts
-        morning_group = group[group['is_morning']]
-        morning_counts = morning_group['size_category'].value_counts()
-        
-        # Get afternoon counts
-        afternoon_group = group[~group['is_morning']]
-        afternoon_counts = afternoon_group['size_category'].value_counts()
-        
-        entry = {
-            'date': date.strftime('%Y-%m-%d'),
-            'morning': {
-                'mini': int(morning_counts.get('mini', 0)),
-                'medium': int(morning_counts.get('medium', 0)),
-                'large': int(morning_counts.get('large', 0))
-            },
-            'afternoon': {
-                'mini': int(afternoon_counts.get('mini', 0)),
-                'medium': int(afternoon_counts.get('medium', 0)),
-                'large': int(afternoon_counts.get('large', 0))
-            }
-        }
-        result.append(entry)
-    
-    # Sort by date
-    result.sort(key=lambda x: x['date'])
-    
-    return jsonify({
-        "status": "success",
-        "data": result
-    })
+    # Load the per-day rollup, keeping only days with measured moths
+    rollup = load_rollup(active_column='moths_measured')
+    fields = field_list(request.args, MOTH_PERIOD_FIELDS)
+
+    # Morning (before noon) and afternoon counts per size category, one array per day column
+    result = {'date': rollup['date'].dt.strftime('%Y-%m-%d')}
+    for period in fields:
+        result[period] = {size: rollup[f'{period}_{size}'] for size in ('mini', 'medium', 'large')}
+
+    return success_response(result)
 
 
 @main.route("/api/weather/daily")
+@conditional('daily_rollup')
 def api_weather_daily():
-    weather_file = get_data_file_path('weather_data_log.csv')
-    df = pd.read_csv(weather_file)
-    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-    
-    # Calculate daily averages
-    daily = df.groupby(df['Timestamp'].dt.date).agg({
-        'Temperature': 'mean',
-        'Humidity': 'mean',
-        'Cloud_Cover': 'mean'
-    }).round(2)
-    
-    # Convert to records
-    result = []
-    for date, row in daily.iterrows():
-        result.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'temperature': float(row['Temperature']),
-            'humidity': float(row['Humidity']),
-            'cloudCover': float(row['Cloud_Cover'])
-        })
-    
-    return jsonify({
-        "status": "success",
-        "data": result
+    # Load the per-day rollup, keeping only days with weather readings
+    rollup = load_rollup(active_column='weather_samples')
+    fields = field_list(request.args, WEATHER_DAILY_FIELDS)
+
+    # Calculate daily averages from the stored sums and counts
+    result = pd.DataFrame({
+        'date': rollup['date'].dt.strftime('%Y-%m-%d'),
+        'temperature': (rollup['temperature_sum'] / rollup['temperature_count']).round(2),
+        'humidity': (rollup['humidity_sum'] / rollup['humidity_count']).round(2),
+        'cloudCover': (rollup['cloud_cover_sum'] / rollup['cloud_cover_count']).round(2)
     })
 
+    return success_response(result[['date'] + fields])
+
 
 
 
 @main.route("/api/moths/departures")
+@conditional('departures', 'weather')
 def api_moths_departures():
-    # Load departure data and weather data
-    departures_file = get_data_file_path('moth_departures.csv')
-    weather_file = get_data_file_path('weather_data_log.csv')
-    
-    df_departures = pd.read_csv(departures_file)
-    df_weather = pd.read_csv(weather_file)
-    
-    # Fix datetime parsing by handling 24-hour format correctly
-    def parse_datetime(row):
-        try:
-            # Extract hour and minute from image filename
-            time_parts = row['image_name'].split('.')[0].split('-')
-            hour = int(time_parts[0])
-            minute = int(time_parts[1])
-            
-            # Adjust hour for PM times (after 12)
-            if hour > 23:  # For times like 15:55, convert to 03:55 PM
-                hour = hour - 12
-                
-            # Create datetime with the adjusted hour
-            return pd.to_datetime(f"{row['date']} {hour:02d}:{minute:02d}:00")
-        except Exception as e:
-            print(f"Error parsing datetime for row: {row}, Error: {e}")
-            return pd.NaT
+    start, end = time_range(request.args)
+    fields = field_list(request.args, DEPARTURE_FIELDS)
+    resolution_param(request.args, ['raw'])
+
+    # Load departure data
+    df_departures = get_frame('departures').copy()
     
-    # Apply the datetime parsing
-    df_departures['datetime'] = df_departures.apply(parse_datetime, axis=1)
+    # Parse departure times from the image file names
+    df_departures['datetime'] = parse_departure_times(df_departures)
     
-    # Remove rows with invalid datetimes
+    # Remove rows with invalid datetimes, and those outside the requested range
     df_departures = df_departures.dropna(subset=['datetime'])
+    if start is not None:
+        df_departures = df_departures[df_departures['datetime'] >= start]
+    if end is not None:
+        df_departures = df_departures[df_departures['datetime'] < end]
+
+    # Nothing to analyze in an empty window
+    if df_departures.empty:
+        data = {
+            "time_distribution": {"times": [], "counts": []},
+            "temperature_analysis": {"ranges": [], "avg_times": [], "counts": []},
+            "stats": {"total_moths": 0, "avg_departure_time": None, "temp_correlation": None}
+        }
+        return success_response({field: data[field] for field in fields})
     
-    # Convert weather timestamps
-    df_weather['Timestamp'] = pd.to_datetime(df_weather['Timestamp'])
-    
-    # Function to find closest temperature reading
-    def get_closest_temp(departure_time):
-        if pd.isna(departure_time):
-            return None
-        time_diff = abs(df_weather['Timestamp'] - departure_time)
-        closest_idx = time_diff.idxmin()
-        return df_weather.loc[closest_idx, 'Temperature']
-    
-    # Add temperature data to departures
-    df_departures['temperature'] = df_departures['datetime'].apply(get_closest_temp)
+    # Add the closest temperature reading to each departure
+    tolerance = current_app.config.get('DEPARTURE_TEMPERATURE_TOLERANCE', DEFAULT_TEMPERATURE_TOLERANCE)
+    if tolerance is not None and not df_departures.empty:
+        # Only weather readings that can match a departure are needed
+        df_weather = read_range('weather',
+                                start=df_departures['datetime'].min() - tolerance,
+                                end=df_departures['datetime'].max() + tolerance + pd.Timedelta(seconds=1),
+                                columns=['Timestamp', 'Temperature'])
+    else:
+        df_weather = get_frame('weather')
+    df_departures['temperature'] = nearest_temperature(df_departures['datetime'], df_weather, tolerance)
     
     # Create time-based distribution
     time_dist = df_departures.groupby('time_since_red_minutes')['moths_departed'].sum().reset_index()
@@ -279,21 +237,20 @@ def api_moths_departures():
         ))
     }
     
-    return jsonify({
-        "status": "success",
-        "data": {
-            "time_distribution": {
-                "times": time_dist['time_since_red_minutes'].tolist(),
-                "counts": time_dist['moths_departed'].tolist()
-            },
-            "temperature_analysis": {
-                "ranges": temp_analysis['temp_bin'].tolist(),
-                "avg_times": temp_analysis['time_since_red_minutes'].tolist(),
-                "counts": temp_analysis['moths_departed'].tolist()
-            },
-            "stats": stats
-        }
-    })
+    data = {
+        "time_distribution": {
+            "times": time_dist['time_since_red_minutes'],
+            "counts": time_dist['moths_departed']
+        },
+        "temperature_analysis": {
+            "ranges": temp_analysis['temp_bin'],
+            "avg_times": temp_analysis['time_since_red_minutes'],
+            "counts": temp_analysis['moths_departed']
+        },
+        "stats": stats
+    }
+    
+    return success_response({field: data[field] for field in fields})
 
 @main.route("/api/lights/warm")
 def warm_light():
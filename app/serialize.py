@@ -0,0 +1,81 @@
+import json
+import math
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+# Datetimes are sent as naive ISO 8601 strings (local time, as logged)
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# Values written by the collectors for readings that were not available
+MISSING_MARKERS = ['N/A']
+
+
+def scalar_value(value):
+    """Convert a single numpy/pandas value to a JSON-ready Python value (missing -> None)"""
+    if isinstance(value, np.generic):
+        value = pd.Timestamp(value) if isinstance(value, np.datetime64) else value.item()
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime(ISO_FORMAT)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, str) and value in MISSING_MARKERS:
+        return None
+    return value
+
+
+def values_json(series):
+    """
+    Serialize one column as a JSON array.
+
+    Datetimes become ISO strings; NaN, NaT, infinities and "N/A" become null.
+    Floats are written in their shortest round-trip form, as json.dumps does.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.dt.strftime(ISO_FORMAT)
+    elif isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    elif pd.api.types.is_float_dtype(series):
+        # Shortest form that reads back as the same float (85.67, not 85.670000000000002)
+        return json.dumps([value if math.isfinite(value) else None
+                           for value in series.to_numpy(dtype='float64').tolist()], separators=(',', ':'))
+
+    if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        series = series.mask(series.isin(MISSING_MARKERS))
+    return series.to_json(orient='values')
+
+
+def frame_json(df):
+    """Serialize a frame column-wise: {"column": [values, ...], ...}"""
+    return '{' + ','.join(
+        f'{json.dumps(str(column))}:{values_json(df[column])}' for column in df.columns
+    ) + '}'
+
+
+def to_json(value):
+    """
+    Serialize nested dicts and lists that may hold frames, series and numpy/pandas values.
+
+    Frames and series are written column-wise by pandas instead of being
+    converted to one Python object per row.
+    """
+    if isinstance(value, pd.DataFrame):
+        return frame_json(value)
+    if isinstance(value, (pd.Series, pd.Index, np.ndarray)):
+        return values_json(pd.Series(value))
+    if isinstance(value, dict):
+        return '{' + ','.join(f'{json.dumps(str(key))}:{to_json(item)}' for key, item in value.items()) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ','.join(to_json(item) for item in value) + ']'
+    return json.dumps(scalar_value(value), allow_nan=False)
+
+
+def success_response(data):
+    """JSON response {"status": "success", "data": ...} with data serialized by to_json"""
+    body = '{"status":"success","data":' + to_json(data) + '}'
+    return current_app.response_class(body, mimetype='application/json')
@@ -40,7 +40,7 @@ const lastNightMoths = (function() {
                     console.error('LastNightMoths: Moths API error:', error);
                     return { status: 'error', error: 'Failed to load moth data' };
                 }),
-            fetch('/api/weather/hourly')
+            fetch('/api/weather/latest?fields=Temperature')
                 .then(res => res.json())
                 .catch(error => {
                     console.error('LastNightMoths: Weather API error:', error);
@@ -48,16 +48,16 @@ const lastNightMoths = (function() {
                 })
         ])
         .then(([mothResult, weatherResult]) => {
-            if (mothResult.status !== 'success' || !mothResult.data || mothResult.data.length === 0) {
+            if (mothResult.status !== 'success' || !mothResult.data || mothResult.data.date.length === 0) {
                 throw new Error('No moth data available');
             }
 
-            if (weatherResult.status !== 'success' || !weatherResult.data || weatherResult.data.length === 0) {
+            if (weatherResult.status !== 'success' || !weatherResult.data) {
                 throw new Error('No weather data available');
             }
 
-            mothData = mothResult.data[mothResult.data.length - 1];
-            weatherData = weatherResult.data[weatherResult.data.length - 1];
+            mothData = lastDay(mothResult.data);
+            weatherData = weatherResult.data;
             
             if (!isValidMothData(mothData)) {
                 throw new Error('Invalid moth data structure');
@@ -71,6 +71,22 @@ const lastNightMoths = (function() {
         });
     }
 
+    function lastDay(columns) {
+        // The API returns one array per column; pick out the most recent day
+        const last = columns.date.length - 1;
+        const day = { date: columns.date[last] };
+        ['morning', 'afternoon'].forEach(period => {
+            if (columns[period]) {
+                day[period] = {
+                    mini: columns[period].mini[last],
+                    medium: columns[period].medium[last],
+                    large: columns[period].large[last]
+                };
+            }
+        });
+        return day;
+    }
+
     function isValidMothData(data) {
         return data && 
                typeof data === 'object' &&
@@ -22,7 +22,7 @@ const mothCharts = (function () {
         Promise.all([
             fetch('/api/moths/daily').then(response => response.json()),
             fetch('/api/moon/monthly').then(response => response.json()),
-            fetch('/api/weather/hourly').then(response => response.json())
+            fetch('/api/weather/daily').then(response => response.json())
         ])
         .then(([mothResult, moonResult, weatherResult]) => {
             if (mothResult.status === 'success' && 
@@ -38,39 +38,21 @@ const mothCharts = (function () {
         .catch(error => console.error('Error loading data:', error));
     }
 
-    function processWeatherData(rawData) {
+    function processWeatherData(dailyColumns) {
+        // Daily averages are computed on the server; index them by date
         const dailyData = {};
         
-        rawData.forEach(record => {
-            const date = record.Timestamp.split(' ')[0];
-            if (!dailyData[date]) {
-                dailyData[date] = {
-                    temperature: [],
-                    humidity: [],
-                    cloudCover: []
-                };
-            }
-            
-            dailyData[date].temperature.push(record.Temperature);
-            dailyData[date].humidity.push(record.Humidity);
-            dailyData[date].cloudCover.push(record.Cloud_Cover);
-        });
-
-        Object.keys(dailyData).forEach(date => {
+        dailyColumns.date.forEach((date, i) => {
             dailyData[date] = {
-                temperature: calculateAverage(dailyData[date].temperature),
-                humidity: calculateAverage(dailyData[date].humidity),
-                cloudCover: calculateAverage(dailyData[date].cloudCover)
+                temperature: dailyColumns.temperature[i],
+                humidity: dailyColumns.humidity[i],
+                cloudCover: dailyColumns.cloudCover[i]
             };
         });
 
         return dailyData;
     }
 
-    function calculateAverage(arr) {
-        return arr.reduce((a, b) => a + b, 0) / arr.length;
-    }
-
     function setupToggleControls() {
         const controlsContainer = document.createElement('div');
         controlsContainer.className = 'metric-toggles';
@@ -105,8 +87,8 @@ const mothCharts = (function () {
     }
 
 function createChart() {
-    const dates = mothData.map(d => {
-        const date = new Date(d.date);
+    const dates = mothData.date.map(d => {
+        const date = new Date(d);
         return date.toLocaleDateString('en-US', {
             month: 'short',
             day: 'numeric'
@@ -120,7 +102,7 @@ function createChart() {
         traces.push({
             name: 'Dawn - Mini',
             x: [date],
-            y: [mothData[i].morning.mini],
+            y: [mothData.morning.mini[i]],
             type: 'bar',
             marker: { color: 'rgba(255, 205, 86, 1)' },
             showlegend: i === 0,
@@ -133,7 +115,7 @@ function createChart() {
         traces.push({
             name: 'Dawn - Medium',
             x: [date],
-            y: [mothData[i].morning.medium],
+            y: [mothData.morning.medium[i]],
             type: 'bar',
             marker: { color: 'rgba(255, 159, 64, 1)' },
             showlegend: i === 0,
@@ -146,7 +128,7 @@ function createChart() {
         traces.push({
             name: 'Dawn - Large',
             x: [date],
-            y: [mothData[i].morning.large],
+            y: [mothData.morning.large[i]],
             type: 'bar',
             marker: { color: 'rgba(255, 99, 132, 1)' },
             showlegend: i === 0,
@@ -160,7 +142,7 @@ function createChart() {
         traces.push({
             name: 'Dusk - Mini',
             x: [date],
-            y: [mothData[i].afternoon.mini],
+            y: [mothData.afternoon.mini[i]],
             type: 'bar',
             marker: { color: 'rgba(153, 102, 255, 1)' },
             showlegend: i === 0,
@@ -173,7 +155,7 @@ function createChart() {
         traces.push({
             name: 'Dusk - Medium',
             x: [date],
-            y: [mothData[i].afternoon.medium],
+            y: [mothData.afternoon.medium[i]],
             type: 'bar',
             marker: { color: 'rgba(54, 162, 235, 1)' },
             showlegend: i === 0,
@@ -186,7 +168,7 @@ function createChart() {
         traces.push({
             name: 'Dusk - Large',
             x: [date],
-            y: [mothData[i].afternoon.large],
+            y: [mothData.afternoon.large[i]],
             type: 'bar',
             marker: { color: 'rgba(75, 192, 192, 1)' },
             showlegend: i === 0,
@@ -201,7 +183,7 @@ function createChart() {
         traces.push({
             name: 'Moon Phase',
             x: dates,
-            y: moonData.map(d => d['Moon Phase (%)']),
+            y: moonData['Moon Phase (%)'],
             type: 'scatter',
             mode: 'lines+markers',
             line: { color: 'rgba(255, 206, 86, 1)', width: 2 },
@@ -217,21 +199,21 @@ function createChart() {
             weatherMetrics.push({
                 name: 'Temperature (°C)',
                 color: 'rgba(255, 99, 132, 1)',
-                values: dates.map(date => weatherData[date]?.temperature)
+                values: mothData.date.map(date => weatherData[date]?.temperature)
             });
         }
         if (visibilitySettings.humidity) {
             weatherMetrics.push({
                 name: 'Humidity (%)',
                 color: 'rgba(54, 162, 235, 1)',
-                values: dates.map(date => weatherData[date]?.humidity)
+                values: mothData.date.map(date => weatherData[date]?.humidity)
             });
         }
         if (visibilitySettings.cloudCover) {
             weatherMetrics.push({
                 name: 'Cloud Cover (%)',
                 color: 'rgba(75, 192, 192, 1)',
-                values: dates.map(date => weatherData[date]?.cloudCover)
+                values: mothData.date.map(date => weatherData[date]?.cloudCover)
             });
         }
 
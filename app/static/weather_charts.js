@@ -22,14 +22,16 @@ const weatherCharts = (function () {
     }
 
     function createChart(data) {
-        const rainfallData = data.map(d => d.Rainfall);
+        // data holds one array per column
+        const times = data.Timestamp.map(t => new Date(t));
+        const rainfallData = data.Rainfall;
         const rainfallRange = calculateRainfallRange(rainfallData);
 
         const traces = [
             {
                 name: 'Temperature (°C)',
-                x: data.map(d => new Date(d.Timestamp)),
-                y: data.map(d => d.Temperature),
+                x: times,
+                y: data.Temperature,
                 type: 'scatter',
                 mode: 'lines',
                 line: { color: 'rgb(255, 99, 132)' },
@@ -37,8 +39,8 @@ const weatherCharts = (function () {
             },
             {
                 name: 'Humidity (%)',
-                x: data.map(d => new Date(d.Timestamp)),
-                y: data.map(d => d.Humidity),
+                x: times,
+                y: data.Humidity,
                 type: 'scatter',
                 mode: 'lines',
                 line: { color: 'rgb(54, 162, 235)' },
@@ -46,8 +48,8 @@ const weatherCharts = (function () {
             },
             {
                 name: 'Cloud Cover (%)',
-                x: data.map(d => new Date(d.Timestamp)),
-                y: data.map(d => d.Cloud_Cover),
+                x: times,
+                y: data.Cloud_Cover,
                 type: 'scatter',
                 mode: 'lines',
                 line: { color: 'rgb(75, 192, 192)' },
@@ -55,7 +57,7 @@ const weatherCharts = (function () {
             },
             {
                 name: 'Rainfall (mm)',
-                x: data.map(d => new Date(d.Timestamp)),
+                x: times,
                 y: rainfallData,
                 type: 'scatter',
                 mode: 'lines',
@@ -124,10 +126,10 @@ const weatherCharts = (function () {
     }
 
     function loadWeatherData() {
-        fetch('/api/weather/hourly')
+        fetch('/api/weather/hourly?fields=Temperature,Humidity,Cloud_Cover,Rainfall')
             .then(response => response.json())
             .then(result => {
-                if (result.status === 'success' && result.data && result.data.length > 0) {
+                if (result.status === 'success' && result.data && result.data.Timestamp.length > 0) {
                     weatherData = result.data;  // Store the data
                     createChart(weatherData);
                     createMetricToggles();
@@ -11,11 +11,11 @@ const WeatherMetrics = (function() {
     }
 
     function loadLatestWeather() {
-        fetch('/api/weather/hourly')
+        fetch('/api/weather/latest?fields=Temperature,Humidity,Cloud_Cover,Rainfall')
             .then(res => res.json())
             .then(data => {
-                if (data.status === 'success' && data.data.length > 0) {
-                    updateWeatherDisplay(data.data[data.data.length - 1]);
+                if (data.status === 'success' && data.data) {
+                    updateWeatherDisplay(data.data);
                 }
             })
             .catch(err => console.error('Error fetching weather data:', err));
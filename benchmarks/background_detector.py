@@ -0,0 +1,119 @@
+"""
+Benchmark the background-model detector on a synthetic static-camera session.
+
+Runs a full-frame MothDetector and a BackgroundDetector over the same session:
+a sheet with moth-sized stains, moths arriving and leaving over the night (each
+shifting by a pixel or two between frames), fresh sensor noise on every frame,
+and a drop in brightness halfway through when the light changes. Reports the
+time per frame, the share of the moths present that each detector finds and the
+share of the frame the background detector searched. It doubles as a regression
+check: it exits with status 1 if the background detector finds noticeably fewer
+moths than the full-frame detector, reports a stain, or makes more other false
+detections.
+
+Run from the repository root:
+    python -m benchmarks.background_detector --frames 120
+"""
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'collecting_data'))
+from get_bounding_boxes import MothDetector
+from background_detector import BackgroundDetector
+
+
+# The background detector may miss at most this share of the moths the full-frame detector finds
+MIN_RECALL_RATIO = 0.98
+
+
+def make_session(frames, width, height, moths=40, stains=4, seed=0):
+    """
+    Return the empty sheet, the stain centres and a generator of (frame, moth centres).
+
+    Moths and stains are placed on a grid so that no two of them overlap, with folds in between.
+    """
+    rng = np.random.default_rng(seed)
+    sheet = np.full((height, width, 3), 200, np.uint8)
+    cells = [(x, y) for x in range(150, width - 150, 250) for y in range(150, height - 150, 250)]
+    for y in range(275, height, 250):
+        cv2.line(sheet, (0, y), (width, y + 40), (188, 188, 188), 9)  # faint folds, between the cells
+    order = rng.permutation(len(cells))
+    stain_centres = [cells[i] for i in order[:stains]]
+    moth_cells = [cells[i] for i in order[stains:stains + moths]]
+    for k, (x, y) in enumerate(stain_centres):
+        cv2.ellipse(sheet, (x, y), (45, 30), 30 * k, 0, 360, (60, 60, 60), -1)
+    sheet = cv2.GaussianBlur(sheet, (7, 7), 0)
+
+    arrivals = rng.integers(0, frames, len(moth_cells))
+    stays = rng.integers(frames // 10, frames, len(moth_cells))
+
+    def frames_of_session():
+        for i in range(frames):
+            frame = cv2.add(sheet, rng.integers(0, 9, sheet.shape, dtype=np.uint8))
+            centres = []
+            for k, (x, y) in enumerate(moth_cells):
+                if arrivals[k] <= i < arrivals[k] + stays[k]:
+                    centre = (x + int(rng.integers(-2, 3)), y + int(rng.integers(-2, 3)))
+                    cv2.ellipse(frame, centre, (40 + (5 * k) % 20, 28), 20 * k, 0, 360, (40, 40, 40), -1)
+                    centres.append(centre)
+            if i >= frames // 2:
+                frame = cv2.convertScaleAbs(frame, alpha=0.8)  # red light: dimmer
+            yield frame, centres
+
+    return cv2.cvtColor(sheet, cv2.COLOR_BGR2GRAY), stain_centres, frames_of_session()
+
+
+def near(box, centres, distance=20):
+    """Whether a box is centred within distance of one of the centres"""
+    x, y, w, h = box
+    return any(abs(x + w / 2 - cx) < distance and abs(y + h / 2 - cy) < distance for cx, cy in centres)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--frames', type=int, default=120, help='Frames in the session')
+    parser.add_argument('--width', type=int, default=2028, help='Frame width in pixels')
+    parser.add_argument('--height', type=int, default=1520, help='Frame height in pixels')
+    args = parser.parse_args()
+
+    empty_sheet, stains, session = make_session(args.frames, args.width, args.height)
+    full_detector = MothDetector()
+    background_detector = BackgroundDetector(empty_sheet=empty_sheet)
+
+    full_time = background_time = 0.0
+    moths_present = full_found = background_found = full_stains = background_stains = 0
+    full_other = background_other = 0
+    for frame, moths in session:
+        start = time.perf_counter()
+        full_boxes = full_detector.detect(frame)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        boxes = background_detector.detect(frame)
+        background_time += time.perf_counter() - start
+
+        moths_present += len(moths)
+        full_found += sum(1 for moth in moths if any(near(box, [moth]) for box in full_boxes))
+        background_found += sum(1 for moth in moths if any(near(box, [moth]) for box in boxes))
+        full_stains += sum(1 for box in full_boxes if near(box, stains))
+        background_stains += sum(1 for box in boxes if near(box, stains))
+        full_other += sum(1 for box in full_boxes if not near(box, moths + stains))
+        background_other += sum(1 for box in boxes if not near(box, moths + stains))
+
+    print(f"{args.frames} frames of {args.width}x{args.height}, {moths_present} moths present over the session")
+    print(f"Full-frame detector:  {full_time / args.frames * 1000:8.1f} ms/frame, "
+          f"{full_found / moths_present:.1%} of moths found, {full_stains} stain and {full_other} other false detections")
+    print(f"Background detector:  {background_time / args.frames * 1000:8.1f} ms/frame "
+          f"({full_time / background_time:.1f}x), {background_found / moths_present:.1%} of moths found, "
+          f"{background_stains} stain and {background_other} other false detections")
+    print(f"Background detector: {background_detector.summary()}")
+    if background_found < MIN_RECALL_RATIO * full_found or background_stains or background_other > full_other:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
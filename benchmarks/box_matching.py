@@ -0,0 +1,131 @@
+"""
+Benchmark matching moth detections across consecutive frames.
+
+Compares the original three-frame compare_bounding_boxes (nested loops over every
+box pair) with the grid-indexed, closest-first match_boxes it now wraps, on
+synthetic detections: moths that jitter slightly between frames, some arriving
+or leaving, plus noisy one-frame candidates. It doubles as a regression check:
+on well-separated moths, where the original matching is unambiguous, it exits
+with status 1 unless both find the same moths in all three frames.
+
+Run from the repository root:
+    python -m benchmarks.box_matching --moths 300 --noise 300
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'collecting_data'))
+from get_bounding_boxes import compare_bounding_boxes
+
+
+def make_detections(moths, noise, width=4056, height=3040, spacing=0, jitter=4, seed=0):
+    """
+    Three frames of (x, y, w, h) boxes.
+
+    Moths keep roughly the same position across the frames, except for a few that
+    arrive or leave; noise boxes appear in a single frame. With spacing > 0 moth
+    positions are at least that far apart.
+    """
+    rng = np.random.default_rng(seed)
+    positions = []
+    while len(positions) < moths:
+        x, y = rng.uniform(0, width - 100), rng.uniform(0, height - 100)
+        if all(abs(x - px) >= spacing or abs(y - py) >= spacing for px, py in positions):
+            positions.append((x, y))
+
+    frames = [[], [], []]
+    for k, (x, y) in enumerate(positions):
+        w, h = int(rng.integers(50, 90)), int(rng.integers(40, 80))
+        present = [k % 10 != 0, True, k % 10 != 1]  # some arrive late, some leave early
+        for frame, is_present in zip(frames, present):
+            if is_present:
+                dx, dy = rng.integers(-jitter, jitter + 1, 2)
+                frame.append((int(x + dx), int(y + dy), w, h))
+    for frame in frames:
+        for _ in range(noise // 3):
+            frame.append((int(rng.uniform(0, width - 100)), int(rng.uniform(0, height - 100)), 60, 60))
+        rng.shuffle(frame)
+    return [[tuple(box) for box in frame] for frame in frames]
+
+
+def legacy_compare_bounding_boxes(boxes1, boxes2, boxes3, threshold=20):
+    """The original nested-loop matcher"""
+    def box_center(box):
+        x, y, w, h = box
+        return (x + w / 2, y + h / 2)
+
+    def is_close(center1, center2, threshold):
+        return np.linalg.norm(np.array(center1) - np.array(center2)) < threshold
+
+    boxes_in_one_image = []
+    boxes_in_two_images = []
+    boxes_in_three_images = []
+    used_boxes2 = set()
+    used_boxes3 = set()
+    for i, box1 in enumerate(boxes1):
+        center1 = box_center(box1)
+        matches2 = [(j, box2) for j, box2 in enumerate(boxes2)
+                   if j not in used_boxes2 and is_close(center1, box_center(box2), threshold)]
+        if matches2:
+            for j, box2 in matches2:
+                center2 = box_center(box2)
+                matches3 = [(k, box3) for k, box3 in enumerate(boxes3)
+                           if k not in used_boxes3 and is_close(center2, box_center(box3), threshold)]
+                if matches3:
+                    k, box3 = matches3[0]
+                    boxes_in_three_images.append(box3)
+                    used_boxes2.add(j)
+                    used_boxes3.add(k)
+                    break
+                else:
+                    boxes_in_two_images.append(box2)
+                    used_boxes2.add(j)
+        else:
+            boxes_in_one_image.append(box1)
+    for j, box2 in enumerate(boxes2):
+        if j not in used_boxes2:
+            boxes_in_one_image.append(box2)
+    for k, box3 in enumerate(boxes3):
+        if k not in used_boxes3:
+            boxes_in_one_image.append(box3)
+    return boxes_in_one_image, boxes_in_two_images, boxes_in_three_images
+
+
+def time_matcher(compare, frames, repeat=3):
+    """Return the best time over `repeat` runs, and the result of the last one"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = compare(*frames)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--moths', type=int, default=300, help='Moths per night')
+    parser.add_argument('--noise', type=int, default=300, help='One-frame noise candidates over the three frames')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported)')
+    args = parser.parse_args()
+
+    frames = make_detections(args.moths, args.noise)
+    print(f"{sum(len(frame) for frame in frames)} detections over 3 frames")
+    legacy_time, legacy = time_matcher(legacy_compare_bounding_boxes, frames, args.repeat)
+    new_time, new = time_matcher(compare_bounding_boxes, frames, args.repeat)
+    print(f"Nested loops:  {legacy_time * 1000:9.2f} ms  ({len(legacy[2])} moths in all three frames)")
+    print(f"Grid matcher:  {new_time * 1000:9.2f} ms  ({len(new[2])} moths in all three frames, "
+          f"{legacy_time / new_time:.0f}x)")
+
+    # Moths further apart than the matching threshold can only be matched one way
+    separated = make_detections(args.moths, 0, spacing=60, seed=1)
+    identical = legacy_compare_bounding_boxes(*separated)[2] == compare_bounding_boxes(*separated)[2]
+    print(f"Same moths in all three frames on well-separated detections: {identical}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark the nearest-temperature join used by /api/moths/departures.
+
+Compares the original per-departure scan (abs difference + idxmin over the
+whole weather log) with the sorted as-of join in app.departures, on a
+synthetic year of hourly weather readings. Also checks that departures with
+no weather readings in their window (an empty, untyped weather frame, as a
+store returns for a range with no rows) get NaN temperatures. It doubles as
+a regression check: it exits with status 1 if the results differ or that
+case fails.
+
+Run from the repository root:
+    python -m benchmarks.departure_temperature_join --days 365
+"""
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from app.departures import nearest_temperature
+
+
+def make_synthetic_logs(days, departures_per_session, seed=0):
+    """Build an hourly weather log and dawn/dusk departure times spanning `days`"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01')
+
+    df_weather = pd.DataFrame({
+        'Timestamp': pd.date_range(start, periods=days * 24, freq='h'),
+        'Temperature': rng.normal(10, 5, days * 24).round(2)
+    })
+
+    sessions = []
+    for day in range(days):
+        for session_hour in (6, 18):
+            session_start = start + pd.Timedelta(days=day, hours=session_hour)
+            offsets = np.sort(rng.uniform(0, 30, departures_per_session))
+            sessions.append(session_start + pd.to_timedelta(offsets, unit='m'))
+    departure_times = pd.Series(np.concatenate(sessions))
+
+    return departure_times, df_weather
+
+
+def legacy_nearest_temperature(departure_times, df_weather):
+    """The original implementation: a full scan of the weather log per departure"""
+    def get_closest_temp(departure_time):
+        if pd.isna(departure_time):
+            return None
+        time_diff = abs(df_weather['Timestamp'] - departure_time)
+        closest_idx = time_diff.idxmin()
+        return df_weather.loc[closest_idx, 'Temperature']
+
+    return departure_times.apply(get_closest_temp)
+
+
+def time_call(func, *args, repeat=3):
+    """Return the best wall-clock time of `repeat` calls, and the last result"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--days', type=int, default=365, help='Length of the synthetic logs in days')
+    parser.add_argument('--departures', type=int, default=10, help='Departures per dawn/dusk session')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported)')
+    args = parser.parse_args()
+
+    departure_times, df_weather = make_synthetic_logs(args.days, args.departures)
+    print(f"{len(departure_times)} departures, {len(df_weather)} weather readings")
+
+    legacy_time, legacy = time_call(legacy_nearest_temperature, departure_times, df_weather, repeat=args.repeat)
+    asof_time, asof = time_call(nearest_temperature, departure_times, df_weather, None, repeat=args.repeat)
+
+    matches = np.allclose(legacy.astype(float), asof, equal_nan=True)
+    print(f"Legacy scan: {legacy_time * 1000:10.1f} ms")
+    print(f"As-of join:  {asof_time * 1000:10.1f} ms  ({legacy_time / asof_time:.0f}x faster)")
+    print(f"Results identical: {matches}")
+
+    # No weather readings in the window: every departure gets NaN
+    empty_weather = pd.DataFrame(columns=['Timestamp', 'Temperature'])
+    try:
+        empty = nearest_temperature(departure_times.head(5), empty_weather)
+        empty_ok = empty.dtype == 'float64' and empty.isna().all()
+    except Exception as e:
+        print(f"Empty weather window raised {type(e).__name__}: {e}")
+        empty_ok = False
+    print(f"Empty weather window gives NaN: {empty_ok}")
+
+    if not matches or not empty_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark writing sensor log rows with LogWriter against the original line-at-a-time appends.
+
+The original collectors opened the log, appended one ",".join-ed line and
+closed it for every row. Reports the time per row and the number of write
+calls for that and for LogWriter writing the same rows in batches (as the
+sensor daemon flushes them), under each fsync policy. Then checks that a
+description with commas and quotes reads back intact, that a line torn by a
+crash is cut off before the next append, and that rows with a column the
+header lacks start a new file. It doubles as a regression check: it exits
+with status 1 if any of these does not hold.
+
+Run from the repository root:
+    python -m benchmarks.log_writer --rows 2000 --batch 100
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'collecting_data'))
+from storage import LogWriter, CSVLogStore, log_files
+from collect_weather_data import LOG_COLUMNS
+
+
+def make_rows(count):
+    start = pd.Timestamp("2024-11-01")
+    return [{"Timestamp": str(start + pd.Timedelta(minutes=i)), "Rainfall": 0.2, "Cloud_Cover": 90,
+             "Weather_Description": "light rain", "Temperature": 12.5, "Humidity": 81, "Red": 40, "Green": 38,
+             "Blue": 35, "Color": 3200, "Lux": 12.5, "Weather_Stale": False} for i in range(count)]
+
+
+def line_at_a_time(path, rows):
+    """The original logging: open, append one naively joined line, close"""
+    for row in rows:
+        new_file = not os.path.exists(path)
+        with open(path, 'a') as f:
+            if new_file:
+                f.write(",".join(LOG_COLUMNS) + "\n")
+            f.write(",".join(str(row[column]) for column in LOG_COLUMNS) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def counting_writes(run):
+    """Run run() and return (seconds, number of write calls on files opened for appending)"""
+    writes = 0
+    real_open = open
+
+    class Counted:
+        def __init__(self, f):
+            self.f = f
+
+        def write(self, text):
+            nonlocal writes
+            writes += 1
+            return self.f.write(text)
+
+        def __getattr__(self, name):
+            return getattr(self.f, name)
+
+        def __enter__(self):
+            self.f.__enter__()
+            return self
+
+        def __exit__(self, *args):
+            return self.f.__exit__(*args)
+
+    def counted_open(file, mode='r', *args, **kwargs):
+        f = real_open(file, mode, *args, **kwargs)
+        return Counted(f) if 'a' in mode else f
+
+    import builtins
+    builtins.open = counted_open
+    try:
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start, writes
+    finally:
+        builtins.open = real_open
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2000, help='Rows written by each method')
+    parser.add_argument('--batch', type=int, default=100, help='Rows per LogWriter write')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="log_writer_")
+    rows = make_rows(args.rows)
+    failed = []
+    try:
+        seconds, writes = counting_writes(lambda: line_at_a_time(os.path.join(directory, "plain.csv"), rows))
+        print(f"{'Line at a time:':24}{seconds / args.rows * 1000:6.3f} ms/row, {writes} writes")
+
+        for policy in ("always", "interval", "never"):
+            writer = LogWriter(os.path.join(directory, policy), "Timestamp", fsync=policy)
+            seconds, writes = counting_writes(
+                lambda: [writer.write(rows[i:i + args.batch]) for i in range(0, args.rows, args.batch)])
+            print(f"{f'LogWriter ({policy}):':24}{seconds / args.rows * 1000:6.3f} ms/row, {writes} writes")
+            written = pd.concat([pd.read_csv(path) for path in log_files(os.path.join(directory, policy))])
+            if len(written) != args.rows:
+                failed.append(f"LogWriter ({policy}) wrote {len(written)} of {args.rows} rows")
+
+        # Descriptions with commas and quotes are quoted, not split into extra columns
+        store = CSVLogStore('weather', os.path.join(directory, "store"))
+        awkward = dict(rows[0], Weather_Description='light rain, "heavy" later')
+        store.append(pd.DataFrame([awkward]))
+        if store.read()['Weather_Description'].tolist() != [awkward['Weather_Description']]:
+            failed.append("a description with commas and quotes did not read back intact")
+
+        # A line torn by a crash is cut off by the next append
+        path = store.paths()[-1]
+        with open(path, 'a') as f:
+            f.write("2024-11-01 05:00:00,0.2,9")
+        store.append(pd.DataFrame([rows[1]]))
+        if len(store.read()) != 2:
+            failed.append("a partially written line was not cut off before appending")
+
+        # A column the header lacks starts a new file instead of misaligning the month's rows
+        store.append(pd.DataFrame([dict(rows[2], Pressure=1013)]))
+        df = store.read()
+        if len(store.paths()) != 2 or df['Pressure'].notna().sum() != 1 or len(df) != 3:
+            failed.append("rows with a new column were not written to a new file")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for failure in failed:
+        print(f"FAILED: {failure}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
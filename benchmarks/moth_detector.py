@@ -0,0 +1,116 @@
+"""
+Benchmark moth detection on a sequence of same-sized camera frames.
+
+Compares the original get_bounding_boxes pipeline (new CLAHE object, kernel
+and intermediate images on every call) with a reused MothDetector that writes
+into preallocated buffers, and with its coarse-to-fine mode, on synthetic
+frames with dark moth-sized blobs that depart, leaving the sheet empty. It
+doubles as a regression check: it exits with status 1 if either detector's
+boxes differ from the original pipeline, or if the coarse-to-fine mode is not
+faster than the reused detector.
+
+Run from the repository root:
+    python -m benchmarks.moth_detector --frames 20
+"""
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'collecting_data'))
+from get_bounding_boxes import MothDetector
+
+
+def make_synthetic_frames(count, width, height, moths=12, seed=0):
+    """Light, slightly noisy frames with dark elliptical moths that depart one by one"""
+    rng = np.random.default_rng(seed)
+    positions = [(int(rng.uniform(0.1, 0.9) * width), int(rng.uniform(0.1, 0.9) * height)) for _ in range(moths)]
+
+    frames = []
+    for i in range(count):
+        frame = np.full((height, width, 3), 200, np.uint8)
+        frame = cv2.add(frame, rng.integers(0, 9, frame.shape, dtype=np.uint8))
+        frame = cv2.GaussianBlur(frame, (7, 7), 0)
+        for k, (x, y) in enumerate(positions[:max(moths - i, 0)]):
+            cv2.ellipse(frame, (x, y), (40 + (5 * k) % 20, 28), 20 * k, 0, 360, (40, 40, 40), -1)
+        frames.append(frame)
+    return frames
+
+
+def legacy_bounding_boxes(image, mm_per_pixel=0.2033, min_size_mm=10, max_size_mm=70):
+    """The original per-call pipeline, on an already decoded image"""
+    min_contour_area = (min_size_mm / mm_per_pixel) ** 2
+    max_contour_area = (max_size_mm / mm_per_pixel) ** 2
+
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    clahe = cv2.createCLAHE(clipLimit=2.5, tileGridSize=(8, 8))
+    enhanced_gray = clahe.apply(gray)
+    blurred = cv2.GaussianBlur(enhanced_gray, (5, 5), 0)
+    adaptive_thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
+    _, global_thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    combined_thresh = cv2.addWeighted(adaptive_thresh, 0.7, global_thresh, 0.3, 0)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    cleaned_thresh = cv2.morphologyEx(combined_thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
+    contours, _ = cv2.findContours(cleaned_thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    bounding_boxes = []
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if min_contour_area < area < max_contour_area:
+            x, y, w, h = cv2.boundingRect(contour)
+            if 0.5 < w / h < 2.0 and area / (w * h) > 0.3:
+                bounding_boxes.append((x, y, w, h))
+    return bounding_boxes
+
+
+def time_sequence(detect, frames, repeat=3):
+    """Return the best per-frame time over `repeat` passes, and the boxes of the last pass"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        boxes = [detect(frame) for frame in frames]
+        best = min(best, (time.perf_counter() - start) / len(frames))
+    return best, boxes
+
+
+def same_boxes(expected, actual):
+    """Whether two per-frame lists of boxes match, ignoring the order within a frame"""
+    return all(sorted(e) == sorted(a) for e, a in zip(expected, actual))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--frames', type=int, default=20, help='Frames in the sequence')
+    parser.add_argument('--width', type=int, default=4056, help='Frame width in pixels')
+    parser.add_argument('--height', type=int, default=3040, help='Frame height in pixels')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported)')
+    args = parser.parse_args()
+
+    frames = make_synthetic_frames(args.frames, args.width, args.height)
+    print(f"{len(frames)} frames of {args.width}x{args.height}")
+
+    detector = MothDetector()
+    coarse_detector = MothDetector(coarse=True)
+    legacy_time, legacy = time_sequence(legacy_bounding_boxes, frames, args.repeat)
+    reused_time, reused = time_sequence(detector.detect, frames, args.repeat)
+    coarse_time, coarse = time_sequence(coarse_detector.detect, frames, args.repeat)
+
+    print(f"Per-call pipeline:  {legacy_time * 1000:8.1f} ms/frame")
+    print(f"Reused detector:    {reused_time * 1000:8.1f} ms/frame  ({legacy_time / reused_time:.2f}x)")
+    print(f"Coarse-to-fine:     {coarse_time * 1000:8.1f} ms/frame  ({legacy_time / coarse_time:.2f}x, "
+          f"scale {coarse_detector.scale:.2f})")
+
+    reused_ok = same_boxes(legacy, reused)
+    coarse_ok = same_boxes(legacy, coarse)
+    print(f"Reused detector boxes identical: {reused_ok}")
+    print(f"Coarse-to-fine boxes identical:  {coarse_ok}")
+    coarse_faster = coarse_time < reused_time
+    print(f"Coarse-to-fine faster:           {coarse_faster}")
+    if not (reused_ok and coarse_ok and coarse_faster):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
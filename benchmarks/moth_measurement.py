@@ -0,0 +1,126 @@
+"""
+Benchmark measuring moth length, width and angle from ROI contours.
+
+Compares the original double loop over convex hull points (re-projecting the
+whole contour at every new maximum) with the vectorized contour_dimensions used
+by MothAnalyzerTest.measure_moth_dimensions. It doubles as an equivalence check:
+it exits with status 1 unless both return identical values for every ROI.
+
+ROIs are the moth_*_at_*.jpg crops saved in session analysis directories under
+--roi-dir; without it, synthetic moth ROIs are used. Run from the repository root:
+    python -m benchmarks.moth_measurement --roi-dir ~/Documents/collecting_data/moths
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'collecting_data'))
+from get_bounding_boxes import MothDetector
+from moth_analyzer import contour_dimensions
+
+
+def make_synthetic_rois(count, seed=0):
+    """Light ROIs, each with one dark moth-shaped blob of random size, angle and ragged edge"""
+    rng = np.random.default_rng(seed)
+    rois = []
+    for _ in range(count):
+        length = int(rng.uniform(150, 500))
+        width = int(length * rng.uniform(0.3, 0.6))
+        size = int(length * 1.3)
+        roi = np.full((size, size, 3), 200, np.uint8)
+        center = (size // 2, size // 2)
+        cv2.ellipse(roi, center, (length // 2, width // 2), rng.uniform(0, 180), 0, 360, (40, 40, 40), -1)
+        # Wings and antennae give the outline a more irregular hull
+        for _ in range(6):
+            tip = (int(center[0] + rng.uniform(-0.5, 0.5) * length), int(center[1] + rng.uniform(-0.5, 0.5) * length))
+            cv2.line(roi, center, tip, (40, 40, 40), int(rng.integers(3, 12)))
+        roi = cv2.add(roi, rng.integers(0, 9, roi.shape, dtype=np.uint8))
+        rois.append(cv2.GaussianBlur(roi, (5, 5), 0))
+    return rois
+
+
+def load_rois(roi_dir):
+    """Saved moth ROIs from every session analysis directory below roi_dir"""
+    paths = sorted(glob.glob(os.path.join(roi_dir, '**', 'moth_*_at_*.jpg'), recursive=True))
+    return [roi for roi in (cv2.imread(path) for path in paths) if roi is not None]
+
+
+def largest_contours(rois):
+    """The contour measure_moth_dimensions measures in each ROI"""
+    detector = MothDetector()
+    contours = []
+    for roi in rois:
+        found, _ = cv2.findContours(detector.threshold(detector.enhance(roi)), cv2.RETR_EXTERNAL,
+                                    cv2.CHAIN_APPROX_SIMPLE)
+        if found:
+            contours.append(max(found, key=cv2.contourArea))
+    return contours
+
+
+def legacy_dimensions(largest_contour):
+    """The original pairwise loop from measure_moth_dimensions"""
+    hull = cv2.convexHull(largest_contour)
+    hull_points = hull.reshape(-1, 2)
+
+    max_length = 0
+    max_width = 0
+    angle = 0
+    for i in range(len(hull_points)):
+        for j in range(i + 1, len(hull_points)):
+            pt1 = hull_points[i]
+            pt2 = hull_points[j]
+            length = np.sqrt((pt2[0] - pt1[0])**2 + (pt2[1] - pt1[1])**2)
+            if length > max_length:
+                max_length = length
+                angle = np.degrees(np.arctan2(pt2[1] - pt1[1], pt2[0] - pt1[0]))
+                points_arr = largest_contour.reshape(-1, 2)
+                length_vector = np.array([pt2 - pt1]) / np.linalg.norm(pt2 - pt1)
+                perp_vector = np.array([-length_vector[0][1], length_vector[0][0]])
+                projections = np.abs(np.dot(points_arr - pt1, perp_vector))
+                max_width = np.max(projections)
+    return max_length, max_width, angle
+
+
+def time_contours(measure, contours, repeat=3):
+    """Return the best per-contour time over `repeat` passes, and the results of the last pass"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [measure(contour) for contour in contours]
+        best = min(best, (time.perf_counter() - start) / len(contours))
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--roi-dir', default=None, help='Directory searched for saved moth ROIs')
+    parser.add_argument('--rois', type=int, default=40, help='Synthetic ROIs when --roi-dir is not given')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported)')
+    args = parser.parse_args()
+
+    rois = load_rois(args.roi_dir) if args.roi_dir else make_synthetic_rois(args.rois)
+    contours = largest_contours(rois)
+    if not contours:
+        print("No moth contours found")
+        sys.exit(1)
+    hull_sizes = [len(cv2.convexHull(contour)) for contour in contours]
+    print(f"{len(contours)} contours, {np.mean(hull_sizes):.0f} hull points on average (max {max(hull_sizes)})")
+
+    legacy_time, legacy = time_contours(legacy_dimensions, contours, args.repeat)
+    new_time, new = time_contours(contour_dimensions, contours, args.repeat)
+
+    print(f"Pairwise loop:   {legacy_time * 1000:8.3f} ms/moth")
+    print(f"Vectorized:      {new_time * 1000:8.3f} ms/moth  ({legacy_time / new_time:.1f}x)")
+
+    identical = all(tuple(map(float, a)) == tuple(map(float, b)) for a, b in zip(legacy, new))
+    print(f"Length, width and angle identical: {identical}")
+    if not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark reading the weather API and the sensors concurrently against one after another.
+
+Uses a local stand-in for the OpenWeatherMap API (answering after a delay) and
+fake DHT and light sensors with realistic read times. Reports how long a
+logging round takes when the sources are read in turn and when they are read
+at once, then repeats the concurrent round with a DHT sensor that hangs. It
+doubles as a regression check: it exits with status 1 if the concurrent round
+takes longer than its slowest source, a hung source holds up the round past
+its deadline, or a reading comes back wrong.
+
+Run from the repository root:
+    python -m benchmarks.sensor_acquisition --api-seconds 1.0 --dht-seconds 2.0
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'collecting_data'))
+from sensors import WeatherSource, DHTSource, LightSource, FakeSource, read_sources
+
+# Time allowed for the thread start-up and bookkeeping of a concurrent round
+OVERHEAD_SECONDS = 0.3
+
+WEATHER_RESPONSE = {"rain": {"1h": 0.4}, "clouds": {"all": 75}, "weather": [{"description": "light rain, mist"}]}
+
+
+def start_weather_server(delay_seconds):
+    """Serve WEATHER_RESPONSE on a local port after delay_seconds; returns (server, url)"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay_seconds)
+            body = json.dumps(WEATHER_RESPONSE).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/data/2.5/weather"
+
+
+def make_sources(url, dht_seconds, light_seconds, dht_deadline=10):
+    weather = WeatherSource("test-key", 51.5, -0.13, url=url)
+    dht = FakeSource(DHTSource.name, DHTSource.columns, {"temperature": 12.0, "humidity": 81.0},
+                     read_seconds=dht_seconds, deadline_seconds=dht_deadline)
+    light = FakeSource(LightSource.name, LightSource.columns,
+                       {"red": 40, "green": 38, "blue": 35, "color_temperature": 3200, "lux": 12.5},
+                       read_seconds=light_seconds)
+    return [weather, dht, light]
+
+
+def logged(sources, readings):
+    """Source name -> the reading's logged columns (None for a failed reading)"""
+    return {source.name: {key: readings[source.name][key] for key in source.columns}
+            if readings[source.name] is not None else None for source in sources}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--api-seconds', type=float, default=1.0, help='Response time of the stand-in API')
+    parser.add_argument('--dht-seconds', type=float, default=2.0, help='Time a DHT reading takes')
+    parser.add_argument('--light-seconds', type=float, default=0.2, help='Time a light reading takes')
+    args = parser.parse_args()
+
+    server, url = start_weather_server(args.api_seconds)
+    sources = make_sources(url, args.dht_seconds, args.light_seconds)
+    slowest = max(args.api_seconds, args.dht_seconds, args.light_seconds)
+    failed = False
+
+    start = time.perf_counter()
+    sequential = logged(sources, {source.name: source.read() for source in sources})
+    sequential_time = time.perf_counter() - start
+
+    # Fresh sources, so the weather client's cache does not answer for the API
+    sources = make_sources(url, args.dht_seconds, args.light_seconds)
+    start = time.perf_counter()
+    samples = read_sources(sources)
+    concurrent_time = time.perf_counter() - start
+
+    print(f"Sources read in turn: {sequential_time:6.2f} s")
+    print(f"Sources read at once: {concurrent_time:6.2f} s ({sequential_time / concurrent_time:.1f}x), "
+          f"slowest source {slowest:.2f} s")
+    if concurrent_time > slowest + OVERHEAD_SECONDS:
+        print("Concurrent round took longer than its slowest source")
+        failed = True
+    if logged(sources, {name: sample['values'] for name, sample in samples.items()}) != sequential:
+        print("Concurrent readings differ from sequential ones")
+        failed = True
+    if sequential['weather'] != {"rainfall": 0.4, "cloud_cover": 75, "description": "light rain, mist"}:
+        print(f"Unexpected weather reading: {sequential['weather']}")
+        failed = True
+
+    # A DHT sensor that hangs must only cost its own deadline, and leave the other readings intact
+    dht_deadline = args.api_seconds + 0.5
+    hung = make_sources(url, 60.0, args.light_seconds, dht_deadline=dht_deadline)
+    start = time.perf_counter()
+    samples = read_sources(hung)
+    hung_time = time.perf_counter() - start
+    print(f"Round with a hung DHT sensor: {hung_time:6.2f} s (deadline {dht_deadline:.2f} s)")
+    if hung_time > dht_deadline + OVERHEAD_SECONDS or samples['dht']['values'] is not None:
+        print("Hung source was not cut off at its deadline")
+        failed = True
+    readings = logged(hung, {name: sample['values'] for name, sample in samples.items()})
+    if readings['weather'] != sequential['weather'] or readings['light'] != sequential['light']:
+        print("Hung source affected the other readings")
+        failed = True
+
+    server.shutdown()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark the OpenWeatherMap client against plain requests.get, using a local stand-in API.
+
+The stand-in server counts requests and TCP connections and can be switched to
+answer with errors. Reports the time per call and the connections opened with
+a new connection per call (the original code) and with the client's pooled
+session, then checks the client's behaviour: repeated calls within the
+provider's update interval are answered from the cache, a failing API gives
+the last good reading flagged as stale, and calls during the backoff that
+follows make no request. It doubles as a regression check: it exits with
+status 1 if any of these does not hold.
+
+Run from the repository root:
+    python -m benchmarks.weather_client --calls 200
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'collecting_data'))
+from weather_client import WeatherClient
+
+
+class StandInAPI:
+    """Local HTTP/1.1 server answering like the current-weather endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.status = 200
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # Headers and body are sent separately; don't delay the body
+
+            def setup(self):
+                super().setup()
+                api.connections += 1
+
+            def do_GET(self):
+                api.requests += 1
+                body = json.dumps({"dt": int(time.time()), "rain": {"1h": 0.2}, "clouds": {"all": 90},
+                                   "weather": [{"description": "light rain"}]}).encode()
+                if api.status != 200:
+                    body = b'{"message": "unavailable"}'
+                self.send_response(api.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/data/2.5/weather"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def counts(self):
+        return self.requests, self.connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=200, help='Requests made by each method')
+    args = parser.parse_args()
+
+    api = StandInAPI()
+    params = {"lat": 51.5, "lon": -0.13, "appid": "test-key", "units": "metric"}
+    failed = []
+
+    # A new connection for every call, as the original get_weather_data did
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        requests.get(api.url, params=params, timeout=10).json()
+    plain_time = time.perf_counter() - start
+    plain_connections = api.connections
+
+    # The client with caching turned off, so every call is a request over the pooled session
+    client = WeatherClient("test-key", 51.5, -0.13, url=api.url, min_request_seconds=0, update_seconds=0)
+    requests_before, connections_before = api.counts()
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        client.current()
+    session_time = time.perf_counter() - start
+    session_requests = api.requests - requests_before
+    session_connections = api.connections - connections_before
+    client.close()
+
+    print(f"requests.get:    {plain_time / args.calls * 1000:6.2f} ms/call, {plain_connections} connections")
+    print(f"Pooled session:  {session_time / args.calls * 1000:6.2f} ms/call, {session_connections} connection(s) "
+          f"for {session_requests} requests")
+    if session_requests != args.calls or session_connections != 1:
+        failed.append("the pooled session did not reuse one connection")
+
+    # Calls within the provider's update interval are answered from the cache
+    client = WeatherClient("test-key", 51.5, -0.13, url=api.url, retry_seconds=0.05)
+    requests_before = api.requests
+    readings = [client.current() for _ in range(args.calls)]
+    cached_requests = api.requests - requests_before
+    print(f"Cached client:   {cached_requests} request(s) for {args.calls} calls")
+    if cached_requests != 1 or any(reading['stale'] for reading in readings):
+        failed.append("repeated calls were not answered from the cache")
+
+    # A failing API gives the last good reading, flagged as stale, after retrying with backoff
+    api.status = 503
+    client.cached['expires_at'] = 0
+    client.next_request = 0
+    requests_before = api.requests
+    reading = client.current(deadline_seconds=5)
+    retried = api.requests - requests_before
+    print(f"API failing:     {retried} attempt(s), stale={reading['stale'] if reading else None}, "
+          f"cloud cover {reading['cloud_cover'] if reading else None}")
+    if reading is None or not reading['stale'] or reading['cloud_cover'] != 90 or retried != client.retries + 1:
+        failed.append("a failing API did not give the last good reading flagged as stale")
+
+    # During the backoff that follows, calls make no request
+    requests_before = api.requests
+    reading = client.current()
+    print(f"During backoff:  {api.requests - requests_before} request(s), next attempt in "
+          f"{client.next_request - time.time():.0f} s")
+    if api.requests != requests_before or reading is None or not reading['stale']:
+        failed.append("a call during the backoff made a request")
+
+    # With no good reading yet, a failing API gives None rather than made-up values
+    fresh = WeatherClient("test-key", 51.5, -0.13, url=api.url, retries=0)
+    if fresh.current() is not None:
+        failed.append("a client with no good reading returned one")
+
+    api.server.shutdown()
+    for failure in failed:
+        print(f"FAILED: {failure}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
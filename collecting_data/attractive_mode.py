@@ -1,9 +1,11 @@
-import time
 import os
 import board
 import neopixel
-import subprocess
 from datetime import datetime
+from capture import CaptureScheduler, open_camera
+from departure_stream import DepartureStream, STREAMED_DEPARTURES_CSV, MOTH_TRACKS_CSV
+from storage import open_store
+from sensors import SESSION_MARKER
 
 # LED Ring Configuration
 LED_PIN = board.D18       # GPIO pin connected to the pixels (must support PWM)
@@ -50,23 +52,21 @@ def half_red_light():
     print("Half red light ON.")
     pixels.show()
 
-def capture_images(duration_minutes, interval_seconds, save_dir):
+def capture_images(duration_minutes, interval_seconds, save_dir, on_capture=None, camera=None):
     """
     Captures images at regular intervals for a specified duration.
+    Captures fire on fixed deadlines; saving frames and on_capture(image_path, frame),
+    if given, run in the background so they never delay the next capture.
+    camera is an already started camera to reuse; one is opened for this call otherwise.
     """
-    total_iterations = int((duration_minutes * 60) / interval_seconds)
-
-    for i in range(total_iterations):
-        # Generate a timestamped filename
-        timestamp = datetime.now().strftime("%H-%M-%S")
-        image_path = os.path.join(save_dir, f"{timestamp}.jpg")
-
-        # Capture the image using libcamera
-        subprocess.run(["libcamera-jpeg", "-o", image_path], check=True)
-        print(f"Captured image: {image_path}")
-
-        # Wait for the next capture
-        time.sleep(interval_seconds)
+    owns_camera = camera is None
+    if owns_camera:
+        camera = open_camera()
+    try:
+        CaptureScheduler(camera, interval_seconds, on_capture=on_capture).run(duration_minutes, save_dir)
+    finally:
+        if owns_camera:
+            camera.close()
 
 def main():
     # Create a directory for today's date
@@ -74,19 +74,42 @@ def main():
     base_dir = f"./{date_str}"
     os.makedirs(base_dir, exist_ok=True)
 
-    # Attractive Light Phase
-    attractive_light_dir = create_directory(base_dir, "attractive_light")
-    attractive_light_on()
-    capture_images(duration_minutes=30, interval_seconds=15, save_dir=attractive_light_dir)
-
-    # Turn off lights after capturing
-    pixels.fill((0, 0, 0))
-    pixels.show()
-
-    # Red Light Phase
-    red_light_dir = create_directory(base_dir, "red_light")
-    half_red_light()
-    capture_images(duration_minutes=30, interval_seconds=15, save_dir=red_light_dir)
+    # The sensor daemon samples faster while this file exists
+    open(SESSION_MARKER, "w").close()
+    camera = None
+    try:
+        # Keep one camera session, and one worker analyzing its frames in order, for both phases
+        camera = open_camera()
+        scheduler = CaptureScheduler(camera, interval_seconds=15)
+
+        # Follow moths from arrival to departure as the frames come in
+        analysis_dir = os.path.join(base_dir, "analysis")
+        departures = DepartureStream(
+            date_str,
+            store=open_store("departures"),
+            output_csv=os.path.join(analysis_dir, STREAMED_DEPARTURES_CSV),
+            tracks_csv=os.path.join(analysis_dir, MOTH_TRACKS_CSV)
+        )
+
+        # Attractive Light Phase
+        attractive_light_dir = create_directory(base_dir, "attractive_light")
+        attractive_light_on()
+        # Don't wait for the analysis to catch up: the red light must come on on time
+        scheduler.run(30, attractive_light_dir, on_capture=departures.add_attractive_frame, wait=False)
+
+        # Turn off lights after capturing
+        pixels.fill((0, 0, 0))
+        pixels.show()
+
+        # Red Light Phase, counting departures as the frames come in
+        red_light_dir = create_directory(base_dir, "red_light")
+        half_red_light()
+        scheduler.run(30, red_light_dir, on_capture=departures.add_frame)
+        departures.finish()
+    finally:
+        if camera is not None:
+            camera.close()
+        os.remove(SESSION_MARKER)
 
     # Turn off lights at the end
     pixels.fill((0, 0, 0))
@@ -0,0 +1,237 @@
+import cv2
+import numpy as np
+from get_bounding_boxes import MothDetector, box_center, COARSE_MIN_TARGET_PIXELS, REFINE_MARGIN
+
+# Gray-level difference that counts as a change, on the blurred downscaled frame
+CHANGE_THRESHOLD = 25
+
+# How quickly the background follows gradual lighting changes where the sheet is empty
+BACKGROUND_LEARNING_RATE = 0.05
+
+# A change over more than this fraction of the sheet (e.g. the light switching) re-detects the whole frame
+GLOBAL_CHANGE_FRACTION = 0.5
+
+# Share of a box's background that must be known before the box can be rejected as sheet texture
+KNOWN_BACKGROUND_FRACTION = 0.9
+
+
+def load_empty_sheet(image_path):
+    """Load a photo of the empty sheet (same framing as the session) as a grayscale image"""
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Could not load empty sheet image: {image_path}")
+    return image
+
+
+class BackgroundDetector:
+    def __init__(self, mm_per_pixel=0.2033, min_size_mm=10, max_size_mm=70, coarse=False, sheet_mask=None,
+                 empty_sheet=None):
+        """
+        Moth detection for a static camera that only re-examines the parts of a frame that changed.
+
+        Frames must come from one session, ideally in order. Each frame is compared
+        with the previous one on a downscaled, blurred copy: boxes outside the
+        changed areas are carried over, and only the changed areas (with a margin)
+        are run through the detection pipeline, so the work scales with how much
+        of the frame changed. The first frame, and any frame where most of the sheet
+        changed, is searched in full.
+
+        A background model of the empty sheet is kept alongside: a running average
+        updated only where nothing changed and no moth was detected. Detections
+        that look like the known background (folds, stains and other sheet texture)
+        are dropped. The background under moths present from the first frame is
+        unknown until they leave, unless a photo of the empty sheet is given.
+
+        Parameters:
+        - mm_per_pixel, min_size_mm, max_size_mm: As for MothDetector
+        - coarse: Use coarse-to-fine detection when the whole frame is searched
+        - sheet_mask: Optional binary mask of the frame size (see load_sheet_mask)
+        - empty_sheet: Optional grayscale photo of the empty sheet (see load_empty_sheet)
+        """
+        self.full_detector = MothDetector(mm_per_pixel, min_size_mm, max_size_mm, coarse=coarse, sheet_mask=sheet_mask)
+        self.region_detector = MothDetector(mm_per_pixel, min_size_mm, max_size_mm)
+        self.sheet_mask = sheet_mask
+        self.empty_sheet = empty_sheet
+        self.frame_variant = 'gray'
+
+        # Changes are compared at the coarse detection scale, and grown by half the smallest moth
+        self.scale = min(1.0, COARSE_MIN_TARGET_PIXELS * mm_per_pixel / min_size_mm)
+        grow = COARSE_MIN_TARGET_PIXELS // 2
+        self.grow_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * grow + 1, 2 * grow + 1))
+
+        self.small_sheet_mask = None
+        self.reset()
+
+        # Share of the frame area searched, for reporting
+        self.frames = 0
+        self.area_searched = 0.0
+
+    def reset(self):
+        """Forget the previous frame and the background model, before detecting on another sequence of frames"""
+        self.previous = None
+        self.background = None
+        self.known = None
+        self.boxes = []
+
+    def _small(self, image, size):
+        """Blurred, downscaled grayscale copy of an image, as compared between frames"""
+        small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _small_rect(self, box):
+        """A full-resolution box in downscaled coordinates, at least one pixel across"""
+        x, y, w, h = box
+        x0, y0 = int(x * self.scale), int(y * self.scale)
+        return x0, y0, max(int(np.ceil((x + w) * self.scale)), x0 + 1), max(int(np.ceil((y + h) * self.scale)), y0 + 1)
+
+    def _start_background(self, small, boxes):
+        """Initial background: the empty sheet photo if given, otherwise this frame outside its moths"""
+        self.known = np.full(small.shape, 255, np.uint8)
+        if self.empty_sheet is not None:
+            if self.empty_sheet.shape != self.full_shape:
+                raise ValueError(f"Empty sheet size {self.empty_sheet.shape} does not match frame size {self.full_shape}")
+            self.background = self._small(self.empty_sheet, small.shape[::-1]).astype(np.float32)
+            return
+        self.background = small.astype(np.float32)
+        for box in boxes:
+            x0, y0, x1, y1 = self._small_rect(box)
+            self.known[y0:y1, x0:x1] = 0
+
+    def _update_background(self, small, searched, boxes):
+        """Blend this frame into the background outside the searched areas and the moths"""
+        update = cv2.bitwise_not(searched)
+        for box in boxes:
+            x0, y0, x1, y1 = self._small_rect(box)
+            update[y0:y1, x0:x1] = 0
+        cv2.accumulateWeighted(small, self.background, BACKGROUND_LEARNING_RATE, mask=update)
+        cv2.bitwise_or(self.known, update, dst=self.known)
+
+    def _relight_background(self, small, boxes):
+        """Scale the background by the overall change in brightness of the known empty sheet"""
+        sheet = self.known > 0
+        for box in boxes:
+            x0, y0, x1, y1 = self._small_rect(box)
+            sheet[y0:y1, x0:x1] = False
+        if self.small_sheet_mask is not None:
+            sheet &= self.small_sheet_mask > 0
+        if sheet.any():
+            gain = np.median(small[sheet] / np.maximum(self.background[sheet], 1.0))
+            self.background *= gain
+
+    def _unexplained_foreground(self, small):
+        """Mask of known-background pixels that differ from the background, outside the current boxes"""
+        difference = cv2.absdiff(small.astype(np.float32), self.background)
+        _, foreground = cv2.threshold(difference, CHANGE_THRESHOLD, 255, cv2.THRESH_BINARY)
+        foreground = cv2.bitwise_and(foreground.astype(np.uint8), self.known)
+        if self.small_sheet_mask is not None:
+            cv2.bitwise_and(foreground, self.small_sheet_mask, dst=foreground)
+        for box in self.boxes:
+            x0, y0, x1, y1 = self._small_rect(box)
+            foreground[y0:y1, x0:x1] = 0
+        return foreground
+
+    def _is_background(self, small, box):
+        """Whether a detection matches the known empty-sheet background"""
+        x0, y0, x1, y1 = self._small_rect(box)
+        known = self.known[y0:y1, x0:x1]
+        if np.count_nonzero(known) < KNOWN_BACKGROUND_FRACTION * known.size:
+            return False
+        difference = cv2.absdiff(small[y0:y1, x0:x1].astype(np.float32), self.background[y0:y1, x0:x1])
+        return float(difference.mean()) < CHANGE_THRESHOLD
+
+    def _in_sheet(self, box):
+        """Whether a box is centred on the sheet"""
+        if self.sheet_mask is None:
+            return True
+        x, y, w, h = box
+        return self.sheet_mask[int(y + h / 2), int(x + w / 2)] > 0
+
+    def detect_changed(self, gray, regions):
+        """Carry over boxes outside the changed regions, and detect moths inside them"""
+        height, width = gray.shape
+        rects = []
+        for x, y, w, h in regions:
+            x0, y0 = int(x / self.scale), int(y / self.scale)
+            rects.append((x0, y0, min(int(np.ceil((x + w) / self.scale)), width),
+                          min(int(np.ceil((y + h) / self.scale)), height)))
+
+        def changed_rect(box):
+            cx, cy = box_center(box)
+            for rect in rects:
+                if rect[0] <= cx < rect[2] and rect[1] <= cy < rect[3]:
+                    return rect
+            return None
+
+        carried = [box for box in self.boxes if changed_rect(box) is None]
+        bounding_boxes = []
+        for rect in rects:
+            x0, y0, x1, y1 = rect
+            margin = REFINE_MARGIN + max(x1 - x0, y1 - y0) // 2
+            left, top = max(x0 - margin, 0), max(y0 - margin, 0)
+            crop = gray[top:min(y1 + margin, height), left:min(x1 + margin, width)]
+            self.area_searched += crop.size / gray.size
+
+            # Threshold at the last full frame's level: Otsu's level for a crop of bare sheet would split its noise
+            for bx, by, bw, bh in self.region_detector.detect(crop, global_level=self.full_detector.global_level):
+                box = (bx + left, by + top, bw, bh)
+                # Keep boxes centred in this region, so overlapping crops do not report a moth twice
+                if changed_rect(box) == rect and self._in_sheet(box) and box not in bounding_boxes:
+                    bounding_boxes.append(box)
+
+        # A moth found again in a changed region replaces its carried-over box
+        def covered(box):
+            cx, cy = box_center(box)
+            return any(x <= cx < x + w and y <= cy < y + h for x, y, w, h in bounding_boxes)
+
+        return [box for box in carried if not covered(box)] + bounding_boxes
+
+    def detect(self, image):
+        """Bounding boxes for the next BGR or grayscale frame of the session"""
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        height, width = gray.shape
+        small_size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+        small = self._small(gray, small_size)
+        self.frames += 1
+
+        if self.sheet_mask is not None and self.small_sheet_mask is None:
+            self.small_sheet_mask = cv2.resize(self.sheet_mask, small_size, interpolation=cv2.INTER_NEAREST)
+
+        if self.previous is None or self.previous.shape != small.shape:
+            # First frame: search it all and start the background model
+            self.full_shape = gray.shape
+            bounding_boxes = self.full_detector.detect(gray)
+            self.area_searched += 1.0
+            self._start_background(small, bounding_boxes)
+        else:
+            _, changed = cv2.threshold(cv2.absdiff(small, self.previous), CHANGE_THRESHOLD, 255, cv2.THRESH_BINARY)
+            if self.small_sheet_mask is not None:
+                cv2.bitwise_and(changed, self.small_sheet_mask, dst=changed)
+                sheet_pixels = cv2.countNonZero(self.small_sheet_mask)
+            else:
+                sheet_pixels = changed.size
+
+            if cv2.countNonZero(changed) > GLOBAL_CHANGE_FRACTION * sheet_pixels:
+                # Lighting changed: search the whole frame and relight the background
+                bounding_boxes = self.full_detector.detect(gray)
+                self.area_searched += 1.0
+                self._relight_background(small, bounding_boxes)
+            else:
+                # Search where the frame changed, and where it differs from the background with no moth
+                # there to explain it (so a moth missed once is looked for again)
+                search = cv2.bitwise_or(changed, self._unexplained_foreground(small))
+                cv2.dilate(search, self.grow_kernel, dst=search)
+                contours, _ = cv2.findContours(search, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+                bounding_boxes = self.detect_changed(gray, [cv2.boundingRect(contour) for contour in contours])
+                self._update_background(small, search, bounding_boxes)
+
+        # Drop detections that are just the empty sheet
+        bounding_boxes = [box for box in bounding_boxes if not self._is_background(small, box)]
+
+        self.previous = small
+        self.boxes = bounding_boxes
+        return bounding_boxes
+
+    def summary(self):
+        """One-line description of the work saved, for the analysis log"""
+        searched = self.area_searched / self.frames if self.frames else 0.0
+        return f"{self.frames} frame(s), {searched:.0%} of the frame area searched on average"
@@ -0,0 +1,236 @@
+import os
+import glob
+import time
+import queue
+import argparse
+import threading
+import subprocess
+import cv2
+import numpy as np
+from datetime import datetime
+
+# Frames waiting for the worker that may be held in memory (a full-resolution frame is about 36 MB);
+# beyond this, frames are saved by the capture loop and only their paths are queued
+MAX_QUEUED_FRAMES = 2
+
+
+class LibcameraCamera:
+    """Runs libcamera-jpeg for every capture (pays the camera start-up time each time)"""
+
+    def start(self):
+        pass
+
+    def capture(self, image_path):
+        """Capture straight to image_path; returns None since the frame is not in memory"""
+        subprocess.run(["libcamera-jpeg", "-o", image_path], check=True)
+        return None
+
+    def close(self):
+        pass
+
+
+class Picamera2Camera:
+    """Long-lived Picamera2 session: the camera is started once and frames are captured into memory"""
+
+    def __init__(self, size=None):
+        self.size = size
+        self.camera = None
+
+    def start(self):
+        from picamera2 import Picamera2
+
+        self.camera = Picamera2()
+        # "RGB888" frames are stored B, G, R, which is OpenCV's channel order
+        main = {"format": "RGB888"}
+        if self.size is not None:
+            main["size"] = self.size
+        self.camera.configure(self.camera.create_still_configuration(main=main))
+        self.camera.start()
+
+    def capture(self, image_path):
+        """Capture a BGR frame; the scheduler writes it to image_path in the background"""
+        return self.camera.capture_array("main")
+
+    def close(self):
+        if self.camera is not None:
+            self.camera.close()
+            self.camera = None
+
+
+class FakeCamera:
+    def __init__(self, source_dir=None, size=(480, 640), capture_seconds=0.0):
+        """
+        Stand-in camera for testing the capture pipeline without hardware.
+
+        Parameters:
+        - source_dir: Optional directory of .jpg files returned in turn (synthetic frames otherwise)
+        - size: (height, width) of synthetic frames
+        - capture_seconds: Simulated time each capture takes
+        """
+        self.source_paths = sorted(glob.glob(os.path.join(source_dir, "*.jpg"))) if source_dir else []
+        self.size = size
+        self.capture_seconds = capture_seconds
+        self.captures = 0
+
+    def start(self):
+        pass
+
+    def capture(self, image_path):
+        """Return the next frame after the simulated capture delay"""
+        time.sleep(self.capture_seconds)
+        self.captures += 1
+        if self.source_paths:
+            return cv2.imread(self.source_paths[(self.captures - 1) % len(self.source_paths)])
+        return np.full(self.size + (3,), 200, np.uint8)
+
+    def close(self):
+        pass
+
+
+def open_camera():
+    """Return a started camera: a Picamera2 session if available, otherwise libcamera-jpeg"""
+    try:
+        camera = Picamera2Camera()
+        camera.start()
+    except ImportError:
+        print("picamera2 not available; capturing with libcamera-jpeg")
+        camera = LibcameraCamera()
+        camera.start()
+    return camera
+
+
+class CaptureScheduler:
+    def __init__(self, camera, interval_seconds, on_capture=None):
+        """
+        Capture frames on fixed deadlines, with saving and analysis done in the background.
+
+        Capture i is due at start + i * interval_seconds, so the time a capture takes
+        does not push back the following ones. A capture that is more than one
+        interval late is skipped rather than fired late. Frames the camera returns in
+        memory are written to disk by a worker thread, which then calls
+        on_capture(image_path, frame); neither ever delays the next capture. The
+        worker is kept across runs until wait(), so a backlog of frames from one
+        run does not hold up the start of the next. If the worker falls more than
+        MAX_QUEUED_FRAMES behind, frames are saved before being queued and passed to
+        on_capture as None (to be read back from disk), so memory use stays bounded.
+
+        Parameters:
+        - camera: Started camera object (see LibcameraCamera, Picamera2Camera, FakeCamera)
+        - interval_seconds: Time between captures
+        - on_capture: Optional callback run in the worker thread for each saved frame
+          (frame is None if the camera wrote the file itself)
+        """
+        self.camera = camera
+        self.interval_seconds = interval_seconds
+        self.on_capture = on_capture
+        self.frames = queue.Queue()
+        self.worker = None
+        self.captured = 0
+        self.skipped = 0
+        self.lateness = []  # Seconds past its deadline that each capture started
+
+    def _process_frames(self):
+        """Worker thread: write and analyze captured frames in order"""
+        while True:
+            item = self.frames.get()
+            if item is None:
+                return
+            image_path, frame, on_capture = item
+            try:
+                if frame is not None:
+                    cv2.imwrite(image_path, frame)
+                if on_capture is not None:
+                    on_capture(image_path, frame)
+            except Exception as e:
+                print(f"Error processing {image_path}: {str(e)}")
+
+    def run(self, duration_minutes, save_dir, on_capture=None, wait=True):
+        """
+        Capture for duration_minutes into save_dir.
+
+        Parameters:
+        - duration_minutes, save_dir: Length of the run and directory for its frames
+        - on_capture: Callback for this run's frames (the scheduler's on_capture if None)
+        - wait: Return once every frame is processed; with False, return as soon as the
+          captures end while the worker finishes this run's frames (before those of any
+          later run), and call wait() when done
+        """
+        total_iterations = int((duration_minutes * 60) / self.interval_seconds)
+        on_capture = on_capture or self.on_capture
+        captured, skipped = self.captured, self.skipped
+        if self.worker is None:
+            self.worker = threading.Thread(target=self._process_frames, daemon=True)
+            self.worker.start()
+
+        start = time.monotonic()
+        try:
+            for i in range(total_iterations):
+                # Wait for this capture's deadline
+                deadline = start + i * self.interval_seconds
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif -delay > self.interval_seconds:
+                    self.skipped += 1
+                    print(f"Skipped capture {i + 1}: {-delay:.1f}s behind schedule")
+                    continue
+
+                self.lateness.append(max(time.monotonic() - deadline, 0.0))
+
+                # Generate a timestamped filename
+                timestamp = datetime.now().strftime("%H-%M-%S")
+                image_path = os.path.join(save_dir, f"{timestamp}.jpg")
+
+                try:
+                    frame = self.camera.capture(image_path)
+                except Exception as e:
+                    print(f"Error capturing {image_path}: {str(e)}")
+                    continue
+                self.captured += 1
+                if frame is not None and self.frames.qsize() >= MAX_QUEUED_FRAMES:
+                    # The worker is behind: save the frame now and queue only its path
+                    try:
+                        cv2.imwrite(image_path, frame)
+                    except Exception as e:
+                        print(f"Error saving {image_path}: {str(e)}")
+                        continue
+                    frame = None
+                self.frames.put((image_path, frame, on_capture))
+                print(f"Captured image: {image_path}")
+        finally:
+            if wait:
+                self.wait()
+
+        print(f"Captured {self.captured - captured} of {total_iterations} images "
+              f"in {time.monotonic() - start:.1f}s ({self.skipped - skipped} skipped)")
+
+    def wait(self):
+        """Return once every captured frame has been processed"""
+        if self.worker is None:
+            return
+        self.frames.put(None)
+        self.worker.join()
+        self.worker = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dry-run the capture schedule with a fake camera")
+    parser.add_argument("save_dir", help="Directory for the captured frames")
+    parser.add_argument("--minutes", type=float, default=1, help="Capture duration")
+    parser.add_argument("--interval", type=float, default=15, help="Seconds between captures")
+    parser.add_argument("--capture-seconds", type=float, default=2.0, help="Simulated capture time")
+    parser.add_argument("--source-dir", default=None, help="Directory of .jpg frames to replay")
+    args = parser.parse_args()
+
+    os.makedirs(args.save_dir, exist_ok=True)
+    camera = FakeCamera(args.source_dir, capture_seconds=args.capture_seconds)
+    scheduler = CaptureScheduler(camera, args.interval)
+    scheduler.run(args.minutes, args.save_dir)
+
+    # Report how closely the captures followed the schedule
+    if scheduler.lateness:
+        print(f"Latest capture start: {max(scheduler.lateness):.3f}s after its deadline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import pandas as pd
+from datetime import datetime
+from daily_rollup import DailyRollup
+from storage import open_store, DATA_DIR
+from sensors import open_sources, read_sources
+
+# Weather API Configuration
+API_KEY = "REMOVED FOR PRIVACY"  # Replace with your API key
+LATITUDE = 51.5074 
+LONGITUDE = -0.1278 
+
+# Last good weather reading, used when the API cannot be reached
+WEATHER_CACHE_FILE = "weather_cache.json"
+
+# DHT Sensor Configuration
+DHT_PIN = 4  # GPIO pin for the DHT sensor
+
+# Weather log columns, as the dashboard reads them (Color is the colour temperature in K); logs written
+# with the old names ("Temperature (C)", ...) are renamed on read, see storage.RENAMED_COLUMNS
+LOG_COLUMNS = ["Timestamp", "Rainfall", "Cloud_Cover", "Weather_Description", "Temperature", "Humidity",
+               "Red", "Green", "Blue", "Color", "Lux", "Weather_Stale"]
+
+# Set when the weather columns hold the last good API reading because a fresh one could not be fetched
+STALE_COLUMN = "Weather_Stale"
+
+def build_row(timestamp, samples, sources):
+    """One weather log row from the sources' readings (missing readings are left empty)"""
+    row = dict.fromkeys(LOG_COLUMNS)
+    row["Timestamp"] = timestamp
+    for source in sources:
+        sample = samples.get(source.name)
+        values = sample['values'] if sample and sample['values'] else {}
+        for key, column in source.columns.items():
+            row[column] = values.get(key)
+        if values.get('stale') is not None:
+            row[STALE_COLUMN] = bool(values['stale'])
+    return row
+
+def write_row(row, store=None, rollup=None):
+    """Append a row to the weather store and add it to the daily rollup (the default one if rollup is None)"""
+    (store or open_store("weather")).append(pd.DataFrame([row], columns=LOG_COLUMNS))
+
+    # Keep the dashboard's daily rollup in step with the log
+    try:
+        (rollup or DailyRollup()).add_weather([{
+            "Timestamp": row["Timestamp"],
+            "Temperature": row["Temperature"],
+            "Humidity": row["Humidity"],
+            "Cloud_Cover": row["Cloud_Cover"],
+            STALE_COLUMN: row[STALE_COLUMN],
+        }])
+    except Exception as e:
+        print(f"Error updating daily rollup: {e}")
+
+    print(f"Data logged at {row['Timestamp']}")
+
+def log_data(sources=None, store=None):
+    """
+    Read the weather API and the sensors concurrently and log one row.
+
+    Parameters:
+    - sources: Started sensor sources (see sensors.py); the real ones if None
+    - store: Weather store to append to (the configured one if None)
+    """
+    opened = sources is None
+    if opened:
+        sources = open_sources(API_KEY, LATITUDE, LONGITUDE, DHT_PIN, os.path.join(DATA_DIR, WEATHER_CACHE_FILE))
+
+    # All sources are read at once, so they share this timestamp
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    samples = read_sources(sources)
+    if opened:
+        for source in sources:
+            source.close()
+
+    row = build_row(timestamp, samples, sources)
+    write_row(row, store)
+    return row
+
+def main():
+    """Main function to log data every hour."""
+    # Log data (the store writes the header when the log is created)
+    log_data()
+
+
+if __name__ == "__main__":
+    main()
+
+
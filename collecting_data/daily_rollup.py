@@ -0,0 +1,211 @@
+import os
+import csv
+import math
+import fcntl
+from datetime import datetime
+from storage import log_files, RENAMED_COLUMNS
+
+# Data files (same locations the collectors write to)
+DATA_DIR = os.path.expanduser("~/Documents/app/data")
+ROLLUP_CSV = os.path.join(DATA_DIR, "daily_rollup.csv")
+MEASUREMENTS_CSV = os.path.join(DATA_DIR, "moth_measurements.csv")
+WEATHER_CSV = os.path.join(DATA_DIR, "weather_data_log.csv")
+
+# Moth size categories by length_mm: (0, 25] mini, (25, 45] medium, above 45 large
+SIZE_LIMITS = [('mini', 25), ('medium', 45), ('large', float('inf'))]
+COUNT_COLUMNS = [f"{period}_{size}" for period in ('morning', 'afternoon') for size, _ in SIZE_LIMITS]
+
+# Rollup metric name -> weather log column
+WEATHER_METRICS = {
+    'temperature': 'Temperature',
+    'humidity': 'Humidity',
+    'cloud_cover': 'Cloud_Cover',
+}
+SUM_COLUMNS = [f"{metric}_sum" for metric in WEATHER_METRICS]
+
+# Weather log column set on rows that repeat the last good API reading; their API metrics are not counted again
+STALE_COLUMN = 'Weather_Stale'
+API_METRICS = {'cloud_cover'}
+
+# Every rollup column is additive, so rows for the same day are merged by summing
+ROLLUP_COLUMNS = ['date', 'moths_measured'] + COUNT_COLUMNS + ['weather_samples'] + [
+    f"{metric}_{part}" for metric in WEATHER_METRICS for part in ('sum', 'count')
+]
+
+
+def size_category(length_mm):
+    """Return the size category for a moth length, or None if it has no valid length"""
+    try:
+        length_mm = float(length_mm)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(length_mm) or length_mm <= 0:
+        return None
+    for size, limit in SIZE_LIMITS:
+        if length_mm <= limit:
+            return size
+
+
+def to_number(value):
+    """Convert a logged value to float, or None for "N/A", blanks and NaN"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def empty_row(date):
+    """Rollup row for a day with nothing counted yet"""
+    row = {column: 0 for column in ROLLUP_COLUMNS}
+    row['date'] = date
+    return row
+
+
+def merge_rows(rows, summary):
+    """Add the partial rows in summary to rows (both dicts of date -> row)"""
+    for date, partial in summary.items():
+        row = rows.setdefault(date, empty_row(date))
+        for column in ROLLUP_COLUMNS[1:]:
+            row[column] += partial[column]
+    return rows
+
+
+def summarize_measurements(measurements):
+    """
+    Count moths per day by size category, split into morning and afternoon.
+
+    Parameters:
+    - measurements: Iterable of dicts with 'timestamp' and 'length_mm' keys
+
+    Returns:
+    - Dict of date string -> partial rollup row
+    """
+    summary = {}
+    for record in measurements:
+        timestamp = datetime.fromisoformat(str(record['timestamp']))
+        date = timestamp.strftime('%Y-%m-%d')
+        row = summary.setdefault(date, empty_row(date))
+        row['moths_measured'] += 1
+
+        size = size_category(record['length_mm'])
+        if size is not None:
+            period = 'morning' if timestamp.hour < 12 else 'afternoon'
+            row[f"{period}_{size}"] += 1
+    return summary
+
+
+def summarize_weather(readings):
+    """
+    Sum and count temperature, humidity and cloud cover readings per day.
+
+    Parameters:
+    - readings: Iterable of dicts with 'Timestamp' and the WEATHER_METRICS columns;
+      values such as "N/A" are skipped, as is cloud cover on rows flagged STALE_COLUMN
+
+    Returns:
+    - Dict of date string -> partial rollup row
+    """
+    summary = {}
+    for record in readings:
+        date = str(record['Timestamp'])[:10]
+        row = summary.setdefault(date, empty_row(date))
+        row['weather_samples'] += 1
+        stale = str(record.get(STALE_COLUMN)) == 'True'
+
+        for metric, column in WEATHER_METRICS.items():
+            value = None if stale and metric in API_METRICS else to_number(record.get(column))
+            if value is not None:
+                row[f"{metric}_sum"] += value
+                row[f"{metric}_count"] += 1
+    return summary
+
+
+class DailyRollup:
+    def __init__(self, rollup_csv=ROLLUP_CSV):
+        """
+        Rollup table with one row per day, kept next to the raw data files.
+
+        Parameters:
+        - rollup_csv: Path of the rollup CSV file
+        """
+        self.rollup_csv = rollup_csv
+        self.lock_file = rollup_csv + ".lock"
+
+    def load(self):
+        """Read the current rollup as a dict of date -> row"""
+        rows = {}
+        if not os.path.exists(self.rollup_csv):
+            return rows
+
+        with open(self.rollup_csv, newline="") as f:
+            for record in csv.DictReader(f):
+                row = empty_row(record['date'])
+                for column in ROLLUP_COLUMNS[1:]:
+                    number_type = float if column in SUM_COLUMNS else int
+                    row[column] = number_type(record.get(column) or 0)
+                rows[row['date']] = row
+        return rows
+
+    def _write(self, rows):
+        """Write the rollup atomically so readers never see a partial file"""
+        temp_path = self.rollup_csv + ".tmp"
+        with open(temp_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=ROLLUP_COLUMNS)
+            writer.writeheader()
+            for date in sorted(rows):
+                row = dict(rows[date])
+                for column in SUM_COLUMNS:
+                    row[column] = round(row[column], 6)
+                writer.writerow(row)
+        os.replace(temp_path, self.rollup_csv)
+
+    def add(self, summary, replace=False):
+        """
+        Merge per-day partial aggregates into the stored rollup.
+
+        Parameters:
+        - summary: Dict of date -> partial rollup row
+        - replace: Discard the stored rollup instead of adding to it
+        """
+        if not summary and not replace:
+            return
+
+        # Collectors run from cron and may update the rollup at the same time
+        with open(self.lock_file, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            rows = {} if replace else self.load()
+            self._write(merge_rows(rows, summary))
+
+    def add_measurements(self, measurements):
+        """Add a batch of new moth measurements (iterable of dicts) to the rollup"""
+        self.add(summarize_measurements(measurements))
+
+    def add_weather(self, readings):
+        """Add new weather log rows (iterable of dicts) to the rollup"""
+        self.add(summarize_weather(readings))
+
+    def rebuild_from(self, measurements, readings):
+        """Recompute the whole rollup from all measurements and weather readings (iterables of dicts)"""
+        summary = merge_rows(summarize_measurements(measurements), summarize_weather(readings))
+        self.add(summary, replace=True)
+        print(f"Rebuilt daily rollup: {self.rollup_csv}")
+
+    def rebuild(self, measurements_csv=MEASUREMENTS_CSV, weather_csv=WEATHER_CSV):
+        """Recompute the whole rollup from the raw CSV files (every monthly file of the weather log)"""
+        measurements = []
+        if os.path.exists(measurements_csv):
+            with open(measurements_csv, newline="") as f:
+                measurements = list(csv.DictReader(f))
+
+        readings = []
+        for path in log_files(os.path.splitext(weather_csv)[0], weather_csv):
+            with open(path, newline="") as f:
+                readings += [{RENAMED_COLUMNS.get(column, column): value for column, value in record.items()}
+                             for record in csv.DictReader(f)]
+
+        self.rebuild_from(measurements, readings)
+
+
+if __name__ == "__main__":
+    DailyRollup().rebuild()
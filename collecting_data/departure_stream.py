@@ -0,0 +1,155 @@
+import os
+import pandas as pd
+from datetime import datetime
+from get_bounding_boxes import get_bounding_boxes, MothDetector
+from moth_tracker import MothTracker
+
+# Columns of the departures dataset
+DEPARTURE_COLUMNS = ['date', 'time_since_red_minutes', 'moths_departed', 'moths_remaining', 'image_name']
+
+# Columns of the per-moth track table
+TRACK_COLUMNS = ['date', 'track_id', 'arrived_image', 'arrived_phase', 'departed_image', 'departed_phase',
+                 'frames_seen']
+
+# Written to the session's analysis directory when a streamed session completes
+STREAMED_DEPARTURES_CSV = "streamed_departures.csv"
+MOTH_TRACKS_CSV = "moth_tracks.csv"
+
+
+class DepartureStream:
+    def __init__(self, date_str, store=None, output_csv=None, detector=None, frame_cache=None,
+                 tracks_csv=None, tracker=None):
+        """
+        Track moths frame by frame through a session and count departures during the red-light phase.
+
+        Every frame's detections go to a MothTracker, which follows each moth from
+        arrival to departure, so an arrival no longer hides a departure in the same
+        frame. The first red-light frame sets the red-light start time; each red-phase
+        frame that moths left from is a departure event, appended to the departures
+        store as soon as the tracker confirms it.
+
+        Parameters:
+        - date_str: Session date in YYYY-MM-DD format
+        - store: Optional departures store that each event is appended to right away
+        - output_csv: Optional path the session's events are written to by finish()
+        - detector: Optional MothDetector to reuse
+        - frame_cache: Optional FrameCache used when frames are read from disk
+        - tracks_csv: Optional path the per-moth track table is written to by finish()
+        - tracker: Optional MothTracker to use (one with the default settings otherwise)
+        """
+        self.date_str = date_str
+        self.store = store
+        self.output_csv = output_csv
+        self.tracks_csv = tracks_csv
+        self.detector = detector or MothDetector()
+        self.frame_cache = frame_cache
+        self.tracker = tracker or MothTracker()
+
+        self.red_start_index = None
+        self.red_start_time = None
+        self.events = []
+
+    def _detect(self, image_path, image):
+        """Moth boxes in a frame, from the decoded image if given"""
+        if image is not None:
+            return self.detector.detect(image)
+        return get_bounding_boxes(image_path, frame_cache=self.frame_cache, detector=self.detector)
+
+    def add_attractive_frame(self, image_path, image=None):
+        """Track one attractive-phase frame, so moths are followed from their arrival"""
+        self.tracker.update(os.path.basename(image_path), self._detect(image_path, image))
+
+    def add_frame(self, image_path, image=None):
+        """
+        Process one red-phase frame, named HH-MM-SS.jpg, as soon as it is available.
+
+        Parameters:
+        - image_path: Path of the frame (its name gives the capture time)
+        - image: Optional decoded frame, so the file does not have to be read again
+
+        Returns:
+        - The departure event dict confirmed by this frame (for an earlier frame if moths
+          may be missed for a frame or more), or None
+        """
+        img_name = os.path.basename(image_path)
+        boxes = self._detect(image_path, image)
+
+        # On first image, mark the start of the red-light phase
+        if self.red_start_index is None:
+            self.red_start_index = len(self.tracker.frame_names)
+            self.red_start_time = datetime.strptime(img_name.replace('.jpg', ''), '%H-%M-%S')
+            print(f"Red light activated at: {self.red_start_time.strftime('%H:%M:%S')}")
+            print(f"Initial moth count: {len(boxes)}")
+
+        events = self._record_departures(self.tracker.update(img_name, boxes))
+        return events[-1] if events else None
+
+    def _record_departures(self, departed):
+        """Turn departed tracks into one event per red-phase frame they left from"""
+        by_frame = {}
+        for track in departed:
+            # Moths gone by the first red-light frame left during the attractive phase
+            if self.red_start_index is not None and track['departed_frame'] > self.red_start_index:
+                by_frame[track['departed_frame']] = by_frame.get(track['departed_frame'], 0) + 1
+
+        events = []
+        for frame_index in sorted(by_frame):
+            img_name = self.tracker.frame_names[frame_index]
+            current_time = datetime.strptime(img_name.replace('.jpg', ''), '%H-%M-%S')
+            time_since_red = (current_time - self.red_start_time).total_seconds() / 60  # Minutes
+            event = {
+                'date': self.date_str,
+                'time_since_red_minutes': round(time_since_red, 2),
+                'moths_departed': by_frame[frame_index],
+                'moths_remaining': self.tracker.present_at(frame_index),
+                'image_name': img_name
+            }
+            self.events.append(event)
+            events.append(event)
+            print(f"At {time_since_red:.1f} minutes: {event['moths_departed']} moth(s) departed")
+
+        if events and self.store is not None:
+            try:
+                self.store.append(pd.DataFrame(events, columns=DEPARTURE_COLUMNS))
+            except Exception as e:
+                print(f"Error storing departure event: {str(e)}")
+        return events
+
+    def results(self):
+        """Departure events so far as a DataFrame"""
+        return pd.DataFrame(self.events, columns=DEPARTURE_COLUMNS)
+
+    def tracks(self):
+        """Per-moth arrival and departure frames as a DataFrame (departed_image is empty if still present)"""
+        def phase(frame_index):
+            if self.red_start_index is not None and frame_index >= self.red_start_index:
+                return 'red_light'
+            return 'attractive_light'
+
+        frame_names = self.tracker.frame_names
+        rows = []
+        for track in self.tracker.tracks:
+            departed = track['departed_frame']
+            rows.append({
+                'date': self.date_str,
+                'track_id': track['track_id'],
+                'arrived_image': frame_names[track['first_frame']],
+                'arrived_phase': phase(track['first_frame']),
+                'departed_image': frame_names[departed] if departed is not None else None,
+                'departed_phase': phase(departed) if departed is not None else None,
+                'frames_seen': track['frames_seen']
+            })
+        return pd.DataFrame(rows, columns=TRACK_COLUMNS)
+
+    def finish(self):
+        """End the session: write the events to output_csv and the tracks to tracks_csv (if set) and return the events"""
+        self._record_departures(self.tracker.finish())
+        df = self.results()
+        for path, table in ((self.output_csv, df), (self.tracks_csv, self.tracks())):
+            if path is not None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = path + ".tmp"
+                table.to_csv(temp_path, index=False)
+                os.replace(temp_path, path)
+                print(f"Saved {len(table)} rows to: {path}")
+        return df
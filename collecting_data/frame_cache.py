@@ -0,0 +1,85 @@
+import os
+import cv2
+from collections import OrderedDict
+from get_bounding_boxes import CLAHE_CLIP_LIMIT, CLAHE_TILE_GRID
+
+# Upper bound on decoded frames kept in memory per session (a 12 MP frame is ~36 MB in color)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Frame versions the cache can return, each derived from the previous one
+VARIANTS = ('color', 'gray', 'enhanced')
+
+
+class FrameCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Least-recently-used cache of decoded images, so each JPEG is decoded at most once per session.
+
+        Besides the decoded color frame, the grayscale and CLAHE-enhanced versions
+        used by the detector are cached too. Cached arrays are shared and read-only;
+        copy a frame before drawing on it.
+
+        Parameters:
+        - max_bytes: Memory cap; least recently used frames are evicted beyond it
+        """
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.size_bytes = 0
+        self.clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_GRID)
+        self.hits = 0
+        self.decodes = 0
+
+    def _store(self, key, frame):
+        """Add a frame, evicting the least recently used ones to stay under the memory cap"""
+        if frame.nbytes > self.max_bytes:
+            return
+        frame.flags.writeable = False
+        self.frames[key] = frame
+        self.size_bytes += frame.nbytes
+        while self.size_bytes > self.max_bytes:
+            _, evicted = self.frames.popitem(last=False)
+            self.size_bytes -= evicted.nbytes
+
+    def get(self, image_path, variant='color'):
+        """
+        Return a decoded frame, decoding or deriving it only if it is not cached.
+
+        Parameters:
+        - image_path: Path to the image
+        - variant: 'color' (BGR as read by cv2.imread), 'gray' or 'enhanced' (CLAHE applied to gray)
+
+        Returns:
+        - Read-only image array, or None if the image could not be read
+        """
+        key = (os.path.abspath(image_path), variant)
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+        if variant == 'color':
+            frame = cv2.imread(image_path)
+            self.decodes += 1
+        else:
+            source = self.get(image_path, VARIANTS[VARIANTS.index(variant) - 1])
+            if source is None:
+                return None
+            if variant == 'gray':
+                frame = cv2.cvtColor(source, cv2.COLOR_BGR2GRAY)
+            else:
+                frame = self.clahe.apply(source)
+
+        if frame is not None:
+            self._store(key, frame)
+        return frame
+
+    def clear(self):
+        """Drop all cached frames"""
+        self.frames.clear()
+        self.size_bytes = 0
+
+    def summary(self):
+        """One-line description of cache usage, for the analysis log"""
+        return (f"{self.decodes} image decode(s), {self.hits} cache hit(s), "
+                f"{len(self.frames)} frame(s) / {self.size_bytes / 1e6:.1f} MB cached")
@@ -1,7 +1,267 @@
+import math
 import cv2
 import numpy as np
 
-def get_bounding_boxes(image_path, mm_per_pixel=0.2033, min_size_mm=10, max_size_mm=70):
+# Contrast enhancement settings (also used by FrameCache for its 'enhanced' frames)
+CLAHE_CLIP_LIMIT = 2.5
+CLAHE_TILE_GRID = (8, 8)
+
+# Coarse-to-fine detection: the smallest moth is still this many pixels across after downscaling
+COARSE_MIN_TARGET_PIXELS = 16
+
+# Coarse candidates may be this much smaller or larger than the size limits before refinement
+CANDIDATE_AREA_RANGE = (0.25, 4.0)
+
+# Extra full-resolution pixels around each candidate when it is refined
+REFINE_MARGIN = 16
+
+# Candidates covering more than this fraction of the frame are not refined one by one; the whole frame is searched
+REFINE_AREA_LIMIT = 0.5
+
+def load_sheet_mask(mask_path):
+    """Load a sheet mask image (white where moths can land, black elsewhere) as a binary mask"""
+    mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
+    if mask is None:
+        raise ValueError(f"Could not load sheet mask: {mask_path}")
+    _, mask = cv2.threshold(mask, 127, 255, cv2.THRESH_BINARY)
+    return mask
+
+class MothDetector:
+    def __init__(self, mm_per_pixel=0.2033, min_size_mm=10, max_size_mm=70, shape=None,
+                 coarse=False, sheet_mask=None):
+        """
+        Reusable detection pipeline that owns its CLAHE object, morphology kernel and work buffers.
+
+        The buffers are allocated for one image size (on the first frame, or from
+        shape) and every step writes into them through OpenCV's dst arguments, so
+        processing a sequence of same-sized frames allocates no new images. The
+        arrays returned by enhance() and threshold() are overwritten by the next call.
+
+        In coarse mode, candidates are found on a frame downscaled so the smallest
+        moth is about COARSE_MIN_TARGET_PIXELS across, and only the areas around
+        them are run through the pipeline at full resolution.
+
+        Parameters:
+        - mm_per_pixel: Conversion ratio from mm to pixels.
+        - min_size_mm: Minimum size of the moth in mm.
+        - max_size_mm: Maximum size of the moth in mm.
+        - shape: Optional (height, width) to allocate the buffers up front.
+        - coarse: Use coarse-to-fine detection.
+        - sheet_mask: Optional binary mask of the frame size (see load_sheet_mask); only the
+          area inside it is searched.
+        """
+        # Convert size constraints from mm to pixels
+        self.min_contour_area = (min_size_mm / mm_per_pixel) ** 2
+        self.max_contour_area = (max_size_mm / mm_per_pixel) ** 2
+
+        self.clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_GRID)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+        self.sheet_mask = sheet_mask
+        if sheet_mask is not None:
+            # Only the bounding rectangle of the sheet is processed
+            self.sheet_rect = cv2.boundingRect(sheet_mask)
+
+        # FrameCache variant detect() works from
+        self.frame_variant = 'enhanced'
+
+        self.coarse = coarse
+        if coarse:
+            self.scale = min(1.0, COARSE_MIN_TARGET_PIXELS * mm_per_pixel / min_size_mm)
+            self.coarse_detector = MothDetector(mm_per_pixel / self.scale, min_size_mm, max_size_mm)
+            self.refine_detector = MothDetector(mm_per_pixel, min_size_mm, max_size_mm)
+            self.small_sheet_mask = None
+
+        # Otsu level of the last frame searched
+        self.global_level = None
+
+        self.shape = None
+        if shape is not None:
+            self._allocate(shape)
+
+    def _allocate(self, shape):
+        """(Re)allocate the work buffers when the image size changes"""
+        shape = tuple(shape[:2])
+        if shape == self.shape:
+            return
+        self.shape = shape
+        self.gray = np.empty(shape, np.uint8)
+        self.enhanced = np.empty(shape, np.uint8)
+        self.blurred = np.empty(shape, np.uint8)
+        self.adaptive_thresh = np.empty(shape, np.uint8)
+        self.global_thresh = np.empty(shape, np.uint8)
+        self.combined_thresh = np.empty(shape, np.uint8)
+        self.cleaned_thresh = np.empty(shape, np.uint8)
+
+    def to_gray(self, image):
+        """Grayscale version of a BGR image (grayscale images are returned as they are)"""
+        if image.ndim == 2:
+            return image
+        self._allocate(image.shape)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self.gray)
+
+    def enhance(self, image):
+        """Grayscale and CLAHE contrast enhancement of a BGR or grayscale image"""
+        gray = self.to_gray(image)
+        self._allocate(gray.shape)
+        self.clahe.apply(gray, dst=self.enhanced)
+        return self.enhanced
+
+    def threshold(self, enhanced_gray, global_level=None):
+        """
+        Binary mask of dark objects in a contrast-enhanced grayscale image.
+
+        The global threshold is Otsu's level for the image (kept in self.global_level),
+        unless global_level is given, e.g. the level of a full frame for a crop of it.
+        """
+        self._allocate(enhanced_gray.shape)
+
+        # Apply Gaussian blur
+        cv2.GaussianBlur(enhanced_gray, (5, 5), 0, dst=self.blurred)
+
+        # Adaptive thresholding for smaller moths
+        cv2.adaptiveThreshold(self.blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2,
+                              dst=self.adaptive_thresh)
+
+        # Global thresholding for larger moths
+        if global_level is None:
+            self.global_level, _ = cv2.threshold(self.blurred, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU,
+                                                 dst=self.global_thresh)
+        else:
+            cv2.threshold(self.blurred, global_level, 255, cv2.THRESH_BINARY_INV, dst=self.global_thresh)
+
+        # Combine both thresholds
+        cv2.addWeighted(self.adaptive_thresh, 0.7, self.global_thresh, 0.3, 0, dst=self.combined_thresh)
+
+        # Morphological operations to clean up
+        cv2.morphologyEx(self.combined_thresh, cv2.MORPH_CLOSE, self.kernel, dst=self.cleaned_thresh, iterations=2)
+        return self.cleaned_thresh
+
+    def find_boxes(self, mask, candidates=False):
+        """
+        Bounding boxes of the moth-sized, roughly compact blobs in a mask.
+
+        With candidates=True the size range is widened by CANDIDATE_AREA_RANGE and
+        the shape filters are skipped, for coarse candidates that are refined later.
+        """
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_area, max_area = self.min_contour_area, self.max_contour_area
+        if candidates:
+            min_area *= CANDIDATE_AREA_RANGE[0]
+            max_area *= CANDIDATE_AREA_RANGE[1]
+
+        bounding_boxes = []
+        for contour in contours:
+            # Filter by area
+            area = cv2.contourArea(contour)
+            if min_area < area < max_area:
+                # Get bounding box
+                x, y, w, h = cv2.boundingRect(contour)
+                if candidates:
+                    bounding_boxes.append((x, y, w, h))
+                    continue
+
+                # Additional filter: Aspect ratio and extent
+                aspect_ratio = w / h
+                rect_area = w * h
+                extent = area / rect_area
+
+                if 0.5 < aspect_ratio < 2.0 and extent > 0.3:  # Reasonable filters
+                    bounding_boxes.append((x, y, w, h))
+
+        return bounding_boxes
+
+    def otsu_level(self, enhanced_gray):
+        """Otsu's level for the global threshold of a contrast-enhanced grayscale image"""
+        self._allocate(enhanced_gray.shape)
+        cv2.GaussianBlur(enhanced_gray, (5, 5), 0, dst=self.blurred)
+        level, _ = cv2.threshold(self.blurred, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU, dst=self.global_thresh)
+        return level
+
+    def detect_coarse(self, enhanced_gray, sheet_mask=None):
+        """Coarse-to-fine detection on a contrast-enhanced grayscale image"""
+        height, width = enhanced_gray.shape
+        small_size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+        if getattr(self, 'small', None) is None or self.small.shape != small_size[::-1]:
+            self.small = np.empty(small_size[::-1], np.uint8)
+            self.small_sheet_mask = None
+        cv2.resize(enhanced_gray, small_size, dst=self.small, interpolation=cv2.INTER_AREA)
+
+        # Candidate blobs on the downscaled frame
+        candidate_mask = self.coarse_detector.threshold(self.small)
+        if sheet_mask is not None:
+            if self.small_sheet_mask is None:
+                self.small_sheet_mask = cv2.resize(sheet_mask, small_size, interpolation=cv2.INTER_NEAREST)
+            cv2.bitwise_and(candidate_mask, self.small_sheet_mask, dst=candidate_mask)
+
+        # Candidates at full resolution, with a margin around them
+        regions = []
+        for x, y, w, h in self.coarse_detector.find_boxes(candidate_mask, candidates=True):
+            x0, y0 = int(x / self.scale), int(y / self.scale)
+            x1, y1 = int(np.ceil((x + w) / self.scale)), int(np.ceil((y + h) / self.scale))
+            margin = REFINE_MARGIN + max(x1 - x0, y1 - y0) // 2
+            regions.append((x0, y0, x1, y1, max(x0 - margin, 0), max(y0 - margin, 0),
+                            min(x1 + margin, width), min(y1 + margin, height)))
+
+        # Crops are thresholded at the full frame's level, as the whole frame would be: Otsu's level
+        # for a crop of bare sheet would split its noise
+        self.global_level = self.otsu_level(enhanced_gray)
+
+        # Many candidates (e.g. the noise of an empty sheet) cost more to refine than the whole frame
+        if sum((right - left) * (bottom - top) for *_, left, top, right, bottom in regions) > \
+                REFINE_AREA_LIMIT * width * height:
+            mask = self.threshold(enhanced_gray, self.global_level)
+            if sheet_mask is not None:
+                cv2.bitwise_and(mask, sheet_mask, dst=mask)
+            return self.find_boxes(mask)
+
+        bounding_boxes = []
+        for x0, y0, x1, y1, left, top, right, bottom in regions:
+            crop = enhanced_gray[top:bottom, left:right]
+            for bx, by, bw, bh in self.refine_detector.detect(enhanced_gray=crop, global_level=self.global_level):
+                # A blob touching a cut edge of the crop may be part of a larger one
+                if (bx == 0 < left or by == 0 < top or
+                        bx + bw == crop.shape[1] and right < width or by + bh == crop.shape[0] and bottom < height):
+                    continue
+                box = (bx + left, by + top, bw, bh)
+                # Keep boxes centred on this candidate, so overlapping crops do not report a moth twice
+                if x0 <= box[0] + bw / 2 < x1 and y0 <= box[1] + bh / 2 < y1 and box not in bounding_boxes:
+                    bounding_boxes.append(box)
+
+        return bounding_boxes
+
+    def detect(self, image=None, enhanced_gray=None, global_level=None):
+        """
+        Bounding boxes for a BGR or grayscale image, or for an already enhanced grayscale one.
+        global_level optionally replaces Otsu's level for the global threshold (not in coarse mode).
+        """
+        frame = image if enhanced_gray is None else enhanced_gray
+
+        # Skip everything outside the sheet
+        offset_x, offset_y = 0, 0
+        sheet_mask = None
+        if self.sheet_mask is not None:
+            if self.sheet_mask.shape != frame.shape[:2]:
+                raise ValueError(f"Sheet mask size {self.sheet_mask.shape} does not match frame size {frame.shape[:2]}")
+            offset_x, offset_y, w, h = self.sheet_rect
+            frame = frame[offset_y:offset_y + h, offset_x:offset_x + w]
+            sheet_mask = self.sheet_mask[offset_y:offset_y + h, offset_x:offset_x + w]
+
+        if enhanced_gray is None:
+            frame = self.enhance(frame)
+        if self.coarse:
+            bounding_boxes = self.detect_coarse(frame, sheet_mask)
+        else:
+            mask = self.threshold(frame, global_level)
+            if sheet_mask is not None:
+                cv2.bitwise_and(mask, sheet_mask, dst=mask)
+            bounding_boxes = self.find_boxes(mask)
+
+        return [(x + offset_x, y + offset_y, w, h) for x, y, w, h in bounding_boxes]
+
+def get_bounding_boxes(image_path, mm_per_pixel=0.2033, min_size_mm=10, max_size_mm=70, frame_cache=None,
+                       detector=None):
     """
     Detects bounding boxes for moths in the image.
 
@@ -10,13 +270,24 @@ def get_bounding_boxes(image_path, mm_per_pixel=0.2033, min_size_mm=10, max_size
     - mm_per_pixel: Conversion ratio from mm to pixels.
     - min_size_mm: Minimum size of the moth in mm.
     - max_size_mm: Maximum size of the moth in mm.
+    - frame_cache: Optional FrameCache, so the image is decoded and enhanced only once per session.
+    - detector: Optional MothDetector (or BackgroundDetector) to reuse across frames (its own size limits then apply).
 
     Returns:
     - List of bounding boxes [(x, y, w, h), ...]
     """
-    # Convert size constraints from mm to pixels
-    min_contour_area = (min_size_mm / mm_per_pixel) ** 2
-    max_contour_area = (max_size_mm / mm_per_pixel) ** 2
+    if detector is None:
+        detector = MothDetector(mm_per_pixel, min_size_mm, max_size_mm)
+
+    if frame_cache is not None:
+        # Decoded, grayscale and CLAHE versions are shared with the other analysis steps
+        frame = frame_cache.get(image_path, detector.frame_variant)
+        if frame is None:
+            print(f"Error: Could not load image {image_path}")
+            return []
+        if detector.frame_variant == 'enhanced':
+            return detector.detect(enhanced_gray=frame)
+        return detector.detect(frame)
 
     # Load the image
     image = cv2.imread(image_path)
@@ -24,49 +295,91 @@ def get_bounding_boxes(image_path, mm_per_pixel=0.2033, min_size_mm=10, max_size
         print(f"Error: Could not load image {image_path}")
         return []
 
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return detector.detect(image)
 
-    # Enhance contrast using CLAHE
-    clahe = cv2.createCLAHE(clipLimit=2.5, tileGridSize=(8, 8))
-    enhanced_gray = clahe.apply(gray)
+def box_center(box):
+    """Center (x, y) of an (x, y, w, h) box"""
+    x, y, w, h = box
+    return (x + w / 2, y + h / 2)
 
-    # Apply Gaussian blur
-    blurred = cv2.GaussianBlur(enhanced_gray, (5, 5), 0)
-
-    # Adaptive thresholding for smaller moths
-    adaptive_thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 11, 2)
-
-    # Global thresholding for larger moths
-    _, global_thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-
-    # Combine both thresholds
-    combined_thresh = cv2.addWeighted(adaptive_thresh, 0.7, global_thresh, 0.3, 0)
+def assign_nearest(previous_boxes, boxes, threshold=20):
+    """
+    Match boxes to the previous boxes whose centers are closer than threshold.
 
-    # Morphological operations to clean up
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-    cleaned_thresh = cv2.morphologyEx(combined_thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
+    Nearby boxes are found through a grid of threshold-sized cells, and pairs are
+    assigned greedily, closest first (ties broken by previous box and box order), so
+    the result does not depend on which box happens to be examined first.
 
-    # Find contours
-    contours, _ = cv2.findContours(cleaned_thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    Parameters:
+    - previous_boxes: Bounding boxes [(x, y, w, h), ...] to match from
+    - boxes: Bounding boxes to match to
+    - threshold: Maximum distance between centers of bounding boxes to consider them as the same moth
 
-    bounding_boxes = []
-    for contour in contours:
-        # Filter by area
-        area = cv2.contourArea(contour)
-        if min_contour_area < area < max_contour_area:
-            # Get bounding box
-            x, y, w, h = cv2.boundingRect(contour)
+    Returns:
+    - List with, for each previous box, the index of its matching box or None
+    """
+    centers = [box_center(box) for box in boxes]
+
+    # Index the boxes by grid cell
+    grid = {}
+    for j, (cx, cy) in enumerate(centers):
+        grid.setdefault((int(cx // threshold), int(cy // threshold)), []).append(j)
+
+    # Candidate pairs within threshold, looking only at the 3x3 cells around each previous box
+    pairs = []
+    for i, previous_box in enumerate(previous_boxes):
+        px, py = box_center(previous_box)
+        cell_x, cell_y = int(px // threshold), int(py // threshold)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in grid.get((cell_x + dx, cell_y + dy), ()):
+                    distance = math.hypot(centers[j][0] - px, centers[j][1] - py)
+                    if distance < threshold:
+                        pairs.append((distance, i, j))
+
+    # Greedy assignment, closest pairs first
+    pairs.sort()
+    matches = [None] * len(previous_boxes)
+    matched = [False] * len(boxes)
+    for distance, i, j in pairs:
+        if matches[i] is None and not matched[j]:
+            matches[i] = j
+            matched[j] = True
+    return matches
+
+def match_boxes(frames_boxes, threshold=20):
+    """
+    Link bounding boxes across consecutive frames into tracks of the same moth.
 
-            # Additional filter: Aspect ratio and extent
-            aspect_ratio = w / h
-            rect_area = w * h
-            extent = area / rect_area
+    Each track's last box is matched to the next frame's boxes with assign_nearest.
+    A track ends at the first frame without a match, and unmatched boxes start new tracks.
 
-            if 0.5 < aspect_ratio < 2.0 and extent > 0.3:  # Reasonable filters
-                bounding_boxes.append((x, y, w, h))
+    Parameters:
+    - frames_boxes: Per-frame lists of bounding boxes [(x, y, w, h), ...]
+    - threshold: Maximum distance between centers of bounding boxes to consider them as the same moth
 
-    return bounding_boxes
+    Returns:
+    - List of tracks, each a list of (frame_index, box), in order of the frame and box they start with
+    """
+    tracks = []
+    open_tracks = []
+    for frame_index, boxes in enumerate(frames_boxes):
+        matches = assign_nearest([track[-1][1] for track in open_tracks], boxes, threshold)
+
+        next_tracks = []
+        for track, j in zip(open_tracks, matches):
+            if j is not None:
+                track.append((frame_index, boxes[j]))
+                next_tracks.append(track)
+        matched = set(j for j in matches if j is not None)
+        for j, box in enumerate(boxes):
+            if j not in matched:
+                track = [(frame_index, box)]
+                tracks.append(track)
+                next_tracks.append(track)
+        open_tracks = next_tracks
+
+    return tracks
 
 def compare_bounding_boxes(boxes1, boxes2, boxes3, threshold=20):
     """
@@ -78,104 +391,68 @@ def compare_bounding_boxes(boxes1, boxes2, boxes3, threshold=20):
     - threshold: Maximum distance between centers of bounding boxes to consider them as the same moth
 
     Returns:
-    - Tuple of three lists: (boxes_in_one_image, boxes_in_two_images, boxes_in_three_images)
+    - Tuple of three lists: (boxes_in_one_image, boxes_in_two_images, boxes_in_three_images),
+      each moth given by its box in the last image it appears in
     """
-    def box_center(box):
-        x, y, w, h = box
-        return (x + w / 2, y + h / 2)
-
-    def is_close(center1, center2, threshold):
-        return np.linalg.norm(np.array(center1) - np.array(center2)) < threshold
-
-    boxes_in_one_image = []
-    boxes_in_two_images = []
-    boxes_in_three_images = []
-    
-    used_boxes2 = set()
-    used_boxes3 = set()
-
-    # For each box in the first image
-    for i, box1 in enumerate(boxes1):
-        center1 = box_center(box1)
-        
-        # Find matches in second image
-        matches2 = [(j, box2) for j, box2 in enumerate(boxes2) 
-                   if j not in used_boxes2 and is_close(center1, box_center(box2), threshold)]
-        
-        if matches2:
-            # For each potential match in second image
-            for j, box2 in matches2:
-                center2 = box_center(box2)
-                
-                # Find matches in third image
-                matches3 = [(k, box3) for k, box3 in enumerate(boxes3) 
-                           if k not in used_boxes3 and is_close(center2, box_center(box3), threshold)]
-                
-                if matches3:
-                    # Use the first matching box from image 3
-                    k, box3 = matches3[0]
-                    boxes_in_three_images.append(box3)  # Use coordinates from the last image
-                    used_boxes2.add(j)
-                    used_boxes3.add(k)
-                    break  # Move to next box in image 1
-                else:
-                    boxes_in_two_images.append(box2)
-                    used_boxes2.add(j)
-        else:
-            boxes_in_one_image.append(box1)
-
-    # Add remaining unmatched boxes from image 2
-    for j, box2 in enumerate(boxes2):
-        if j not in used_boxes2:
-            boxes_in_one_image.append(box2)
-
-    # Add remaining unmatched boxes from image 3
-    for k, box3 in enumerate(boxes3):
-        if k not in used_boxes3:
-            boxes_in_one_image.append(box3)
-
-    return boxes_in_one_image, boxes_in_two_images, boxes_in_three_images
+    by_count = ([], [], [])
+    for track in match_boxes([boxes1, boxes2, boxes3], threshold):
+        by_count[len(track) - 1].append(track[-1][1])
+    return by_count
 
-def process_images_for_consistency(image_paths, output_path):
+def process_images_for_consistency(image_paths, output_path, frame_cache=None, detector=None, threshold=20):
     """
-    Process three consecutive images to identify moths based on consistency.
+    Process consecutive images to identify moths based on consistency.
 
     Parameters:
-    - image_paths: List of three image paths
+    - image_paths: List of two or more consecutive image paths
     - output_path: Path to save the final visualization
+    - frame_cache: Optional FrameCache shared with the rest of the session's analysis
+    - detector: Optional MothDetector to reuse (one is created for the images otherwise)
+    - threshold: Maximum distance between centers of bounding boxes to consider them as the same moth
 
     Returns:
-    - List of bounding boxes that appear in three images
+    - List of bounding boxes (from the last image) that appear in every image
     """
-    if len(image_paths) != 3:
-        print("Error: Exactly three images are required.")
+    if len(image_paths) < 2:
+        print("Error: At least two images are required.")
         return []
 
     # Get bounding boxes for each image
-    boxes1 = get_bounding_boxes(image_paths[0])
-    boxes2 = get_bounding_boxes(image_paths[1])
-    boxes3 = get_bounding_boxes(image_paths[2])
+    detector = detector or MothDetector()
+    frames_boxes = [get_bounding_boxes(path, frame_cache=frame_cache, detector=detector) for path in image_paths]
 
-    # Classify detections based on consistency
-    boxes_in_one_image, boxes_in_two_images, boxes_in_three_images = compare_bounding_boxes(boxes1, boxes2, boxes3)
+    # Classify detections based on consistency (each moth given by its box in the last image it appears in)
+    boxes_in_one_image = []
+    boxes_in_some_images = []
+    boxes_in_all_images = []
+    for track in match_boxes(frames_boxes, threshold):
+        if len(track) == len(image_paths):
+            boxes_in_all_images.append(track[-1][1])
+        elif len(track) > 1:
+            boxes_in_some_images.append(track[-1][1])
+        else:
+            boxes_in_one_image.append(track[-1][1])
 
-    # Load the first image for visualization
-    image = cv2.imread(image_paths[0])
+    # Load the first image for visualization (a copy, since cached frames are read-only)
+    if frame_cache is not None:
+        image = frame_cache.get(image_paths[0]).copy()
+    else:
+        image = cv2.imread(image_paths[0])
 
     # Draw bounding boxes with different colors
     for box in boxes_in_one_image:
         x, y, w, h = box
         cv2.rectangle(image, (x, y), (x + w, y + h), (0, 0, 255), 2)  # Red for one image
-    for box in boxes_in_two_images:
+    for box in boxes_in_some_images:
         x, y, w, h = box
-        cv2.rectangle(image, (x, y), (x + w, y + h), (0, 165, 255), 2)  # Orange for two images
-    for box in boxes_in_three_images:
+        cv2.rectangle(image, (x, y), (x + w, y + h), (0, 165, 255), 2)  # Orange for some of the images
+    for box in boxes_in_all_images:
         x, y, w, h = box
-        cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)  # Green for three images
+        cv2.rectangle(image, (x, y), (x + w, y + h), (0, 255, 0), 2)  # Green for every image
 
     # Save the output visualization
     cv2.imwrite(output_path, image)
     print(f"Visualization saved to {output_path}.")
     
-    # Return only the boxes that appear in three images
-    return boxes_in_three_images
+    # Return only the boxes that appear in every image
+    return boxes_in_all_images
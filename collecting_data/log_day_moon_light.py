@@ -1,8 +1,9 @@
-import os
 import ephem
+import pandas as pd
 from astral import LocationInfo
 from astral.sun import sun
 import datetime
+from storage import open_store
 
 # Location coordinates for London
 LATITUDE = 51.5074
@@ -55,18 +56,8 @@ def log_day_moon_light():
         "Moon Phase (%)": round(lunar_data["moon_phase"], 1),
     }
 
-    # Log to CSV file
-    log_file = os.path.expanduser("~/Documents/app/data/day-moon-light.csv")
-    try:
-        # Create the file with headers if it doesn't exist
-        with open(log_file, "x") as file:
-            file.write("Date,Dawn,Dusk,Moonrise,Moonset,Moon Phase (%)\n")
-    except FileExistsError:
-        pass  # File already exists
-
-    # Append the log entry
-    with open(log_file, "a") as file:
-        file.write(",".join(str(log_entry[col]) for col in log_entry) + "\n")
+    # Append the log entry (the store writes the header when the log is created)
+    open_store("moon").append(pd.DataFrame([log_entry]))
 
     print("Day and moonlight data logged.")
 
@@ -4,7 +4,10 @@ import pandas as pd
 import os
 from datetime import datetime
 import argparse
-from get_bounding_boxes import process_images_for_consistency, get_bounding_boxes
+from get_bounding_boxes import process_images_for_consistency, MothDetector, load_sheet_mask
+from frame_cache import FrameCache
+from background_detector import BackgroundDetector, load_empty_sheet
+from departure_stream import DepartureStream, STREAMED_DEPARTURES_CSV, MOTH_TRACKS_CSV
 
 def classify_moth(length_mm):
     """
@@ -15,8 +18,46 @@ def classify_moth(length_mm):
         return 'unknown'
     return None
 
+def contour_dimensions(contour):
+    """
+    Measure a moth outline: the longest distance between two points of its convex
+    hull, and the widest extent of the contour perpendicular to that line.
+
+    All hull point pairs are compared at once on squared integer distances; the
+    first longest pair (in hull order) is kept, as in the original pairwise loop.
+
+    Returns:
+    - (length_px, width_px, angle) with the angle of the length line in degrees
+    """
+    points = contour.reshape(-1, 2)
+    hull_points = cv2.convexHull(contour).reshape(-1, 2)
+
+    # Squared distances between every pair of hull points, upper triangle only
+    deltas = hull_points[None, :, :].astype(np.int64) - hull_points[:, None, :]
+    squared = (deltas ** 2).sum(axis=2)
+    squared[np.tril_indices(len(hull_points))] = -1
+    if len(hull_points) < 2 or squared.max() <= 0:
+        return 0, 0, 0
+
+    i, j = np.unravel_index(np.argmax(squared), squared.shape)
+    pt1 = hull_points[i]
+    pt2 = hull_points[j]
+    max_length = np.sqrt(squared[i, j])
+
+    # Calculate angle with horizontal
+    angle = np.degrees(np.arctan2(pt2[1] - pt1[1], pt2[0] - pt1[0]))
+
+    # Project all contour points onto the direction perpendicular to the length
+    length_vector = np.array([pt2 - pt1]) / np.linalg.norm(pt2 - pt1)
+    perp_vector = np.array([-length_vector[0][1], length_vector[0][0]])
+    projections = np.abs(np.dot(points - pt1, perp_vector))
+    max_width = np.max(projections)
+
+    return max_length, max_width, angle
+
 class MothAnalyzerTest:
-    def __init__(self, sample_dir, date_str, mm_per_pixel=0.0703):
+    def __init__(self, sample_dir, date_str, mm_per_pixel=0.0703, coarse_detection=False, sheet_mask_path=None,
+                 background_model=False, empty_sheet_path=None):
         """
         Initialize the moth analyzer with sample directory.
         
@@ -24,6 +65,11 @@ class MothAnalyzerTest:
         - sample_dir: Directory containing the sample data
         - date_str: Date string in YYYY-MM-DD format for the sample data
         - mm_per_pixel: Calibration factor for converting pixels to millimeters
+        - coarse_detection: Detect on downscaled frames and refine candidates at full resolution
+        - sheet_mask_path: Optional mask image (white = sheet) limiting detection to the sheet area
+        - background_model: Only search the parts of each frame that changed, and drop detections
+          that match the empty sheet (see BackgroundDetector)
+        - empty_sheet_path: Optional photo of the empty sheet for the background model
         """
         self.base_dir = os.path.abspath(sample_dir)
         self.date_str = date_str
@@ -34,6 +80,18 @@ class MothAnalyzerTest:
         self.red_dir = os.path.join(self.base_dir, self.date_str, "red_light")
         self.analysis_dir = os.path.join(self.base_dir, self.date_str, "analysis")
         
+        # Decoded frames shared by validation, detection and measurement
+        self.frames = FrameCache()
+        
+        # Detection pipelines reused for every frame, and for every moth ROI
+        sheet_mask = load_sheet_mask(sheet_mask_path) if sheet_mask_path else None
+        if background_model:
+            empty_sheet = load_empty_sheet(empty_sheet_path) if empty_sheet_path else None
+            self.detector = BackgroundDetector(coarse=coarse_detection, sheet_mask=sheet_mask, empty_sheet=empty_sheet)
+        else:
+            self.detector = MothDetector(coarse=coarse_detection, sheet_mask=sheet_mask)
+        self.roi_detector = MothDetector()
+        
         # Create analysis directory if it doesn't exist
         os.makedirs(self.analysis_dir, exist_ok=True)
         
@@ -45,25 +103,10 @@ class MothAnalyzerTest:
 
 
     def measure_moth_dimensions(self, roi):
-        # Convert to grayscale
-        gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-        
-        # Enhance contrast using CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.5, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
-        
-        # Apply Gaussian blur
-        blurred = cv2.GaussianBlur(enhanced, (5, 5), 0)
-        
-        # Combine adaptive and global thresholding
-        adaptive_thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                            cv2.THRESH_BINARY_INV, 11, 2)
-        _, global_thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        thresh = cv2.addWeighted(adaptive_thresh, 0.7, global_thresh, 0.3, 0)
-        
-        # Clean up with morphology
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
+        # Grayscale, CLAHE, blur, combined adaptive/global threshold and morphology,
+        # using the same pipeline (and reused CLAHE object and kernel) as detection
+        enhanced = self.roi_detector.enhance(roi)
+        cleaned = self.roi_detector.threshold(enhanced)
         
         # Find contours
         contours, _ = cv2.findContours(cleaned, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -74,50 +117,7 @@ class MothAnalyzerTest:
         # Get the largest contour
         largest_contour = max(contours, key=cv2.contourArea)
         
-        # Get all points from the contour
-        points = largest_contour.reshape(-1, 2)
-        
-        # Calculate the convex hull to better handle potential concavities
-        hull = cv2.convexHull(largest_contour)
-        hull_points = hull.reshape(-1, 2)
-        
-        # Find the maximum distance between any two points on the hull
-        max_length = 0
-        max_width = 0
-        angle = 0
-        p1_max = None
-        p2_max = None
-        
-        for i in range(len(hull_points)):
-            for j in range(i + 1, len(hull_points)):
-                pt1 = hull_points[i]
-                pt2 = hull_points[j]
-                
-                # Calculate distance between points
-                length = np.sqrt((pt2[0] - pt1[0])**2 + (pt2[1] - pt1[1])**2)
-                
-                if length > max_length:
-                    max_length = length
-                    p1_max = pt1
-                    p2_max = pt2
-                    # Calculate angle with horizontal
-                    angle = np.degrees(np.arctan2(pt2[1] - pt1[1], pt2[0] - pt1[0]))
-                    
-                    # Calculate width perpendicular to this length
-                    # Convert points to numpy array for easier manipulation
-                    points_arr = largest_contour.reshape(-1, 2)
-                    
-                    # Create vector in direction of length
-                    length_vector = np.array([pt2 - pt1]) / np.linalg.norm(pt2 - pt1)
-                    
-                    # Create perpendicular vector
-                    perp_vector = np.array([-length_vector[0][1], length_vector[0][0]])
-                    
-                    # Project all points onto perpendicular vector
-                    projections = np.abs(np.dot(points_arr - pt1, perp_vector))
-                    max_width = np.max(projections)
-        
-        return max_length, max_width, angle
+        return contour_dimensions(largest_contour)
 
     def create_measurement_visualization(self, roi, length_px, width_px, angle, moth_id):
         """
@@ -154,6 +154,11 @@ class MothAnalyzerTest:
         cv2.imwrite(output_path, vis_img)
         return vis_img
 
+    def reset_detector(self):
+        """Start a new sequence of frames: the background model must not carry over from another pass"""
+        if isinstance(self.detector, BackgroundDetector):
+            self.detector.reset()
+
     def analyze_consistent_moths(self):
         """Analyze moths with measurement visualization"""
         # Get the last 3 images from attractive phase
@@ -162,13 +167,14 @@ class MothAnalyzerTest:
         
         print(f"Processing images: {image_files}")
         
-        base_image = cv2.imread(image_paths[-1])
+        base_image = self.frames.get(image_paths[-1])
         if base_image is None:
             raise ValueError(f"Could not read image: {image_paths[-1]}")
         
         # Get consistent moth detections
+        self.reset_detector()
         detection_vis_path = os.path.join(self.analysis_dir, "consistent_detections.jpg")
-        consistent_boxes = process_images_for_consistency(image_paths, detection_vis_path)
+        consistent_boxes = process_images_for_consistency(image_paths, detection_vis_path, self.frames, self.detector)
         
         print(f"Found {len(consistent_boxes)} consistent moth detections")
         
@@ -224,58 +230,31 @@ class MothAnalyzerTest:
 
     def analyze_departures(self):
         """Analyze how quickly moths depart after red light is activated"""
+        # Departures counted live during the red-light phase need no second pass
+        streamed_path = os.path.join(self.analysis_dir, STREAMED_DEPARTURES_CSV)
+        if os.path.exists(streamed_path):
+            print(f"Using departures recorded during the session: {streamed_path}")
+            return pd.read_csv(streamed_path)
+
         red_images = sorted([f for f in os.listdir(self.red_dir) if f.endswith('.jpg')])
         
         if not red_images:
             print("No red phase images found")
             return pd.DataFrame()
-            
-        departure_data = []
-        
-        # Get baseline image (last from attractive phase)
-        last_attractive = sorted([f for f in os.listdir(self.attractive_dir) if f.endswith('.jpg')])[-1]
-        baseline_path = os.path.join(self.attractive_dir, last_attractive)
-        print(f"Using baseline image: {last_attractive}")
-        
-        # Get timestamp when red light was activated
-        red_start_time = datetime.strptime(red_images[0].replace('.jpg', ''), '%H-%M-%S')
-        print(f"Red light activated at: {red_start_time.strftime('%H:%M:%S')}")
         
-        # Track departures through the sequence
-        moths_present = None  # Will store initial moth count
-        for i, img_name in enumerate(red_images):
-            current_path = os.path.join(self.red_dir, img_name)
-            
-            # Get current moth positions
-            current_boxes = get_bounding_boxes(current_path)
-            
-            # On first image, establish baseline count
-            if i == 0:
-                moths_present = len(current_boxes)
-                print(f"Initial moth count: {moths_present}")
-                continue
-                
-            # Calculate departures
-            current_time = datetime.strptime(img_name.replace('.jpg', ''), '%H-%M-%S')
-            time_since_red = (current_time - red_start_time).total_seconds() / 60  # Minutes
-            
-            moths_now = len(current_boxes)
-            moths_departed = moths_present - moths_now if moths_now < moths_present else 0
-            
-            if moths_departed > 0:
-                departure_data.append({
-                    'date': self.date_str,
-                    'time_since_red_minutes': round(time_since_red, 2),
-                    'moths_departed': moths_departed,
-                    'moths_remaining': moths_now,
-                    'image_name': img_name
-                })
-                moths_present = moths_now  # Update baseline for next image
-                
-                print(f"At {time_since_red:.1f} minutes: {moths_departed} moth(s) departed")
+        # Follow the moths through the whole saved session, as during a live session
+        attractive_images = sorted([f for f in os.listdir(self.attractive_dir) if f.endswith('.jpg')])
+        print(f"Tracking moths through {len(attractive_images)} attractive and {len(red_images)} red phase images")
+        self.reset_detector()
+        stream = DepartureStream(self.date_str, detector=self.detector, frame_cache=self.frames,
+                                 tracks_csv=os.path.join(self.analysis_dir, MOTH_TRACKS_CSV))
+        for img_name in attractive_images:
+            stream.add_attractive_frame(os.path.join(self.attractive_dir, img_name))
+        for img_name in red_images:
+            stream.add_frame(os.path.join(self.red_dir, img_name))
         
         # Create DataFrame and save
-        df = pd.DataFrame(departure_data)
+        df = stream.finish()
         if not df.empty:
             departures_path = os.path.join(self.analysis_dir, "moth_departures.csv")
             df.to_csv(departures_path, index=False)
@@ -299,7 +278,7 @@ class MothAnalyzerTest:
                 return False
 
             # Test image reading
-            test_image = cv2.imread(os.path.join(self.attractive_dir, attractive_images[-1]))
+            test_image = self.frames.get(os.path.join(self.attractive_dir, attractive_images[-1]))
             if test_image is None:
                 print("Error: Unable to read image files")
                 return False
@@ -339,6 +318,10 @@ class MothAnalyzerTest:
             
             print("\n=== Analysis Complete ===")
             print(f"Results saved in: {self.analysis_dir}")
+            print(f"Frame cache: {self.frames.summary()}")
+            if isinstance(self.detector, BackgroundDetector):
+                print(f"Background model: {self.detector.summary()}")
+            self.frames.clear()
             
             return {
                 'measurements': moth_measurements,
@@ -412,7 +395,8 @@ def main():
                         print("\nResults can be found in:")
                         print(f"1. {os.path.join(analyzer.analysis_dir, 'moth_measurements.csv')}")
                         print(f"2. {os.path.join(analyzer.analysis_dir, 'moth_departures.csv')}")
-                        print(f"3. ROI and measurement images in: {analyzer.analysis_dir}")
+                        print(f"3. {os.path.join(analyzer.analysis_dir, MOTH_TRACKS_CSV)}")
+                        print(f"4. ROI and measurement images in: {analyzer.analysis_dir}")
                 
                 except Exception as e:
                     print(f"\nError running analysis: {e}")
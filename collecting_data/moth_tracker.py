@@ -0,0 +1,93 @@
+from get_bounding_boxes import assign_nearest
+
+# Default number of consecutive frames a moth may go undetected before it counts as departed
+MAX_MISSED_FRAMES = 1
+
+
+class MothTracker:
+    def __init__(self, max_distance=20, max_missed=MAX_MISSED_FRAMES):
+        """
+        Follow individual moths through a session's frames, giving each a persistent ID.
+
+        Every frame's detections are matched to the tracked moths' last known boxes
+        (a moth may move at most max_distance pixels between the frames it is seen
+        in); unmatched detections are new arrivals. A moth missing for more than
+        max_missed frames has departed, as of the first frame it was missing from,
+        so a single missed detection does not count as a departure and re-arrival.
+
+        Parameters:
+        - max_distance: Maximum distance in pixels between a moth's box centers in consecutive sightings
+        - max_missed: Frames a moth may go undetected before it counts as departed
+        """
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.frame_names = []
+        self.tracks = []
+        self.active = []
+
+    def update(self, frame_name, boxes):
+        """
+        Add the next frame's detections.
+
+        Parameters:
+        - frame_name: Name of the frame (e.g. its image file name)
+        - boxes: Bounding boxes [(x, y, w, h), ...] detected in the frame
+
+        Returns:
+        - Tracks whose departure this frame confirmed
+        """
+        frame_index = len(self.frame_names)
+        self.frame_names.append(frame_name)
+        matches = assign_nearest([track['box'] for track in self.active], boxes, self.max_distance)
+
+        still_active = []
+        departed = []
+        for track, j in zip(self.active, matches):
+            if j is not None:
+                track['box'] = boxes[j]
+                track['last_frame'] = frame_index
+                track['frames_seen'] += 1
+                still_active.append(track)
+            elif frame_index - track['last_frame'] > self.max_missed:
+                track['departed_frame'] = track['last_frame'] + 1
+                departed.append(track)
+            else:
+                still_active.append(track)
+
+        # Unmatched detections are new moths
+        matched = set(j for j in matches if j is not None)
+        for j, box in enumerate(boxes):
+            if j not in matched:
+                track = {
+                    'track_id': len(self.tracks) + 1,
+                    'box': box,
+                    'first_frame': frame_index,
+                    'last_frame': frame_index,
+                    'departed_frame': None,
+                    'frames_seen': 1
+                }
+                self.tracks.append(track)
+                still_active.append(track)
+
+        self.active = still_active
+        return departed
+
+    def finish(self):
+        """
+        End the session: moths missing from the last frame count as departed.
+
+        Returns:
+        - Tracks departed as of this call, in order of departure
+        """
+        last_frame = len(self.frame_names) - 1
+        departed = [track for track in self.active if track['last_frame'] < last_frame]
+        for track in departed:
+            track['departed_frame'] = track['last_frame'] + 1
+        self.active = [track for track in self.active if track['last_frame'] == last_frame]
+        return sorted(departed, key=lambda track: track['departed_frame'])
+
+    def present_at(self, frame_index):
+        """Number of tracked moths present at a frame whose departures are all known"""
+        return sum(1 for track in self.tracks
+                   if track['first_frame'] <= frame_index
+                   and (track['departed_frame'] is None or track['departed_frame'] > frame_index))
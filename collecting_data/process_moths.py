@@ -1,12 +1,47 @@
 import os
 import sys
+import time
+import argparse
+import threading
 import pandas as pd
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import shutil
 from moth_analyzer import MothAnalyzerTest
+from daily_rollup import DailyRollup
+from storage import DATASETS, open_store, parse_dates
+
+# Calibrated camera scale
+MM_PER_PIXEL = 0.0703
+
+def analyze_session(sample_dir, date_str, mm_per_pixel=MM_PER_PIXEL, coarse_detection=False, sheet_mask_path=None,
+                    background_model=False, empty_sheet_path=None):
+    """
+    Analyze one session; runs in a worker process during batch processing.
+
+    Returns:
+    - (date_str, results dict or None, elapsed seconds)
+    """
+    started = time.perf_counter()
+    try:
+        analyzer = MothAnalyzerTest(sample_dir=sample_dir, date_str=date_str, mm_per_pixel=mm_per_pixel,
+                                    coarse_detection=coarse_detection, sheet_mask_path=sheet_mask_path,
+                                    background_model=background_model, empty_sheet_path=empty_sheet_path)
+        results = analyzer.run_analysis()
+    except Exception as e:
+        print(f"Error processing session {date_str}: {str(e)}")
+        results = None
+    return date_str, results, time.perf_counter() - started
+
+def stored_dates(store):
+    """Set of YYYY-MM-DD dates that already have rows in a store"""
+    if not store.exists():
+        return set()
+    return set(store.read(columns=['date'])['date'].dt.strftime('%Y-%m-%d'))
 
 class ProcessMoths:
-    def __init__(self):
+    def __init__(self, mm_per_pixel=MM_PER_PIXEL, coarse_detection=False, sheet_mask_path=None,
+                 background_model=False, empty_sheet_path=None):
         """Initialize paths for moth processing"""
         # Base paths
         self.base_dir = os.path.expanduser("~/Documents")
@@ -15,6 +50,15 @@ class ProcessMoths:
         self.images_dir = os.path.join(self.moths_dir, "images")
         self.data_dir = os.path.join(self.base_dir, "app/data")
         self.measurements_csv = os.path.join(self.data_dir, "moth_measurements.csv")
+        self.measurements_store = open_store("moths", self.data_dir)
+        self.departures_store = open_store("departures", self.data_dir)
+        self.rollup = DailyRollup(os.path.join(self.data_dir, "daily_rollup.csv"))
+        self.mm_per_pixel = mm_per_pixel
+        self.coarse_detection = coarse_detection
+        self.sheet_mask_path = sheet_mask_path
+        self.background_model = background_model
+        self.empty_sheet_path = empty_sheet_path
+        self.compactions = []
 
         # Ensure required directories exist
         os.makedirs(self.data_dir, exist_ok=True)
@@ -61,15 +105,20 @@ class ProcessMoths:
             analyzer = MothAnalyzerTest(
                 sample_dir=self.moths_dir,
                 date_str=latest_date,
-                mm_per_pixel=0.0703  # Using your calibrated value
+                mm_per_pixel=self.mm_per_pixel,
+                coarse_detection=self.coarse_detection,
+                sheet_mask_path=self.sheet_mask_path,
+                background_model=self.background_model,
+                empty_sheet_path=self.empty_sheet_path
             )
             
             # Run analysis
             results = analyzer.run_analysis()
             
             if results and not results['measurements'].empty:
-                # Update measurements CSV
+                # Update measurements and departures stores
                 self.update_measurements(results['measurements'])
+                self.update_departures(results['departures'])
                 print(f"Successfully processed {latest_date}")
                 return True
             else:
@@ -80,48 +129,160 @@ class ProcessMoths:
             print(f"Error processing session: {str(e)}")
             return False
 
-    def update_measurements(self, new_measurements):
-        """Update the measurements CSV with new data"""
-        try:
-            if os.path.exists(self.measurements_csv):
-                # Load existing data
-                master_df = pd.read_csv(self.measurements_csv)
-                
-                # Check if this data is already in the master CSV
-                existing_dates = master_df['date'].unique()
-                new_dates = new_measurements['date'].unique()
-                
-                # Only append if we have new dates
-                if not any(date in existing_dates for date in new_dates):
-                    # Append new data
-                    master_df = pd.concat([master_df, new_measurements], ignore_index=True)
+    def session_dates(self):
+        """All session directories (YYYY-MM-DD) under the images directory, oldest first"""
+        dates = []
+        for date_dir in os.listdir(self.images_dir):
+            if not os.path.isdir(os.path.join(self.images_dir, date_dir)):
+                continue
+            try:
+                datetime.strptime(date_dir, '%Y-%m-%d')
+            except ValueError:
+                continue
+            dates.append(date_dir)
+        return sorted(dates)
+
+    def process_all_sessions(self, reprocess=False, workers=None):
+        """
+        Analyze every unprocessed session in parallel and store the results in one write.
+
+        Parameters:
+        - reprocess: Also analyze sessions that are already stored, replacing their rows
+          (e.g. after a calibration change)
+        - workers: Number of worker processes (default: one per CPU)
+        """
+        dates = self.session_dates()
+        if not reprocess:
+            done = stored_dates(self.measurements_store)
+            dates = [date for date in dates if date not in done]
+
+        if not dates:
+            print("No unprocessed sessions found.")
+            return True
+
+        workers = min(workers or os.cpu_count() or 1, len(dates))
+        print(f"Processing {len(dates)} session(s) with {workers} worker process(es)")
+
+        results_by_date = {}
+        failed = []
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(analyze_session, self.moths_dir, date, self.mm_per_pixel,
+                                   self.coarse_detection, self.sheet_mask_path,
+                                   self.background_model, self.empty_sheet_path)
+                       for date in dates]
+            for finished, future in enumerate(as_completed(futures), 1):
+                date_str, results, seconds = future.result()
+                if results and not results['measurements'].empty:
+                    results_by_date[date_str] = results
+                    status = (f"{len(results['measurements'])} moths, "
+                              f"{len(results['departures'])} departure events")
                 else:
-                    print("This data appears to already be in the master CSV. Skipping update.")
-                    return
+                    failed.append(date_str)
+                    status = "no valid measurements"
+                print(f"[{finished}/{len(dates)}] {date_str}: {status} ({seconds:.1f}s)")
+
+        # Write all sessions at once, in date order
+        if results_by_date:
+            ordered = [results_by_date[date] for date in sorted(results_by_date)]
+            new_measurements = pd.concat([results['measurements'] for results in ordered], ignore_index=True)
+            new_departures = pd.concat([results['departures'] for results in ordered], ignore_index=True)
+            if reprocess:
+                self.replace_sessions(new_measurements, new_departures)
             else:
-                master_df = new_measurements
-            
-            # Sort by date and time
-            master_df.sort_values(['date', 'timestamp'], inplace=True)
-            
-            # Save updated data
-            master_df.to_csv(self.measurements_csv, index=False)
-            print(f"Updated measurements CSV: {self.measurements_csv}")
-            
+                self.update_measurements(new_measurements)
+                self.update_departures(new_departures)
+
+        print(f"Processed {len(dates) - len(failed)} of {len(dates)} session(s) "
+              f"in {time.perf_counter() - started:.1f}s")
+        if failed:
+            print(f"Sessions without results: {', '.join(sorted(failed))}")
+        return not failed
+
+    def replace_sessions(self, new_measurements, new_departures):
+        """Replace the stored rows for the reprocessed dates and rebuild the rollup"""
+        dates = set(new_measurements['date'])
+        for name, store, new_rows in (('moths', self.measurements_store, new_measurements),
+                                      ('departures', self.departures_store, new_departures)):
+            if new_rows.empty and not store.exists():
+                continue
+            rows = parse_dates(new_rows.copy(), DATASETS[name][2])
+            if store.exists():
+                existing = store.read()
+                existing = existing[~existing['date'].dt.strftime('%Y-%m-%d').isin(dates)]
+                rows = pd.concat([existing, rows], ignore_index=True)
+            store.replace(rows.sort_values(DATASETS[name][1], kind='stable'))
+            print(f"Replaced {len(new_rows)} {name} rows for {len(dates)} session(s)")
+
+        # Old counts for these dates cannot be subtracted, so recompute the rollup
+        weather_store = open_store("weather", self.data_dir)
+        readings = weather_store.read().to_dict('records') if weather_store.exists() else []
+        self.rollup.rebuild_from(self.measurements_store.read().to_dict('records'), readings)
+
+    def update_measurements(self, new_measurements):
+        """Ingest new measurements into the measurements store, skipping any already stored"""
+        try:
+            # Measurements are identified by date, source image and moth ID, so a re-run adds nothing
+            new_measurements = new_measurements.sort_values(['date', 'timestamp'])
+            added = self.measurements_store.ingest(new_measurements)
+            if added.empty:
+                print("These measurements appear to already be stored. Skipping update.")
+                return
+            if len(added) < len(new_measurements):
+                print(f"Skipping {len(new_measurements) - len(added)} measurements already stored")
+            print(f"Added {len(added)} measurements to the moth measurements store")
+
+            # Add only the new rows to the per-day rollup used by the dashboard
+            self.rollup.add_measurements(added.to_dict('records'))
+            self.compact_in_background(self.measurements_store)
+
         except Exception as e:
             print(f"Error updating measurements CSV: {str(e)}")
             raise
 
-def process_moths():
+    def update_departures(self, new_departures):
+        """Ingest a session's departure events into the departures store"""
+        if new_departures.empty:
+            return
+
+        # Events are identified by date and image; some may have been stored live during the session
+        added = self.departures_store.ingest(new_departures)
+        if added.empty:
+            print("These departures appear to already be stored. Skipping update.")
+            return
+        print(f"Added {len(added)} departure events to the departures store")
+        self.compact_in_background(self.departures_store)
+
+    def compact_in_background(self, store):
+        """Compact a store on a separate thread, so the rest of the run does not wait for it"""
+        def compact():
+            try:
+                store.compact()
+            except Exception as e:
+                print(f"Error compacting the {store.name} store: {str(e)}")
+
+        thread = threading.Thread(target=compact, name=f"compact-{store.name}")
+        thread.start()
+        self.compactions.append(thread)
+
+    def wait_for_compaction(self):
+        """Wait for background compactions to finish"""
+        for thread in self.compactions:
+            thread.join()
+        self.compactions = []
+
+def process_moths(mm_per_pixel=MM_PER_PIXEL, coarse_detection=False, sheet_mask_path=None,
+                  background_model=False, empty_sheet_path=None):
     """Function to be called after data collection"""
     try:
-        processor = ProcessMoths()
+        processor = ProcessMoths(mm_per_pixel, coarse_detection, sheet_mask_path, background_model, empty_sheet_path)
         
         # Clean up old directories
         processor.cleanup_old_directories()
         
         # Process latest session
         success = processor.process_latest_session()
+        processor.wait_for_compaction()
         
         if success:
             print("Processing completed successfully")
@@ -134,5 +295,31 @@ def process_moths():
         
     return True
 
+def main():
+    parser = argparse.ArgumentParser(description="Analyze moth image sessions")
+    parser.add_argument("--all", action="store_true",
+                        help="Process every unprocessed session in parallel instead of only the latest")
+    parser.add_argument("--reprocess", action="store_true",
+                        help="With --all, also redo sessions that are already stored")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--mm-per-pixel", type=float, default=MM_PER_PIXEL, help="Calibration factor")
+    parser.add_argument("--coarse", action="store_true",
+                        help="Detect on downscaled frames and refine candidates at full resolution")
+    parser.add_argument("--sheet-mask", default=None,
+                        help="Mask image (white = sheet) limiting detection to the sheet area")
+    parser.add_argument("--background-model", action="store_true",
+                        help="Only search the parts of each frame that changed, and drop sheet texture")
+    parser.add_argument("--empty-sheet", default=None,
+                        help="Photo of the empty sheet for --background-model")
+    args = parser.parse_args()
+
+    if args.all:
+        processor = ProcessMoths(args.mm_per_pixel, args.coarse, args.sheet_mask,
+                                 args.background_model, args.empty_sheet)
+        processor.process_all_sessions(args.reprocess, args.workers)
+        processor.wait_for_compaction()
+    else:
+        process_moths(args.mm_per_pixel, args.coarse, args.sheet_mask, args.background_model, args.empty_sheet)
+
 if __name__ == "__main__":
-    process_moths()
+    main()
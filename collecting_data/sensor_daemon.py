@@ -0,0 +1,223 @@
+import os
+import time
+import signal
+import argparse
+import threading
+import pandas as pd
+from datetime import datetime
+from storage import open_store, DATA_DIR
+from daily_rollup import DailyRollup
+from sensors import open_sources, FakeSource, DHTSource, LightSource, WeatherSource, SESSION_MARKER
+from collect_weather_data import (API_KEY, LATITUDE, LONGITUDE, DHT_PIN, LOG_COLUMNS, STALE_COLUMN,
+                                  WEATHER_CACHE_FILE, build_row, write_row)
+
+# Seconds between readings of each source
+SAMPLE_SECONDS = {'weather': 600, 'dht': 60, 'light': 60}
+
+# Faster rates while a session is running (SESSION_MARKER exists), to follow the light through departures
+SESSION_SAMPLE_SECONDS = {'weather': 600, 'dht': 30, 'light': 10}
+
+# Buffered readings are written at least this often, and whenever this many are waiting
+FLUSH_SECONDS = 60
+FLUSH_ROWS = 500
+
+# Seconds between rows of the weather log, which keeps its hourly resolution for the dashboard
+LOG_SECONDS = 3600
+
+# Columns of the readings dataset: one row per reading, with only the reading source's columns filled
+# (stale weather readings are not new readings, so they are never written here)
+READING_COLUMNS = ["Timestamp", "Source"] + [column for column in LOG_COLUMNS[1:] if column != STALE_COLUMN]
+
+
+class SensorDaemon:
+    def __init__(self, sources, sample_seconds=None, session_sample_seconds=None, readings_store=None,
+                 weather_store=None, flush_seconds=FLUSH_SECONDS, log_seconds=LOG_SECONDS,
+                 session_marker=SESSION_MARKER, rollup=None):
+        """
+        Resident collector: sample every source at its own rate and write the readings in batches.
+
+        Sources are started once and kept open. Each is read on its own thread on
+        fixed deadlines (start + i * interval, skipping slots a slow read overran),
+        using the session rates while session_marker exists. Readings are buffered
+        in memory and appended to the readings store every flush_seconds (or once
+        FLUSH_ROWS are waiting); every log_seconds the latest reading of each
+        source is also written as one row of the weather log, as the hourly cron
+        job did. stop() (SIGTERM or SIGINT when run as a script) writes whatever is
+        still buffered before returning.
+
+        Parameters:
+        - sources: Started sources (see sensors.py)
+        - sample_seconds: Source name -> seconds between readings (SAMPLE_SECONDS by default)
+        - session_sample_seconds: The same while a session is running (SESSION_SAMPLE_SECONDS by default)
+        - readings_store: Store for every reading (the configured 'readings' store if None)
+        - weather_store: Store for the weather log rows (the configured 'weather' store if None)
+        - flush_seconds: Maximum time a reading stays buffered
+        - log_seconds: Time between weather log rows (None to write none)
+        - session_marker: File whose presence selects the session rates
+        - rollup: DailyRollup the weather log rows are added to (the default one if None)
+        """
+        self.sources = sources
+        self.sample_seconds = dict(SAMPLE_SECONDS, **(sample_seconds or {}))
+        self.session_sample_seconds = dict(SESSION_SAMPLE_SECONDS, **(session_sample_seconds or {}))
+        self.readings_store = readings_store or open_store("readings")
+        self.weather_store = weather_store
+        self.flush_seconds = flush_seconds
+        self.log_seconds = log_seconds
+        self.session_marker = session_marker
+        self.rollup = rollup
+
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.latest = {}  # Source name -> last good {'time', 'values'}
+        self.readings = 0
+        self.written = 0
+
+    def interval(self, source):
+        """Seconds until the source's next reading, at the session rate while a session is running"""
+        rates = self.session_sample_seconds if os.path.exists(self.session_marker) else self.sample_seconds
+        return rates.get(source.name, SAMPLE_SECONDS.get(source.name, 60))
+
+    def _sample(self, source):
+        """Thread body: read one source on its deadlines until stopped"""
+        due = time.monotonic()
+        while not self.stopping.is_set():
+            try:
+                values = source.read()
+            except Exception as e:
+                print(f"Error reading {source.name}: {str(e)}")
+                values = None
+            if values is not None and values.get('stale'):
+                # The last good weather reading again: keep it for the weather log, but it is not a new reading
+                with self.lock:
+                    self.latest[source.name] = {'time': datetime.now(), 'values': values}
+            elif values is not None:
+                sample = {'time': datetime.now(), 'values': values}
+                row = dict.fromkeys(READING_COLUMNS)
+                row["Timestamp"] = sample['time'].isoformat(sep=' ', timespec='milliseconds')
+                row["Source"] = source.name
+                for key, column in source.columns.items():
+                    row[column] = values.get(key)
+                with self.lock:
+                    self.latest[source.name] = sample
+                    self.buffer.append(row)
+                    self.readings += 1
+
+            # Next deadline; slots a slow read ran past are skipped rather than read late
+            due += self.interval(source)
+            now = time.monotonic()
+            if due < now:
+                due = now
+            self.stopping.wait(due - now)
+
+    def flush(self):
+        """Write the buffered readings in one append; they are kept for the next flush if it fails"""
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+        if not rows:
+            return
+        try:
+            self.readings_store.append(pd.DataFrame(rows, columns=READING_COLUMNS, dtype=object))
+            self.written += len(rows)
+        except Exception as e:
+            print(f"Error writing {len(rows)} readings: {str(e)}")
+            with self.lock:
+                self.buffer = rows + self.buffer
+
+    def log_row(self):
+        """Write one weather log row from each source's latest reading, if taken since the last row"""
+        cutoff = datetime.now().timestamp() - (self.log_seconds or 0)
+        with self.lock:
+            samples = {name: sample for name, sample in self.latest.items() if sample['time'].timestamp() >= cutoff}
+        try:
+            write_row(build_row(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), samples, self.sources),
+                      self.weather_store, self.rollup)
+        except Exception as e:
+            print(f"Error writing the weather log row: {str(e)}")
+
+    def run(self):
+        """Sample until stop() is called, then write everything still buffered and close the sources"""
+        threads = [threading.Thread(target=self._sample, args=(source,), name=f"sample-{source.name}", daemon=True)
+                   for source in self.sources]
+        for thread in threads:
+            thread.start()
+        print(f"Sampling {', '.join(source.name for source in self.sources)}")
+
+        next_flush = time.monotonic() + self.flush_seconds
+        next_log = time.monotonic() + self.log_seconds if self.log_seconds else None
+        try:
+            while not self.stopping.wait(min(1.0, self.flush_seconds)):
+                now = time.monotonic()
+                with self.lock:
+                    waiting = len(self.buffer)
+                if now >= next_flush or waiting >= FLUSH_ROWS:
+                    self.flush()
+                    next_flush = now + self.flush_seconds
+                if next_log is not None and now >= next_log:
+                    self.log_row()
+                    next_log += self.log_seconds
+        finally:
+            # Also on an unexpected error: stop the sampling threads, keep what they read and release the sensors.
+            # A read in progress gets its deadline to finish, so its reading is not lost
+            self.stopping.set()
+            for source, thread in zip(self.sources, threads):
+                thread.join(getattr(source, 'deadline_seconds', 5))
+            self.flush()
+            for source in self.sources:
+                try:
+                    source.close()
+                except Exception as e:
+                    print(f"Error closing {source.name}: {str(e)}")
+        print(f"Stopped after {self.readings} readings ({self.written} written)")
+
+    def stop(self, *args):
+        """Ask run() to finish (also usable as a signal handler)"""
+        self.stopping.set()
+
+
+def fake_sources():
+    """Fake weather, DHT and light sources for a dry run without hardware"""
+    return [
+        FakeSource(WeatherSource.name, WeatherSource.columns,
+                   {"rainfall": 0, "cloud_cover": 40, "description": "scattered clouds"}, read_seconds=0.5),
+        FakeSource(DHTSource.name, DHTSource.columns, {"temperature": 12.0, "humidity": 80.0}, read_seconds=2.0),
+        FakeSource(LightSource.name, LightSource.columns,
+                   {"red": 40, "green": 38, "blue": 35, "color_temperature": 3200, "lux": 12.5}, read_seconds=0.1),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample the weather API and sensors continuously")
+    parser.add_argument("--light-seconds", type=float, default=None,
+                        help=f"Seconds between light readings (default {SAMPLE_SECONDS['light']}, "
+                             f"{SESSION_SAMPLE_SECONDS['light']} during sessions)")
+    parser.add_argument("--dht-seconds", type=float, default=None,
+                        help=f"Seconds between DHT readings (default {SAMPLE_SECONDS['dht']}, "
+                             f"{SESSION_SAMPLE_SECONDS['dht']} during sessions)")
+    parser.add_argument("--flush-seconds", type=float, default=FLUSH_SECONDS,
+                        help="Maximum time readings are buffered before being written")
+    parser.add_argument("--fake", action="store_true", help="Use fake sensors (dry run without hardware)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Data directory")
+    args = parser.parse_args()
+
+    # A rate given on the command line applies in and out of sessions
+    rates = {}
+    if args.light_seconds is not None:
+        rates['light'] = args.light_seconds
+    if args.dht_seconds is not None:
+        rates['dht'] = args.dht_seconds
+
+    if args.fake:
+        sources = fake_sources()
+    else:
+        sources = open_sources(API_KEY, LATITUDE, LONGITUDE, DHT_PIN, os.path.join(args.data_dir, WEATHER_CACHE_FILE))
+    daemon = SensorDaemon(sources, rates, rates, readings_store=open_store("readings", args.data_dir),
+                          weather_store=open_store("weather", args.data_dir), flush_seconds=args.flush_seconds,
+                          rollup=DailyRollup(os.path.join(args.data_dir, "daily_rollup.csv")))
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    daemon.run()
+
+
+if __name__ == "__main__":
+    main()
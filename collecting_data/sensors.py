@@ -0,0 +1,219 @@
+import os
+import time
+import tempfile
+import threading
+from datetime import datetime
+from weather_client import WeatherClient, WEATHER_URL
+
+# Present while attractive_mode.py runs a session, so the sampling daemon can read faster
+SESSION_MARKER = os.path.join(tempfile.gettempdir(), "moth_session_active")
+
+
+class WeatherSource:
+    """Current rainfall, cloud cover and description from the OpenWeatherMap API (see WeatherClient)"""
+
+    name = "weather"
+    columns = {"rainfall": "Rainfall", "cloud_cover": "Cloud_Cover", "description": "Weather_Description"}
+
+    def __init__(self, api_key, lat, lon, url=WEATHER_URL, deadline_seconds=15, cache_path=None):
+        """
+        Parameters:
+        - api_key, lat, lon: OpenWeatherMap API key and location
+        - url: API endpoint (a local stand-in server for tests)
+        - deadline_seconds: Time allowed for a reading, retries included
+        - cache_path: Optional file keeping the last good reading, for a stale fallback between runs
+        """
+        self.client = WeatherClient(api_key, lat, lon, url=url, timeout_seconds=min(10, deadline_seconds),
+                                    cache_path=cache_path)
+        self.deadline_seconds = deadline_seconds
+
+    def start(self):
+        pass
+
+    def read(self):
+        """The current weather; the last good reading (with 'stale' set) if the API cannot give one"""
+        values = self.client.current(self.deadline_seconds)
+        if values is not None and values['stale']:
+            print(f"Using stale weather data from {values['fetched_at'].strftime('%Y-%m-%d %H:%M')}")
+        return values
+
+    def close(self):
+        self.client.close()
+
+
+class DHTSource:
+    """Temperature and humidity from a DHT11 sensor"""
+
+    name = "dht"
+    columns = {"temperature": "Temperature", "humidity": "Humidity"}
+
+    def __init__(self, pin=4, deadline_seconds=10):
+        """
+        Parameters:
+        - pin: GPIO pin the sensor is connected to
+        - deadline_seconds: Time allowed for a reading; retries are limited to fit in it
+        """
+        self.pin = pin
+        self.deadline_seconds = deadline_seconds
+        self.dht = None
+
+    def start(self):
+        import Adafruit_DHT
+
+        self.dht = Adafruit_DHT
+
+    def read(self):
+        # read_retry waits 2 s between attempts
+        retries = max(1, int(self.deadline_seconds // 2))
+        humidity, temperature = self.dht.read_retry(self.dht.DHT11, self.pin, retries=retries, delay_seconds=2)
+
+        # Check if readings are valid
+        if humidity is None or temperature is None:
+            print("Failed to get DHT reading.")
+            return None
+
+        # Check physical limits
+        if temperature < -40 or temperature > 80:
+            print(f"Error: Temperature reading {temperature}°C is outside physical limits (-40°C to 80°C)")
+            return None
+
+        if humidity < 0 or humidity > 100:
+            print(f"Error: Humidity reading {humidity}% is outside physical limits (0% to 100%)")
+            return None
+
+        return {"temperature": temperature, "humidity": humidity}
+
+    def close(self):
+        pass
+
+
+class LightSource:
+    """RGB, colour temperature and lux from a TCS34725 sensor on the I2C bus"""
+
+    name = "light"
+    columns = {"red": "Red", "green": "Green", "blue": "Blue", "color_temperature": "Color", "lux": "Lux"}
+
+    def __init__(self, deadline_seconds=5):
+        self.deadline_seconds = deadline_seconds
+        self.sensor = None
+
+    def start(self):
+        import board
+        import busio
+        import adafruit_tcs34725
+
+        self.sensor = adafruit_tcs34725.TCS34725(busio.I2C(board.SCL, board.SDA))
+
+    def read(self):
+        """Read the sensor, with basic physical limits validation"""
+        try:
+            r, g, b = self.sensor.color_rgb_bytes
+            color_temp = self.sensor.color_temperature
+            lux = self.sensor.lux
+        except Exception as e:
+            print(f"Error reading RGB/Lux sensor: {e}")
+            return None
+
+        # Check RGB values (0-255)
+        for color, value in [('Red', r), ('Green', g), ('Blue', b)]:
+            if value < 0 or value > 255:
+                print(f"Error: {color} value {value} is outside valid range (0-255)")
+                return None
+
+        # Check color temperature (typical range 1500K-15000K)
+        if color_temp is None or color_temp < 1500 or color_temp > 15000:
+            print(f"Error: Color temperature {color_temp}K is outside typical range (1500K-15000K)")
+            return None
+
+        # Check lux (0-65535 for 16-bit sensor)
+        if lux < 0 or lux > 65535:
+            print(f"Error: Lux value {lux} is outside valid range (0-65535)")
+            return None
+
+        return {"red": r, "green": g, "blue": b, "color_temperature": color_temp, "lux": lux}
+
+    def close(self):
+        pass
+
+
+class FakeSource:
+    def __init__(self, name, columns, values, read_seconds=0.0, deadline_seconds=5):
+        """
+        Stand-in sensor for testing acquisition without hardware.
+
+        Parameters:
+        - name: Source name
+        - columns: Reading key -> log column, as for the real sources
+        - values: Reading returned by every read (None for a failed reading)
+        - read_seconds: Simulated time each read takes
+        - deadline_seconds: Time allowed for a reading
+        """
+        self.name = name
+        self.columns = columns
+        self.values = values
+        self.read_seconds = read_seconds
+        self.deadline_seconds = deadline_seconds
+        self.reads = 0
+
+    def start(self):
+        pass
+
+    def read(self):
+        time.sleep(self.read_seconds)
+        self.reads += 1
+        return dict(self.values) if self.values is not None else None
+
+    def close(self):
+        pass
+
+
+def read_sources(sources):
+    """
+    Read every source at once, each on its own thread and within its own deadline.
+
+    A source that has not answered by its deadline (deadline_seconds after the
+    reads started) counts as a failed reading; its thread is left to finish in
+    the background and never holds up the other sources or the caller.
+
+    Returns:
+    - Source name -> {'time': datetime the reading was taken, 'values': reading dict or None}
+    """
+    samples = {}
+    lock = threading.Lock()
+
+    def read(source):
+        try:
+            values = source.read()
+        except Exception as e:
+            print(f"Error reading {source.name}: {str(e)}")
+            values = None
+        with lock:
+            samples.setdefault(source.name, {'time': datetime.now(), 'values': values})
+
+    started = time.monotonic()
+    threads = []
+    for source in sources:
+        thread = threading.Thread(target=read, args=(source,), name=f"read-{source.name}", daemon=True)
+        thread.start()
+        threads.append((source, thread))
+
+    for source, thread in threads:
+        thread.join(max(0.0, started + source.deadline_seconds - time.monotonic()))
+        with lock:
+            if source.name not in samples:
+                print(f"No {source.name} reading within {source.deadline_seconds} s")
+                samples[source.name] = {'time': datetime.now(), 'values': None}
+    return samples
+
+
+def open_sources(api_key, lat, lon, dht_pin=4, weather_cache=None):
+    """Return the started weather, DHT and light sources, leaving out any whose hardware is unavailable"""
+    sources = []
+    for source in (WeatherSource(api_key, lat, lon, cache_path=weather_cache), DHTSource(dht_pin), LightSource()):
+        try:
+            source.start()
+        except Exception as e:
+            print(f"{source.name} source unavailable: {str(e)}")
+            continue
+        sources.append(source)
+    return sources
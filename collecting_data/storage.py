@@ -0,0 +1,970 @@
+import io
+import os
+import csv
+import time
+import shutil
+import sqlite3
+import argparse
+import threading
+import pandas as pd
+from contextlib import closing
+
+# Data directory shared by the collectors and the web dashboard
+DATA_DIR = os.path.expanduser("~/Documents/app/data")
+
+# Storage backend for the datasets below: "csv" (default), "parquet" or "sqlite"
+STORAGE_BACKEND = os.environ.get("MOTH_STORAGE_BACKEND", "csv")
+
+# Dataset name -> (CSV file name, column used for date partitions, datetime columns)
+DATASETS = {
+    'weather': ('weather_data_log.csv', 'Timestamp', ['Timestamp']),
+    'moon': ('day-moon-light.csv', 'Date', ['Date', 'Dawn', 'Dusk', 'Moonrise', 'Moonset']),
+    'moths': ('moth_measurements.csv', 'timestamp', ['date', 'timestamp']),
+    'departures': ('moth_departures.csv', 'date', ['date']),
+    'readings': ('sensor_readings.csv', 'Timestamp', ['Timestamp']),
+}
+
+# Dataset name -> columns identifying a row, used to make ingest() idempotent
+KEY_COLUMNS = {
+    'weather': ['Timestamp'],
+    'moon': ['Date'],
+    'moths': ['date', 'source_image', 'moth_id'],
+    'departures': ['date', 'image_name'],
+    'readings': ['Timestamp', 'Source'],
+}
+
+# Datasets that are logs of sensor readings. With the CSV backend they are written by a LogWriter into
+# one file per month: <data_dir>/<CSV file name without .csv>/YYYY-MM.csv
+LOG_DATASETS = {'weather', 'moon', 'readings'}
+LOG_PARTITION_FORMAT = "%Y-%m"
+
+# Column names written by earlier versions of the weather collector -> the names the dashboard reads
+RENAMED_COLUMNS = {
+    'Rainfall (mm)': 'Rainfall',
+    'Cloud Cover (%)': 'Cloud_Cover',
+    'Weather Description': 'Weather_Description',
+    'Temperature (C)': 'Temperature',
+    'Humidity (%)': 'Humidity',
+    'Color Temperature (K)': 'Color',
+}
+
+# When log appends are forced to disk: "always" (every write), "interval" (at most every
+# LOG_FSYNC_SECONDS, fewer flash writes) or "never" (left to the operating system)
+LOG_FSYNC = os.environ.get("MOTH_LOG_FSYNC", "always")
+LOG_FSYNC_SECONDS = 60
+
+# Held by ingest and compact (and Parquet appends), so a compaction running on a background thread never
+# interleaves with a write from the same process
+WRITE_LOCK = threading.RLock()
+
+# Attempts of a Parquet read that finds a partition being swapped by a compaction in another process
+SWAP_RETRIES = 50
+SWAP_RETRY_SECONDS = 0.1
+
+
+def parse_dates(df, date_columns):
+    """Convert the given columns to datetimes where present"""
+    for column in date_columns:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def restore_numeric(df):
+    """
+    Convert object columns holding only numbers or only missing values back to floats.
+
+    A part file whose readings were all missing (e.g. the light sensor was not
+    connected) stores them as an untyped null column, and combining it with
+    other parts makes the whole column object dtype.
+    """
+    for column in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[column], skipna=True) in ('floating', 'integer', 'mixed-integer-float', 'empty'):
+            df[column] = pd.to_numeric(df[column]).astype('float64')
+    return df
+
+
+def filter_range(df, time_column, start=None, end=None):
+    """Keep rows with start <= time_column < end (either bound may be None)"""
+    if start is not None:
+        df = df[df[time_column] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df[time_column] < pd.Timestamp(end)]
+    return df
+
+
+def time_bounds(df, time_column):
+    """The [start, end) range on the time column covering every row of df"""
+    times = pd.to_datetime(df[time_column])
+    return times.min(), times.max() + pd.Timedelta(microseconds=1)
+
+
+def new_rows(df, stored, key_columns, date_columns):
+    """Rows of df whose key is neither among the stored rows nor repeated earlier in df"""
+    keys = pd.MultiIndex.from_frame(parse_dates(df[key_columns].copy(), date_columns))
+    is_new = ~keys.duplicated()
+    if not stored.empty:
+        stored_keys = pd.MultiIndex.from_frame(parse_dates(stored[key_columns].copy(), date_columns))
+        is_new &= ~keys.isin(stored_keys)
+    return df[is_new]
+
+
+def write_synced(path, df):
+    """Write a CSV file and flush it to disk before returning"""
+    with open(path, 'w', newline='') as f:
+        df.to_csv(f, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def cut_partial_line(path):
+    """Drop a partial last line left by an interrupted append; returns the resulting file size"""
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        while end > 0:
+            start = max(end - 65536, 0)
+            f.seek(start)
+            block = f.read(end - start)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            print(f"Removing a partially written line from {path}")
+            f.truncate(end)
+        return end
+
+
+def sync_directory(directory):
+    """Flush a directory entry (a newly created file) to disk"""
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def log_files(directory, legacy_path=None, start=None, end=None):
+    """
+    Files of a log written by LogWriter, oldest first.
+
+    Parameters:
+    - directory: Directory of the monthly files (YYYY-MM.csv, then YYYY-MM.1.csv, ... after a header change)
+    - legacy_path: Optional single CSV file from before the log was partitioned, read first
+    - start, end: Optional time range; only the months overlapping [start, end) are returned
+    """
+    paths = [legacy_path] if legacy_path is not None and os.path.exists(legacy_path) else []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return paths
+
+    first = pd.Timestamp(start).strftime(LOG_PARTITION_FORMAT) if start is not None else None
+    last = pd.Timestamp(end).strftime(LOG_PARTITION_FORMAT) if end is not None else None
+    parts = []
+    for name in names:
+        pieces = name.split('.')
+        if pieces[-1] != 'csv' or len(pieces) not in (2, 3) or (len(pieces) == 3 and not pieces[1].isdigit()):
+            continue
+        month = pieces[0]
+        if (first is not None and month < first) or (last is not None and month > last):
+            continue
+        parts.append((month, int(pieces[1]) if len(pieces) == 3 else 0, name))
+    return paths + [os.path.join(directory, name) for _, _, name in sorted(parts)]
+
+
+def read_header(path):
+    """Column names on the first line of a CSV file"""
+    with open(path, newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def csv_cell(value):
+    """Missing values (None, NaN, NaT) as empty cells; anything else as is"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    return value
+
+
+class LogWriter:
+    def __init__(self, directory, time_column, fsync=None):
+        """
+        Crash-safe appends to a log kept as one CSV file per month.
+
+        The rows of a write are formatted by the csv module (so descriptions with
+        commas or quotes are quoted) and each month's rows go to its file in a
+        single write, followed by an fsync depending on the policy. A partial
+        last line left by an interrupted write is cut off first, so a power
+        cut loses at most the write in progress. Before appending, the rows are
+        checked against the file's header: columns are written in the header's
+        order, and rows with a column the header lacks go to a new file for the
+        month (YYYY-MM.1.csv, ...) instead of being misaligned.
+
+        Parameters:
+        - directory: Directory holding the monthly files
+        - time_column: Column whose value (a datetime or ISO string) picks the month
+        - fsync: "always", "interval" or "never" (LOG_FSYNC if None)
+        """
+        self.directory = directory
+        self.time_column = time_column
+        self.fsync = fsync or LOG_FSYNC
+        if self.fsync not in ("always", "interval", "never"):
+            raise ValueError(f"Unknown fsync policy: {self.fsync}")
+        self.last_sync = time.monotonic()
+        self.unsynced = set()
+
+    def _month_file(self, month, columns):
+        """The file to append the month's rows to, and its header (None for a new file)"""
+        number = 0
+        while True:
+            name = f"{month}.csv" if number == 0 else f"{month}.{number}.csv"
+            path = os.path.join(self.directory, name)
+            if not os.path.exists(path) or cut_partial_line(path) == 0:
+                return path, None
+            header = read_header(path)
+            following = os.path.join(self.directory, f"{month}.{number + 1}.csv")
+            if not os.path.exists(following):
+                if set(columns) <= set(header):
+                    return path, header
+                print(f"Columns {sorted(set(columns) - set(header))} are not in the header of {path}; "
+                      f"starting {os.path.basename(following)}")
+            number += 1
+
+    def write(self, rows):
+        """
+        Append rows (dicts of column -> value), in one write per month.
+
+        Raises OSError if a write fails; the months written before it keep their rows.
+        """
+        if not rows:
+            return
+        columns = list(dict.fromkeys(column for row in rows for column in row))
+        months = {}
+        for row in rows:
+            month = pd.Timestamp(row[self.time_column]).strftime(LOG_PARTITION_FORMAT)
+            months.setdefault(month, []).append(row)
+
+        os.makedirs(self.directory, exist_ok=True)
+        for month, month_rows in sorted(months.items()):
+            path, header = self._month_file(month, columns)
+            created = header is None
+            text = io.StringIO()
+            writer = csv.writer(text, lineterminator='\n')
+            if created:
+                header = columns
+                writer.writerow(header)
+            writer.writerows([csv_cell(row.get(column)) for column in header] for row in month_rows)
+
+            with open(path, 'a', newline='') as f:
+                f.write(text.getvalue())
+                f.flush()
+                if self.fsync == "always":
+                    os.fsync(f.fileno())
+            if created and self.fsync == "always":
+                sync_directory(self.directory)
+            self.unsynced.add(path)
+
+        if self.fsync == "always":
+            self.unsynced.clear()
+        elif self.fsync == "interval" and time.monotonic() - self.last_sync >= LOG_FSYNC_SECONDS:
+            self.sync()
+
+    def sync(self):
+        """Force every file written since the last sync to disk"""
+        for path in self.unsynced:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if self.unsynced:
+            sync_directory(self.directory)
+        self.unsynced.clear()
+        self.last_sync = time.monotonic()
+
+
+class CSVStore:
+    def __init__(self, name, data_dir=DATA_DIR):
+        """
+        Dataset stored as a single CSV file (the original format).
+
+        Parameters:
+        - name: Dataset name, a key of DATASETS
+        - data_dir: Directory holding the data files
+        """
+        self.name = name
+        filename, self.time_column, self.date_columns = DATASETS[name]
+        self.key_columns = KEY_COLUMNS[name]
+        self.path = os.path.join(data_dir, filename)
+        self.journal_dir = os.path.splitext(self.path)[0] + ".journal"
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def generation(self):
+        """Value that changes whenever the stored data changes"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def modified_time(self):
+        """Time of the last write (seconds since the epoch), or None"""
+        try:
+            return os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return None
+
+    def read(self, columns=None, start=None, end=None):
+        """
+        Read the dataset with parsed datetime columns.
+
+        Parameters:
+        - columns: Columns to return (all if None)
+        - start, end: Optional time range on the dataset's time column (end exclusive)
+        """
+        usecols = None
+        if columns is not None:
+            usecols = list(dict.fromkeys(list(columns) + [self.time_column]))
+        df = parse_dates(pd.read_csv(self.path, usecols=usecols), self.date_columns)
+        df = filter_range(df, self.time_column, start, end)
+        return df[list(columns)] if columns is not None else df
+
+    def latest(self, columns=None):
+        """The last row, as a one-row frame (empty if nothing is stored)"""
+        return self.read(columns).iloc[-1:]
+
+    def _cut_partial_line(self):
+        return cut_partial_line(self.path)
+
+    def append(self, df):
+        """Append rows (writing the header first if the file is new) and flush them to disk"""
+        size = self._cut_partial_line() if self.exists() else 0
+        with open(self.path, 'a', newline='') as f:
+            df.to_csv(f, header=size == 0, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _journal_paths(self):
+        try:
+            names = os.listdir(self.journal_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(os.path.join(self.journal_dir, name) for name in names if name.endswith(".csv"))
+
+    def _stored_keys(self, df):
+        """Stored key columns in the time range of df's rows"""
+        if not self.exists():
+            return pd.DataFrame(columns=self.key_columns)
+        start, end = time_bounds(df, self.time_column)
+        return self.read(columns=self.key_columns, start=start, end=end)
+
+    def compact(self):
+        """Finish appends interrupted by a crash, from the rows recorded in the journal"""
+        with WRITE_LOCK:
+            self._replay_journal()
+
+    def _replay_journal(self):
+        for path in self._journal_paths():
+            if self.exists():
+                self._cut_partial_line()
+            rows = pd.read_csv(path)
+            missing = new_rows(rows, self._stored_keys(rows), self.key_columns, self.date_columns)
+            if not missing.empty:
+                self.append(missing)
+            os.remove(path)
+            print(f"Recovered {len(missing)} {self.name} rows from {path}")
+
+    def ingest(self, df):
+        """
+        Append the rows whose key (KEY_COLUMNS) is not stored yet, so ingesting a session twice is harmless.
+
+        The rows are first written atomically to a journal file, and removed from
+        it once appended: if the append is interrupted, the next ingest or
+        compact() cuts off the partial line and appends whatever is missing.
+
+        Returns:
+        - The rows that were added
+        """
+        with WRITE_LOCK:
+            self._replay_journal()
+            if df.empty:
+                return df
+            rows = new_rows(df, self._stored_keys(df), self.key_columns, self.date_columns)
+            if rows.empty:
+                return rows
+
+            os.makedirs(self.journal_dir, exist_ok=True)
+            journal_path = os.path.join(self.journal_dir, f"{time.time_ns()}.csv")
+            write_synced(journal_path + ".tmp", rows)
+            os.replace(journal_path + ".tmp", journal_path)
+            self.append(rows)
+            os.remove(journal_path)
+            return rows
+
+    def replace(self, df):
+        """Atomically replace the whole dataset"""
+        temp_path = self.path + ".tmp"
+        write_synced(temp_path, df)
+        os.replace(temp_path, self.path)
+
+
+class CSVLogStore(CSVStore):
+    def __init__(self, name, data_dir=DATA_DIR):
+        """
+        Log dataset (LOG_DATASETS) stored as one CSV file per month, appended to by a LogWriter.
+
+        Layout: <data_dir>/<CSV file name without .csv>/YYYY-MM.csv. The single CSV
+        file of the original format is still read, as the oldest part of the log,
+        with its columns renamed to the current names (RENAMED_COLUMNS).
+
+        Parameters:
+        - name: Dataset name, a key of DATASETS
+        - data_dir: Directory holding the data files
+        """
+        super().__init__(name, data_dir)
+        self.directory = os.path.splitext(self.path)[0]
+        self.writer = LogWriter(self.directory, self.time_column)
+
+    def paths(self, start=None, end=None):
+        """Files of the log, oldest first, optionally only those for months overlapping [start, end)"""
+        return log_files(self.directory, self.path, start, end)
+
+    def exists(self):
+        return bool(self.paths())
+
+    def generation(self):
+        """Value that changes whenever any file of the log changes"""
+        stats = []
+        for path in self.paths():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stats.append((os.path.basename(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(stats) or None
+
+    def modified_time(self):
+        """Time of the last write (seconds since the epoch), or None"""
+        times = [os.path.getmtime(path) for path in self.paths() if os.path.exists(path)]
+        return max(times) if times else None
+
+    def read(self, columns=None, start=None, end=None):
+        """
+        Read the months needed, with parsed datetime columns.
+
+        Parameters:
+        - columns: Columns to return (all if None; missing ones are empty)
+        - start, end: Optional time range on the dataset's time column (end exclusive)
+        """
+        frames = [pd.read_csv(path).rename(columns=RENAMED_COLUMNS)
+                  for path in self.paths(start, end) if os.path.getsize(path) > 0]
+        if not frames:
+            return pd.DataFrame(columns=list(columns) if columns is not None else [])
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        df = parse_dates(df, self.date_columns)
+        df = filter_range(df, self.time_column, start, end)
+        return df.reindex(columns=list(columns)) if columns is not None else df
+
+    def _cut_partial_line(self):
+        paths = self.paths()
+        return cut_partial_line(paths[-1]) if paths else 0
+
+    def append(self, df):
+        """Append rows to their months' files (see LogWriter)"""
+        self.writer.write(df.to_dict('records'))
+
+    def replace(self, df):
+        """Replace the whole log, swapping in a freshly written directory"""
+        new_directory = self.directory + ".new"
+        shutil.rmtree(new_directory, ignore_errors=True)
+        LogWriter(new_directory, self.time_column, fsync="always").write(df.to_dict('records'))
+        os.makedirs(new_directory, exist_ok=True)
+
+        old_directory = self.directory + ".old"
+        if os.path.isdir(self.directory):
+            os.replace(self.directory, old_directory)
+        os.replace(new_directory, self.directory)
+        shutil.rmtree(old_directory, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ParquetStore:
+    def __init__(self, name, data_dir=DATA_DIR):
+        """
+        Dataset stored as Parquet files partitioned by day.
+
+        Layout: <data_dir>/parquet/<name>/date=YYYY-MM-DD/part-<n>.parquet
+        Appends add a new part file to each affected day; compact() merges them,
+        swapping in each merged day as a whole (readers see the old parts or the
+        merged one, never both).
+
+        Parameters:
+        - name: Dataset name, a key of DATASETS
+        - data_dir: Directory holding the data files
+        """
+        self.name = name
+        _, self.time_column, self.date_columns = DATASETS[name]
+        self.key_columns = KEY_COLUMNS[name]
+        self.root = os.path.join(data_dir, "parquet", name)
+        self.generation_file = os.path.join(self.root, "_generation")
+
+    def exists(self):
+        return os.path.isdir(self.root)
+
+    def generation(self):
+        """Counter bumped on every write"""
+        try:
+            with open(self.generation_file) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return None
+
+    def modified_time(self):
+        """Time of the last write (seconds since the epoch), or None"""
+        try:
+            return os.path.getmtime(self.generation_file)
+        except FileNotFoundError:
+            return None
+
+    def _write_generation(self, generation):
+        temp_path = self.generation_file + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(str(generation))
+        os.replace(temp_path, self.generation_file)
+
+    def _bump_generation(self):
+        self._write_generation((self.generation() or 0) + 1)
+
+    def partitions(self, start=None, end=None):
+        """Sorted day strings of the partitions overlapping [start, end)"""
+        if not self.exists():
+            return []
+        # date=YYYY-MM-DD.new / .old are a compaction's merged and replaced copies of a day
+        days = sorted(d[len("date="):] for d in os.listdir(self.root) if d.startswith("date=") and "." not in d)
+        if start is not None:
+            first = pd.Timestamp(start).strftime('%Y-%m-%d')
+            days = [day for day in days if day >= first]
+        if end is not None:
+            last = pd.Timestamp(end).strftime('%Y-%m-%d')
+            days = [day for day in days if day <= last]
+        return days
+
+    def _partition_dir(self, day):
+        return os.path.join(self.root, f"date={day}")
+
+    def _part_files(self, day):
+        partition_dir = self._partition_dir(day)
+        return sorted(os.path.join(partition_dir, f) for f in os.listdir(partition_dir)
+                      if f.endswith(".parquet"))
+
+    def _write_part(self, partition_dir, df):
+        """Write one part file atomically"""
+        os.makedirs(partition_dir, exist_ok=True)
+        part_path = os.path.join(partition_dir, f"part-{time.time_ns()}.parquet")
+        df.to_parquet(part_path + ".tmp", index=False)
+        os.replace(part_path + ".tmp", part_path)
+
+    def _swap_in_progress(self):
+        """True while a compaction has moved a day's parts aside and not yet moved the merged part in"""
+        try:
+            names = set(os.listdir(self.root))
+        except FileNotFoundError:
+            return False
+        return any(name.endswith(".old") and name[:-len(".old")] not in names for name in names)
+
+    def _split_by_day(self, df):
+        df = parse_dates(df.copy(), self.date_columns)
+        return df.groupby(df[self.time_column].dt.strftime('%Y-%m-%d'), sort=True)
+
+    def read(self, columns=None, start=None, end=None):
+        """
+        Read only the partitions and columns needed.
+
+        Parameters:
+        - columns: Columns to return (all if None)
+        - start, end: Optional time range on the dataset's time column (end exclusive)
+        """
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(list(columns) + [self.time_column]))
+
+        # A compaction in another process may swap a day while it is read: list the files again
+        for attempt in range(SWAP_RETRIES):
+            try:
+                if self._swap_in_progress():
+                    raise FileNotFoundError(f"A partition of {self.root} is being swapped")
+                files = [path for day in self.partitions(start, end) for path in self._part_files(day)]
+                if not files:
+                    return self._empty(columns)
+                df = restore_numeric(pd.concat([pd.read_parquet(path, columns=read_columns) for path in files],
+                                               ignore_index=True))
+                break
+            except FileNotFoundError:
+                if attempt == SWAP_RETRIES - 1:
+                    raise
+                time.sleep(SWAP_RETRY_SECONDS)
+        df = filter_range(df, self.time_column, start, end)
+        return df[list(columns)] if columns is not None else df
+
+    def latest(self, columns=None):
+        """The row with the latest time, read from the last day partition only (empty if nothing is stored)"""
+        days = self.partitions()
+        if not days:
+            return self._empty(columns)
+        df = self.read(start=pd.Timestamp(days[-1]))
+        df = df.loc[[df[self.time_column].idxmax()]] if not df.empty else df
+        return df[list(columns)] if columns is not None else df
+
+    def _empty(self, columns=None):
+        """Empty frame with the stored schema's dtypes (only the column names if nothing is stored yet)"""
+        days = self.partitions()
+        files = self._part_files(days[-1]) if days else []
+        if not files:
+            return pd.DataFrame(columns=list(columns) if columns is not None else [])
+        import pyarrow.parquet as pq
+
+        df = pq.read_schema(files[-1]).empty_table().to_pandas()
+        return df.reindex(columns=list(columns)) if columns is not None else df
+
+    def append(self, df):
+        """Append rows as new part files in their day partitions"""
+        if df.empty:
+            return
+        with WRITE_LOCK:
+            for day, group in self._split_by_day(df):
+                self._write_part(self._partition_dir(day), group)
+            self._bump_generation()
+
+    def ingest(self, df):
+        """
+        Append the rows whose key (KEY_COLUMNS) is not stored yet, so ingesting a session twice is harmless.
+
+        Only the key columns of the partitions the rows fall in are read.
+
+        Returns:
+        - The rows that were added
+        """
+        if df.empty:
+            return df
+        start, end = time_bounds(df, self.time_column)
+        with WRITE_LOCK:
+            stored = self.read(columns=self.key_columns, start=start, end=end)
+            rows = new_rows(df, stored, self.key_columns, self.date_columns)
+            self.append(rows)
+        return rows
+
+    def replace(self, df):
+        """Replace the whole dataset, swapping in a freshly written tree"""
+        new_root = self.root + ".new"
+        shutil.rmtree(new_root, ignore_errors=True)
+        for day, group in self._split_by_day(df):
+            self._write_part(os.path.join(new_root, f"date={day}"), group)
+        os.makedirs(new_root, exist_ok=True)
+
+        generation = self.generation() or 0
+        old_root = self.root + ".old"
+        with WRITE_LOCK:
+            if self.exists():
+                os.replace(self.root, old_root)
+            os.replace(new_root, self.root)
+            shutil.rmtree(old_root, ignore_errors=True)
+            self._write_generation(generation + 1)
+
+    def _finish_swaps(self):
+        """Complete or undo day swaps interrupted by a crash"""
+        # Merged copies first: moving one in makes its day's .old copy removable
+        for name in sorted(os.listdir(self.root), key=lambda name: name.endswith(".old")):
+            if not name.startswith("date=") or "." not in name:
+                continue
+            partition_dir = os.path.join(self.root, name.rsplit(".", 1)[0])
+            path = os.path.join(self.root, name)
+            if os.path.exists(partition_dir):
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.endswith(".new") and os.path.exists(partition_dir + ".old"):
+                os.replace(path, partition_dir)  # The old parts were moved aside, so the merged part is complete
+            elif name.endswith(".old"):
+                os.replace(path, partition_dir)
+
+    def compact(self):
+        """
+        Merge the part files of each day into one.
+
+        Each merged day is written to date=YYYY-MM-DD.new and swapped in with
+        two renames; readers retry while a day is between them.
+        """
+        if not self.exists():
+            return
+        with WRITE_LOCK:
+            self._finish_swaps()
+            for day in self.partitions():
+                files = self._part_files(day)
+                if len(files) < 2:
+                    continue
+                partition_dir = self._partition_dir(day)
+                merged = pd.concat([pd.read_parquet(path) for path in files], ignore_index=True)
+                shutil.rmtree(partition_dir + ".new", ignore_errors=True)
+                self._write_part(partition_dir + ".new", merged)
+                if self._part_files(day) != files:
+                    # Another process appended to the day meanwhile; merge it next time
+                    shutil.rmtree(partition_dir + ".new")
+                    continue
+
+                os.replace(partition_dir, partition_dir + ".old")
+                os.replace(partition_dir + ".new", partition_dir)
+                shutil.rmtree(partition_dir + ".old")
+            self._bump_generation()
+
+
+def quote(identifier):
+    """Quote a table or column name for SQL"""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def to_sql_time(values):
+    """Format datetimes as fixed-width text, which SQLite sorts and compares correctly"""
+    return pd.DatetimeIndex(pd.to_datetime(values)).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def sql_type(values):
+    """SQLite column type for a pandas column, as to_sql declares it"""
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_integer_dtype(values):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(values):
+        return "REAL"
+    return "TEXT"
+
+
+class SQLiteStore:
+    def __init__(self, name, data_dir=DATA_DIR):
+        """
+        Dataset stored as a table in a shared SQLite database (WAL mode).
+
+        Datetime columns are stored as fixed-width text and indexed, so range
+        queries only touch the rows in the requested window.
+
+        Parameters:
+        - name: Dataset name, a key of DATASETS
+        - data_dir: Directory holding the data files
+        """
+        self.name = name
+        _, self.time_column, self.date_columns = DATASETS[name]
+        self.key_columns = KEY_COLUMNS[name]
+        self.path = os.path.join(data_dir, "moths.db")
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS store_generation "
+                           "(dataset TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+        return connection
+
+    def _table_exists(self, connection):
+        row = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                 (self.name,)).fetchone()
+        return row is not None
+
+    def exists(self):
+        if not os.path.exists(self.path):
+            return False
+        with closing(self._connect()) as connection:
+            return self._table_exists(connection)
+
+    def generation(self):
+        """Counter bumped in the same transaction as every write"""
+        if not os.path.exists(self.path):
+            return None
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT generation FROM store_generation WHERE dataset = ?",
+                                     (self.name,)).fetchone()
+        return row[0] if row else None
+
+    def modified_time(self):
+        """Time of the last write to the database or its WAL (seconds since the epoch), or None"""
+        times = [os.path.getmtime(path) for path in (self.path, self.path + "-wal") if os.path.exists(path)]
+        return max(times) if times else None
+
+    def read(self, columns=None, start=None, end=None):
+        """
+        Read rows in a time range using the time column's index.
+
+        Parameters:
+        - columns: Columns to return (all if None)
+        - start, end: Optional time range on the dataset's time column (end exclusive)
+        """
+        with closing(self._connect()) as connection:
+            return self._query(connection, columns, start, end)
+
+    def latest(self, columns=None):
+        """The row with the latest time, found through the time column's index (empty if nothing is stored)"""
+        with closing(self._connect()) as connection:
+            return self._query(connection, columns, latest=True)
+
+    def _query(self, connection, columns=None, start=None, end=None, latest=False):
+        select = "*"
+        if columns is not None:
+            select = ", ".join(quote(c) for c in dict.fromkeys(list(columns) + [self.time_column]))
+
+        conditions, params = [], []
+        if start is not None:
+            conditions.append(f"{quote(self.time_column)} >= ?")
+            params.append(to_sql_time([start])[0])
+        if end is not None:
+            conditions.append(f"{quote(self.time_column)} < ?")
+            params.append(to_sql_time([end])[0])
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        if latest:
+            where += f" ORDER BY {quote(self.time_column)} DESC LIMIT 1"
+
+        if not self._table_exists(connection):
+            return pd.DataFrame(columns=list(columns) if columns is not None else [])
+        df = pd.read_sql_query(f"SELECT {select} FROM {quote(self.name)}{where}",
+                               connection, params=params)
+        if df.empty:
+            df = df.astype(self._column_dtypes(connection, df.columns))
+
+        df = parse_dates(df, self.date_columns)
+        return df[list(columns)] if columns is not None else df
+
+    def _column_dtypes(self, connection, columns):
+        """Column -> pandas dtype from the table's declared types, for typing an empty result"""
+        declared = {row[1]: row[2].upper() for row in
+                    connection.execute(f"PRAGMA table_info({quote(self.name)})").fetchall()}
+        numeric = {'REAL': 'float64', 'FLOAT': 'float64', 'INTEGER': 'int64', 'BIGINT': 'int64'}
+        return {column: numeric.get(declared.get(column), 'object') for column in columns}
+
+    def _prepare(self, df):
+        df = df.copy()
+        for column in self.date_columns:
+            if column in df.columns:
+                df[column] = to_sql_time(df[column])
+        return df
+
+    def _finish_write(self, connection):
+        """Create the indexes (first write only) and bump the generation"""
+        for column in dict.fromkeys([self.time_column] + self.date_columns):
+            index_name = f"idx_{self.name}_{column}".replace(" ", "_")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {quote(index_name)} "
+                               f"ON {quote(self.name)} ({quote(column)})")
+        connection.execute("INSERT INTO store_generation (dataset, generation) VALUES (?, 1) "
+                           "ON CONFLICT(dataset) DO UPDATE SET generation = generation + 1",
+                           (self.name,))
+
+    def _insert(self, connection, df):
+        """Insert rows, first adding any columns the table lacks (to_sql only creates them with the table)"""
+        df = self._prepare(df)
+        if self._table_exists(connection):
+            existing = {row[1] for row in connection.execute(f"PRAGMA table_info({quote(self.name)})").fetchall()}
+            for column in df.columns:
+                if column not in existing:
+                    connection.execute(f"ALTER TABLE {quote(self.name)} ADD COLUMN {quote(column)} "
+                                       f"{sql_type(df[column])}")
+        df.to_sql(self.name, connection, if_exists='append', index=False)
+
+    def append(self, df):
+        """Insert rows in one transaction"""
+        if df.empty:
+            return
+        with closing(self._connect()) as connection, connection:
+            self._insert(connection, df)
+            self._finish_write(connection)
+
+    def ingest(self, df):
+        """
+        Insert the rows whose key (KEY_COLUMNS) is not stored yet, checked and written in one transaction.
+
+        Returns:
+        - The rows that were added
+        """
+        if df.empty:
+            return df
+        start, end = time_bounds(df, self.time_column)
+        with closing(self._connect()) as connection, connection:
+            connection.execute("BEGIN IMMEDIATE")
+            stored = self._query(connection, self.key_columns, start, end)
+            rows = new_rows(df, stored, self.key_columns, self.date_columns)
+            if not rows.empty:
+                self._insert(connection, rows)
+                self._finish_write(connection)
+        return rows
+
+    def compact(self):
+        """Nothing to merge: rows are inserted in place"""
+
+    def replace(self, df):
+        """Replace the whole table in one transaction"""
+        with closing(self._connect()) as connection, connection:
+            connection.execute(f"DROP TABLE IF EXISTS {quote(self.name)}")
+            self._prepare(df).to_sql(self.name, connection, index=False)
+            self._finish_write(connection)
+
+
+BACKENDS = {
+    'csv': CSVStore,
+    'parquet': ParquetStore,
+    'sqlite': SQLiteStore,
+}
+
+
+def open_store(name, data_dir=DATA_DIR, backend=None):
+    """Return the store for a dataset using the configured backend"""
+    backend = backend or STORAGE_BACKEND
+    if backend == 'csv' and name in LOG_DATASETS:
+        return CSVLogStore(name, data_dir)
+    return BACKENDS[backend](name, data_dir)
+
+
+def migrate(data_dir=DATA_DIR, backend="parquet"):
+    """One-shot copy of every existing CSV dataset into another backend"""
+    for name in DATASETS:
+        source = open_store(name, data_dir, 'csv')
+        if not source.exists():
+            print(f"Skipping {name}: no CSV data in {data_dir}")
+            continue
+        df = source.read()
+        open_store(name, data_dir, backend).replace(df)
+        print(f"Migrated {name}: {len(df)} rows to {backend}")
+
+
+def export_csv(name, output_path, data_dir=DATA_DIR, backend=None):
+    """Write a dataset from any backend out as CSV, for compatibility"""
+    df = open_store(name, data_dir, backend).read()
+    df.to_csv(output_path, index=False)
+    print(f"Exported {name}: {len(df)} rows to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the moth and weather data stores")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Data directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = commands.add_parser("migrate", help="Copy the CSV datasets into another backend")
+    migrate_parser.add_argument("--to", default="parquet", choices=sorted(set(BACKENDS) - {"csv"}))
+
+    export_parser = commands.add_parser("export", help="Export a dataset as CSV")
+    export_parser.add_argument("dataset", choices=sorted(DATASETS))
+    export_parser.add_argument("output", help="Output CSV path")
+    export_parser.add_argument("--from", dest="backend", default=None, choices=sorted(BACKENDS))
+
+    compact_parser = commands.add_parser("compact", help="Merge small Parquet part files and finish "
+                                                         "interrupted CSV appends")
+    compact_parser.add_argument("dataset", nargs="?", choices=sorted(DATASETS))
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        migrate(args.data_dir, args.to)
+    elif args.command == "export":
+        export_csv(args.dataset, args.output, args.data_dir, args.backend)
+    elif args.command == "compact":
+        for name in [args.dataset] if args.dataset else DATASETS:
+            ParquetStore(name, args.data_dir).compact()
+            open_store(name, args.data_dir, 'csv').compact()
+
+
+if __name__ == "__main__":
+    main()
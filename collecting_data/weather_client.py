@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import threading
+import requests
+from datetime import datetime
+
+# OpenWeatherMap current-weather endpoint
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+# OpenWeatherMap recalculates the current weather about this often
+PROVIDER_UPDATE_SECONDS = 600
+
+# Never request more often than this; after failures the wait doubles up to MAX_BACKOFF_SECONDS
+MIN_REQUEST_SECONDS = 60
+MAX_BACKOFF_SECONDS = 1800
+
+
+class WeatherClient:
+    def __init__(self, api_key, lat, lon, url=WEATHER_URL, timeout_seconds=10, cache_path=None, retries=2,
+                 retry_seconds=1.0, min_request_seconds=MIN_REQUEST_SECONDS,
+                 update_seconds=PROVIDER_UPDATE_SECONDS):
+        """
+        OpenWeatherMap client with a reused connection, caching, backoff and a stale fallback.
+
+        Requests go through one requests.Session, so the TLS connection is kept
+        open between calls. A reading is cached until the provider is due to
+        recalculate it (its 'dt' time plus update_seconds), and no request is made
+        within min_request_seconds of the last one. A failed call is retried
+        (retry_seconds, then twice that, ...) while the deadline allows; after a
+        failed call the next request waits min_request_seconds, doubling with each
+        further failure up to MAX_BACKOFF_SECONDS. Whenever there is no fresh
+        reading, the last good one is returned with 'stale' set.
+
+        Parameters:
+        - api_key, lat, lon: API key and location
+        - url: API endpoint (a local stand-in server for tests)
+        - timeout_seconds: Timeout of each request
+        - cache_path: Optional JSON file keeping the last good reading between runs
+        - retries: Retries within one call
+        - retry_seconds: Wait before the first retry
+        - min_request_seconds: Minimum time between requests
+        - update_seconds: How often the provider recalculates the current weather
+        """
+        self.url = url
+        self.params = {"lat": lat, "lon": lon, "appid": api_key, "units": "metric"}
+        self.timeout_seconds = timeout_seconds
+        self.cache_path = cache_path
+        self.retries = retries
+        self.retry_seconds = retry_seconds
+        self.min_request_seconds = min_request_seconds
+        self.update_seconds = update_seconds
+
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        self.cached = self._load_cache()  # {'values', 'fetched_at', 'expires_at'} (times in epoch seconds)
+        self.next_request = 0.0
+        self.failures = 0
+        self.requests = 0
+
+    def _load_cache(self):
+        if self.cache_path is None:
+            return None
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cache(self):
+        if self.cache_path is None:
+            return
+        try:
+            temp_path = self.cache_path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.cached, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"Error saving weather cache: {e}")
+
+    def _reading(self, stale):
+        values = dict(self.cached['values'])
+        values['stale'] = stale
+        values['fetched_at'] = datetime.fromtimestamp(self.cached['fetched_at'])
+        return values
+
+    def _fetch(self, timeout):
+        """One request; returns (values, provider calculation time or None)"""
+        self.requests += 1
+        response = self.session.get(self.url, params=self.params, timeout=timeout)
+        if response.status_code == 429:
+            # Rate limited by the provider: respect its Retry-After, if given
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                self.next_request = time.time() + int(retry_after)
+        response.raise_for_status()
+        data = response.json()
+        values = {
+            "rainfall": data.get("rain", {}).get("1h", 0),
+            "cloud_cover": data.get("clouds", {}).get("all", 0),
+            "description": data.get("weather", [{}])[0].get("description", "No description"),
+        }
+        return values, data.get("dt")
+
+    def current(self, deadline_seconds=None):
+        """
+        Current rainfall, cloud cover and description.
+
+        Parameters:
+        - deadline_seconds: Optional time allowed for the call, retries included
+
+        Returns:
+        - Dict with 'rainfall', 'cloud_cover', 'description', 'stale' and 'fetched_at', or None
+          if no reading has ever been fetched
+        """
+        with self.lock:
+            now = time.time()
+            end = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+            if self.cached is not None and now < self.cached['expires_at']:
+                return self._reading(stale=False)
+            if now < self.next_request:
+                return self._reading(stale=True) if self.cached is not None else None
+
+            for attempt in range(self.retries + 1):
+                timeout = self.timeout_seconds
+                if end is not None:
+                    timeout = min(timeout, end - time.monotonic())
+                    if timeout <= 0:
+                        break
+                try:
+                    values, calculated = self._fetch(timeout)
+                except requests.exceptions.HTTPError as e:
+                    print(f"Error fetching weather data: {e}")
+                    if e.response is not None and e.response.status_code < 500:
+                        break  # Retrying will not fix a bad key or request
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    print(f"Error fetching weather data: {e}")
+                else:
+                    fetched_at = time.time()
+                    # Keep the reading until the provider recalculates it (if that is overdue, ask again soon)
+                    expires_at = fetched_at + self.update_seconds
+                    if calculated is not None:
+                        due = calculated + self.update_seconds
+                        expires_at = min(expires_at, due if due > fetched_at else fetched_at + self.min_request_seconds)
+                    self.cached = {'values': values, 'fetched_at': fetched_at, 'expires_at': expires_at}
+                    self._save_cache()
+                    self.failures = 0
+                    self.next_request = max(self.next_request, fetched_at + self.min_request_seconds)
+                    return self._reading(stale=False)
+
+                wait = self.retry_seconds * 2 ** attempt
+                if attempt == self.retries or (end is not None and time.monotonic() + wait >= end):
+                    break
+                time.sleep(wait)
+
+            self.failures += 1
+            backoff = min(self.min_request_seconds * 2 ** (self.failures - 1), MAX_BACKOFF_SECONDS)
+            self.next_request = max(self.next_request, time.time() + backoff)
+            return self._reading(stale=True) if self.cached is not None else None
+
+    def close(self):
+        self.session.close()